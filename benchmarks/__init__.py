@@ -0,0 +1 @@
+__all__ = ['bench_backend', 'bench_crawl', 'bench_database', 'bench_delete', 'bench_engine', 'bench_integrity', 'bench_links', 'bench_metrics', 'bench_parse', 'bench_parsepool', 'bench_replay', 'bench_search', 'bench_update', 'bench_visited', 'mocksite', 'pages']
@@ -0,0 +1,71 @@
+"""
+Compare html parser backends: check every backend extracts the same urls and
+attributes as html.parser, and measure throughput in pages/sec.
+
+Usage:
+    python -m benchmarks.bench_backend --pages 200
+    python -m benchmarks.bench_backend --pages-dir saved_pages --backends html.parser lxml
+"""
+import argparse
+import time
+
+from fa_scraper import parse
+from benchmarks import pages
+
+
+def extract(url, html):
+    # everything scraper uses from a page
+    if '/full/' in url:
+        parser = parse.ArtworkParser(html, url)
+        return (parser.get_all_urls(), parser.get_artwork_attributes(), parser.get_download_link(),
+                parser.get_alt_download_link(), parser.get_filename(), parser.get_title())
+    parser = parse.Parser(html, url)
+    return (parser.get_all_urls(),)
+
+
+def run_backend(backend, corpus):
+    """
+    Parse corpus with given backend.
+
+    Args:
+        backend - tree builder name
+        corpus - list of (url, html)
+
+    Returns:
+        results - list of extraction results
+        pages_per_second - throughput
+    """
+    parse.Parser.BACKEND = backend
+    begin = time.perf_counter()
+    results = [extract(url, html) for url, html in corpus]
+    return results, len(corpus) / (time.perf_counter() - begin)
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='differential check and benchmark of html parser backends.')
+    argparser.add_argument('--pages', type=int, default=200,
+                           help='synthetic pages of each kind(full and gallery), default: 200')
+    argparser.add_argument('--pages-dir', help='directory of saved pages with index.json')
+    argparser.add_argument('--backends', nargs='+', default=['html.parser', 'lxml'],
+                           help='backends to compare with html.parser, default: html.parser lxml')
+    arguments = argparser.parse_args()
+
+    if arguments.pages_dir:
+        corpus = pages.load_saved_pages(arguments.pages_dir)
+    else:
+        corpus = pages.generate_pages(arguments.pages, 'full') + pages.generate_pages(arguments.pages, 'gallery')
+
+    reference, reference_speed = run_backend('html.parser', corpus)
+    print('%-12s %8.1f pages/sec' % ('html.parser', reference_speed))
+    for backend in arguments.backends:
+        if backend == 'html.parser':
+            continue
+        if not parse.builder_registry.lookup(backend):
+            print('%-12s not installed' % backend)
+            continue
+        results, speed = run_backend(backend, corpus)
+        mismatches = [url for (url, html), expected, result in zip(corpus, reference, results) if expected != result]
+        print('%-12s %8.1f pages/sec, %u/%u pages differ from html.parser' % (
+            backend, speed, len(mismatches), len(corpus)))
+        for url in mismatches[:10]:
+            print('    differs: %s' % url)
@@ -0,0 +1,173 @@
+"""
+Offline end-to-end benchmark: run fa.py against local mock site and report
+pages/sec, bytes/sec, CPU time per page, peak RSS and time spent in each
+stage, so performance changes can be compared with a saved baseline.
+
+fa.py runs in a child process, so its CPU time and peak RSS(including parse
+workers it reaps) aren't mixed with mock server's. Crawl starts from "/",
+which reaches view, full, gallery, scraps, msg/submissions and watchlist
+pages, and ends when scrapying queue is empty.
+
+Usage:
+    python -m benchmarks.bench_crawl --artworks 300 --artists 4 --latency 0.02
+    python -m benchmarks.bench_crawl --engine async --error-rate 0.05 --save-baseline baseline.json
+    python -m benchmarks.bench_crawl --baseline baseline.json
+    python -m benchmarks.bench_crawl --pages-dir saved_pages
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import mocksite
+from benchmarks import pages
+
+FA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fa.py')
+
+# results compared with baseline, True if higher is better
+COMPARED = {'pages_per_sec': True, 'bytes_per_sec': True, 'cpu_ms_per_page': False, 'peak_rss_mb': False}
+
+
+def run_crawl(site, arguments, workdir):
+    """
+    Run fa.py against site until scrapying queue is empty.
+
+    Args:
+        site - running instance of class MockSite
+        arguments - parsed command-line arguments
+        workdir - directory fa.py runs in
+
+    Returns:
+        (seconds, status, rusage) - wall time, exit status and resource usage of
+    fa.py
+    """
+    command = [sys.executable, FA_PATH, '--engine', arguments.engine, '-i', str(arguments.interval),
+               '--download-interval', str(arguments.interval), '--download-workers', str(arguments.workers),
+               '--parse-workers', str(arguments.parse_workers), '--parser-backend', arguments.parser_backend,
+               '--metrics-file', 'metrics.json', '--log-level', 'fatal'] + arguments.fa_arguments
+    environment = dict(os.environ, FA_BASE_URL=site.base_url)
+    begin = time.perf_counter()
+    # log of fa.py is in its fa_scraper.log, keep with --keep
+    process = subprocess.Popen(command, cwd=workdir, env=environment, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    # wait4 gives resource usage of this child only
+    pid, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return time.perf_counter() - begin, process.returncode, rusage
+
+
+def summarize(site, seconds, rusage, workdir):
+    """
+    Build results of a crawl.
+
+    Args:
+        site - instance of class MockSite after crawl
+        seconds - wall time of crawl
+        rusage - resource usage of fa.py
+        workdir - directory fa.py ran in
+
+    Returns:
+        results - dictionary of results
+    """
+    page_count = sum(site.counts[kind] for kind in site.get_page_kinds())
+    cpu_seconds = rusage.ru_utime + rusage.ru_stime
+    conn = sqlite3.connect(os.path.join(workdir, 'fa_scraper.db'))
+    artworks = conn.execute('SELECT COUNT(*) FROM ARTWORK;').fetchone()[0]
+    conn.close()
+    stages = {}
+    metrics_path = os.path.join(workdir, 'metrics.json')
+    if os.path.isfile(metrics_path):
+        with open(metrics_path) as file:
+            for stage in json.load(file)['stages']:
+                name = stage['stage'] + ('/' + stage['url_type'] if stage['url_type'] else '')
+                stages[name] = {'count': stage['count'], 'seconds': stage['seconds']}
+    return {'seconds': seconds, 'pages': page_count, 'images': site.counts['image'],
+            'errors': site.counts['error'], 'artworks': artworks, 'bytes': site.bytes_sent,
+            'pages_per_sec': page_count / seconds, 'bytes_per_sec': site.bytes_sent / seconds,
+            'cpu_ms_per_page': cpu_seconds * 1000 / max(page_count, 1),
+            # ru_maxrss is KiB on linux
+            'peak_rss_mb': rusage.ru_maxrss / 1024.0, 'counts': dict(site.counts), 'stages': stages}
+
+
+def report(results, baseline=None):
+    print('%u pages(%u errors injected), %u images, %u artworks saved in %.2fs' % (
+        results['pages'], results['errors'], results['images'], results['artworks'], results['seconds']))
+    for name, higher_better in COMPARED.items():
+        line = '  %-16s %12.1f' % (name, results[name])
+        if baseline and baseline.get(name):
+            change = (results[name] / baseline[name] - 1) * 100
+            better = change > 0 if higher_better else change < 0
+            line = line + '   baseline %12.1f  %+6.1f%% %s' % (baseline[name], change, 'better' if better else 'worse')
+        print(line)
+    if results['stages']:
+        print('  stage(url type)            count    seconds   ms/call')
+        for name, stage in sorted(results['stages'].items(), key=lambda item: -item[1]['seconds']):
+            print('  %-24s %7u %10.3f %9.3f' % (name, stage['count'], stage['seconds'],
+                                               stage['seconds'] * 1000 / max(stage['count'], 1)))
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='offline end-to-end benchmark against mock FurAffinity.')
+    argparser.add_argument('--artworks', type=int, default=300, help='artworks in mock site, default: 300')
+    argparser.add_argument('--artists', type=int, default=4, help='artists in watchlist, default: 4')
+    argparser.add_argument('--scraps-ratio', type=float, default=0.25,
+                           help='fraction of artworks of each artist in scraps, default: 0.25')
+    argparser.add_argument('--submissions', type=int, default=100,
+                           help='newest artworks listed in new submissions, default: 100')
+    argparser.add_argument('--per-page', type=int, default=48, help='artworks per gallery page, default: 48')
+    argparser.add_argument('--latency', type=float, default=0.02, help='seconds per response, default: 0.02')
+    argparser.add_argument('--image-size', type=int, default=32 * 1024, help='bytes per image, default: 32768')
+    argparser.add_argument('--error-rate', type=float, default=0.0,
+                           help='fraction of requests answered with error code, default: 0')
+    argparser.add_argument('--error-code', type=int, default=503, help='status of injected errors, default: 503')
+    argparser.add_argument('--pages-dir', help='directory of recorded pages with index.json, served instead of '
+                                               'synthetic pages of the same urls')
+    argparser.add_argument('--interval', type=float, default=0.01,
+                           help='seconds between two requests to one host, default: 0.01')
+    argparser.add_argument('--engine', default='sync', choices=['sync', 'async'], help='crawl engine, default: sync')
+    argparser.add_argument('--workers', type=int, default=2, help='download workers, default: 2')
+    argparser.add_argument('--parse-workers', type=int, default=0, help='parse processes of async engine, '
+                                                                        'default: 0')
+    argparser.add_argument('--parser-backend', default='html.parser', choices=['html.parser', 'lxml'],
+                           help='html parser backend, default: html.parser')
+    argparser.add_argument('--baseline', help='results saved by --save-baseline to compare with')
+    argparser.add_argument('--save-baseline', help='save results to file')
+    argparser.add_argument('--keep', action='store_true', help='keep working directory of fa.py')
+    argparser.add_argument('fa_arguments', nargs=argparse.REMAINDER, help='extra arguments passed to fa.py after --')
+    arguments = argparser.parse_args()
+    if arguments.fa_arguments[:1] == ['--']:
+        arguments.fa_arguments = arguments.fa_arguments[1:]
+
+    recorded_pages = pages.load_saved_pages(arguments.pages_dir) if arguments.pages_dir else None
+    site = mocksite.MockSite(arguments.artworks, arguments.per_page, arguments.latency, arguments.image_size,
+                             artist_count=arguments.artists, scraps_ratio=arguments.scraps_ratio,
+                             submission_count=arguments.submissions, error_rate=arguments.error_rate,
+                             error_code=arguments.error_code, recorded_pages=recorded_pages)
+    site.start()
+    workdir = tempfile.mkdtemp(prefix='bench_crawl_')
+    seconds, status, rusage = run_crawl(site, arguments, workdir)
+    site.stop()
+
+    results = summarize(site, seconds, rusage, workdir)
+    # sync engine exits with -1 when scrapying queue is empty
+    if status not in (0, 255):
+        print('fa.py exited with status %d, results may be incomplete' % status)
+    baseline = None
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)
+    report(results, baseline)
+
+    if arguments.save_baseline:
+        with open(arguments.save_baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print('results saved to "%s".' % arguments.save_baseline)
+    if arguments.keep:
+        print('fa.py ran in "%s".' % workdir)
+    else:
+        shutil.rmtree(workdir)
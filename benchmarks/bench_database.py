@@ -0,0 +1,101 @@
+"""
+Compare artwork insert throughput of plain per-row commit, per-row commit of
+WAL writer and buffered writer.
+
+Usage:
+    python -m benchmarks.bench_database --rows 20000 --batch-size 100
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from fa_scraper import database
+from fa_scraper import util
+
+
+def generate_artwork(artwork_id):
+    # synthetic artwork with every column filled
+    return {'ID': artwork_id, 'Name': 'artwork %u' % artwork_id, 'Width': 1920, 'Height': 1080,
+            'Author': 'artist%u' % (artwork_id % 1000), 'Posted': '2018-01-01 00:00',
+            'Category': 'Artwork (Digital)', 'Theme': 'Fantasy', 'Species': 'Western Dragon',
+            'Gender': 'Male', 'Favorites': artwork_id % 500, 'Comments': artwork_id % 50,
+            'Views': artwork_id % 5000, 'Adult': False, 'Keywords': 'art dessin ice',
+            'Added': util.get_current_time()}
+
+
+def measure_plain(rows):
+    """
+    Insert rows into a fresh database through a plain sqlite connection, which
+    uses default rollback journal and commits after every row, and measure rows
+    per second.
+
+    Args:
+        rows - number of artworks to insert
+
+    Returns:
+        rows_per_second - insert throughput
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        conn = sqlite3.connect(os.path.join(directory, 'bench.db'))
+        conn.execute('CREATE TABLE ARTWORK(ID INT PRIMARY KEY NOT NULL, NAME TEXT, WIDTH INT, '
+                     'HEIGHT INT, AUTHOR TEXT, POSTED DATETIME, CATEGORY TEXT, THEME TEXT, '
+                     'SPECIES TEXT, GENDER TEXT, FAVORITES INT, COMMENTS INT, VIEWS INT, '
+                     'ADULT BOOLEAN, KEYWORDS TEXT, ADDED DATETIME);')
+        conn.commit()
+        artworks = [database.Database.attribute_dictionary_to_tuple(generate_artwork(artwork_id))
+                    for artwork_id in range(1, rows + 1)]
+
+        begin = time.perf_counter()
+        for artwork in artworks:
+            conn.execute(database.Database.INSERT_OR_REPLACE_ARTWORK, artwork)
+            conn.commit()
+        elapsed = time.perf_counter() - begin
+
+        conn.close()
+    return rows / elapsed
+
+
+def measure(rows, batch_size, flush_interval):
+    """
+    Insert rows into a fresh database and measure rows per second.
+
+    Args:
+        rows - number of artworks to insert
+        batch_size - batch size of database writer
+        flush_interval - flush interval of database writer
+
+    Returns:
+        rows_per_second - insert throughput, including final flush
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        db = database.Database(os.path.join(directory, 'bench.db'), batch_size, flush_interval)
+        artworks = [generate_artwork(artwork_id) for artwork_id in range(1, rows + 1)]
+
+        begin = time.perf_counter()
+        for artwork in artworks:
+            db.insert_or_replace_artwork(artwork)
+        db.flush()
+        elapsed = time.perf_counter() - begin
+
+        db.close_db()
+    return rows / elapsed
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='benchmark of database artwork writer.')
+    argparser.add_argument('--rows', type=int, default=20000, help='rows to insert, default: 20000')
+    argparser.add_argument('--batch-size', type=int, default=100, help='buffered writer batch size, default: 100')
+    argparser.add_argument('--flush-interval', type=float, default=30,
+                           help='buffered writer flush interval, default: 30')
+    arguments = argparser.parse_args()
+
+    plain = measure_plain(arguments.rows)
+    per_row = measure(arguments.rows, 1, 0)
+    buffered = measure(arguments.rows, arguments.batch_size, arguments.flush_interval)
+    print('plain per-row:    %10.0f rows/sec' % plain)
+    print('WAL per-row:      %10.0f rows/sec' % per_row)
+    print('buffered (%5u): %10.0f rows/sec' % (arguments.batch_size, buffered))
+    print('speedup:          %10.1fx over plain, %.1fx over WAL per-row' % (buffered / plain,
+                                                                          buffered / per_row))
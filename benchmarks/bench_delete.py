@@ -0,0 +1,68 @@
+"""
+Compare deleting artworks with one statement per ID against set-based bulk
+delete of Database.delete_artworks.
+
+Usage:
+    python -m benchmarks.bench_delete --rows 200000 --delete 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from fa_scraper import database
+from benchmarks.bench_database import generate_artwork
+
+
+def delete_per_row(db, artwork_ids):
+    # how delete_artworks used to work, one DELETE per ID
+    for artwork_id in artwork_ids:
+        db.conn.execute('DELETE FROM ARTWORK WHERE ID = ?', (artwork_id,))
+    db.conn.commit()
+
+
+def measure(rows, artwork_ids, bulk):
+    """
+    Fill a fresh database and measure deleting given IDs from it.
+
+    Args:
+        rows - number of artworks in database
+        artwork_ids - IDs to delete
+        bulk - True to use Database.delete_artworks, False to delete per row
+
+    Returns:
+        (seconds, remaining) - time spent deleting and records left
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        db = database.Database(os.path.join(directory, 'bench.db'), rows)
+        for artwork_id in range(1, rows + 1):
+            db.insert_or_replace_artwork(generate_artwork(artwork_id))
+        db.flush()
+
+        begin = time.perf_counter()
+        if bulk:
+            db.delete_artworks(artwork_ids)
+        else:
+            delete_per_row(db, artwork_ids)
+        seconds = time.perf_counter() - begin
+
+        remaining = db.conn.execute('SELECT COUNT(*) FROM ARTWORK;').fetchone()[0]
+        db.close_db()
+    return seconds, remaining
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='benchmark of bulk artwork delete.')
+    argparser.add_argument('--rows', type=int, default=200000, help='rows in database, default: 200000')
+    argparser.add_argument('--delete', type=int, default=100000, help='IDs to delete, default: 100000')
+    arguments = argparser.parse_args()
+
+    # random order, as set difference of integrity check gives them
+    artwork_ids = random.sample(range(1, arguments.rows + 1), min(arguments.delete, arguments.rows))
+
+    per_row, per_row_remaining = measure(arguments.rows, artwork_ids, False)
+    bulk, bulk_remaining = measure(arguments.rows, artwork_ids, True)
+    print('per-row delete: %8.3fs, %u records left' % (per_row, per_row_remaining))
+    print('bulk delete:    %8.3fs, %u records left' % (bulk, bulk_remaining))
+    print('speedup:        %8.1fx' % (per_row / bulk))
@@ -0,0 +1,126 @@
+"""
+Measure pages/sec of sync and async engine against local mock site at a fixed
+per-host rate, and check both save the same artworks and images.
+
+Usage:
+    python -m benchmarks.bench_engine --artworks 200 --latency 0.05 --interval 0.02
+"""
+import argparse
+import importlib
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+from benchmarks import mocksite
+
+BEGIN_URL = '/gallery/mockartist/'
+
+
+def load_rows(database_name):
+    # artworks without added time, which differs between runs
+    conn = sqlite3.connect(database_name)
+    cursor = conn.execute('SELECT * FROM ARTWORK ORDER BY ID')
+    columns = [column[0] for column in cursor.description]
+    rows = [tuple(value for column, value in zip(columns, row) if column != 'ADDED') for row in cursor]
+    conn.close()
+    return rows
+
+
+def list_images():
+    return sorted((name, os.path.getsize(os.path.join('images', name))) for name in os.listdir('images'))
+
+
+def run_engine(name, site, arguments):
+    """
+    Scrapy whole mock site with an engine in a new directory.
+
+    Args:
+        name - 'sync' or 'async'
+        site - running instance of class MockSite
+        arguments - parsed command-line arguments
+
+    Returns:
+        (seconds, pages, rows, images) - time used, html pages fetched,
+    artworks saved and images downloaded
+    """
+    database = importlib.import_module('fa_scraper.database')
+    engine = importlib.import_module('fa_scraper.engine')
+    parsepool = importlib.import_module('fa_scraper.parsepool')
+    scrapy = importlib.import_module('fa_scraper.scrapy')
+    util = importlib.import_module('fa_scraper.util')
+
+    # module settings fa.py sets from its arguments
+    scrapy.sub_folders = 'none'
+
+    workdir = tempfile.mkdtemp(prefix='bench_engine_%s_' % name)
+    os.chdir(workdir)
+    os.mkdir('images')
+    db = database.Database('fa_scraper.db', 100, 30)
+    scraper = scrapy.Scraper(arguments.interval, {}, BEGIN_URL, download_workers=arguments.workers,
+                             download_interval=arguments.interval)
+    # mock site reports few users online, keep rate fixed
+    scraper.scrapy_interval_variable = False
+
+    def save_artwork(artwork):
+        artwork['Added'] = util.get_current_time()
+        db.insert_or_replace_artwork(artwork)
+
+    counts_before = dict(site.counts)
+    begin = time.perf_counter()
+    if name == 'async':
+        parse_pool = parsepool.ParsePool(arguments.parse_workers) if arguments.parse_workers else None
+        engine.AsyncEngine(scraper, save_artwork, arguments.concurrency, parse_pool=parse_pool).run()
+        if parse_pool:
+            parse_pool.shutdown()
+    else:
+        try:
+            while True:
+                artwork = scraper.scrapy_pending_url()
+                if artwork:
+                    save_artwork(artwork)
+                for artwork in scraper.get_downloaded_artworks():
+                    save_artwork(artwork)
+        except SystemExit:
+            # sync engine exits when scrapying queue is empty
+            pass
+    seconds = time.perf_counter() - begin
+    scraper.close_scraper()
+    db.close_db()
+
+    fetched = sum(site.counts[kind] - counts_before[kind] for kind in ('gallery', 'full'))
+    return seconds, fetched, load_rows('fa_scraper.db'), list_images()
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='benchmark of sync and async crawl engine.')
+    argparser.add_argument('--artworks', type=int, default=200, help='artworks in mock site, default: 200')
+    argparser.add_argument('--per-page', type=int, default=48, help='artworks per gallery page, default: 48')
+    argparser.add_argument('--latency', type=float, default=0.05, help='seconds per response, default: 0.05')
+    argparser.add_argument('--interval', type=float, default=0.02,
+                           help='seconds between two requests to one host, default: 0.02')
+    argparser.add_argument('--concurrency', type=int, default=4, help='async requests per host, default: 4')
+    argparser.add_argument('--workers', type=int, default=4, help='download workers, default: 4')
+    argparser.add_argument('--parse-workers', type=int, default=0,
+                           help='parse processes of async engine, 0 parses in a thread, default: 0')
+    argparser.add_argument('--engines', nargs='+', default=['sync', 'async'], choices=['sync', 'async'])
+    arguments = argparser.parse_args()
+
+    logging.getLogger('default').setLevel(logging.ERROR)
+    site = mocksite.MockSite(arguments.artworks, arguments.per_page, arguments.latency)
+    site.start()
+    # scraper reads base url when imported
+    os.environ['FA_BASE_URL'] = site.base_url
+
+    results = {}
+    for name in arguments.engines:
+        results[name] = run_engine(name, site, arguments)
+        seconds, fetched, rows, images = results[name]
+        print('%-5s engine: %4u pages in %6.2fs, %7.1f pages/sec, %u artworks, %u images' % (
+            name, fetched, seconds, fetched / seconds, len(rows), len(images)))
+    site.stop()
+
+    if len(results) == 2:
+        same = results['sync'][2] == results['async'][2] and results['sync'][3] == results['async'][3]
+        print('results of both engines %s' % ('match' if same else 'DIFFER'))
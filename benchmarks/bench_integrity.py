@@ -0,0 +1,104 @@
+"""
+Measure integrity check scan of images directory, first scan with an empty
+manifest and later scans that only visit changed directories, and check
+manifest finds every artwork.
+
+Usage:
+    python -m benchmarks.bench_integrity --files 200000 --directories 500
+    python -m benchmarks.bench_integrity --images-dir /archive/images
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from fa_scraper import database
+from fa_scraper import integrity
+
+
+def create_tree(root, file_count, directory_count):
+    """
+    Create empty images named like scraper does, spread over artist/year
+    subdirectories.
+
+    Args:
+        root - images directory
+        file_count - number of images
+        directory_count - number of leaf directories
+
+    Returns:
+        artwork_ids - set of IDs of created images
+    """
+    directories = ['artist%u/%u' % (index // 4, 2010 + index % 4) for index in range(directory_count)]
+    for directory in directories:
+        os.makedirs(os.path.join(root, directory))
+    os.makedirs(os.path.join(root, '.blobs', 'ab'))
+    for artwork_id in range(file_count):
+        name = '2017-07-14_02-40 - %u - Artwork number %u by artist.png' % (artwork_id, artwork_id)
+        open(os.path.join(root, directories[artwork_id % directory_count], name), 'w').close()
+    # files the check must ignore
+    open(os.path.join(root, directories[0], '2017-07-14_02-40 - %u - partial.png.part' % file_count), 'w').close()
+    open(os.path.join(root, '.blobs', 'ab', 'ab' * 32), 'w').close()
+    return set(range(file_count))
+
+
+def timed_update(database_name, root, workers):
+    manifest = integrity.ImageManifest(database_name, workers)
+    begin = time.perf_counter()
+    scanned, unchanged = manifest.update(root)
+    seconds = time.perf_counter() - begin
+    artwork_ids = manifest.get_artwork_ids()
+    manifest.close()
+    return seconds, scanned, unchanged, artwork_ids
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='benchmark of integrity check with image manifest.')
+    argparser.add_argument('--files', type=int, default=100000, help='synthetic images, default: 100000')
+    argparser.add_argument('--directories', type=int, default=400, help='leaf directories, default: 400')
+    argparser.add_argument('--workers', type=int, nargs='+', default=[1, 8], help='scan threads, default: 1 8')
+    argparser.add_argument('--images-dir', help='existing images directory to scan instead, it is not modified')
+    arguments = argparser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_integrity_')
+    root = arguments.images_dir
+    expected = None
+    if not root:
+        root = os.path.join(workdir, 'images')
+        begin = time.perf_counter()
+        expected = create_tree(root, arguments.files, arguments.directories)
+        print('created %u files in %u directories in %.1fs' % (
+            arguments.files, arguments.directories, time.perf_counter() - begin))
+
+    for workers in arguments.workers:
+        database_name = os.path.join(workdir, 'fa_scraper_%u.db' % workers)
+        database.Database(database_name).close_db()
+        seconds, scanned, unchanged, artwork_ids = timed_update(database_name, root, workers)
+        print('%2u threads, empty manifest: %7.3fs, %u directories scanned, %u artworks' % (
+            workers, seconds, scanned, len(artwork_ids)))
+        if expected is not None and artwork_ids != expected:
+            print('  manifest DIFFERS from created files')
+        seconds, scanned, unchanged, artwork_ids = timed_update(database_name, root, workers)
+        print('%2u threads, unchanged tree: %7.3fs, %u scanned, %u unchanged' % (workers, seconds, scanned, unchanged))
+
+    if expected is not None:
+        # remove one image and add one, only their directories are scanned
+        directory = os.path.join(root, 'artist0', '2010')
+        removed = sorted(os.listdir(directory))[0]
+        os.remove(os.path.join(directory, removed))
+        time.sleep(0.01)
+        open(os.path.join(root, 'artist1', '2011', '2017-07-14_02-40 - 99999999 - new.png'), 'w').close()
+        seconds, scanned, unchanged, artwork_ids = timed_update(database_name, root, arguments.workers[-1])
+        expected.discard(integrity.get_image_artwork_id(removed))
+        expected.add(99999999)
+        print('%2u threads, 2 files changed: %7.3fs, %u scanned, manifest %s' % (
+            arguments.workers[-1], seconds, scanned, 'matches' if artwork_ids == expected else 'DIFFERS'))
+        # directory removed as a whole
+        shutil.rmtree(os.path.join(root, 'artist2'))
+        seconds, scanned, unchanged, artwork_ids = timed_update(database_name, root, arguments.workers[-1])
+        expected = {artwork_id for artwork_id in expected if artwork_id % arguments.directories not in (8, 9, 10, 11)}
+        print('%2u threads, 1 tree removed: %7.3fs, %u scanned, manifest %s' % (
+            arguments.workers[-1], seconds, scanned, 'matches' if artwork_ids == expected else 'DIFFERS'))
+
+    shutil.rmtree(workdir)
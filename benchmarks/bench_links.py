@@ -0,0 +1,48 @@
+"""
+Measure link extraction of listing pages, comparing regex fast path with DOM
+tree, and check both return the same urls.
+
+Usage:
+    python -m benchmarks.bench_links --pages 10000
+    python -m benchmarks.bench_links --pages-dir saved_pages
+"""
+import argparse
+import time
+
+from fa_scraper import parse
+from benchmarks import pages
+
+
+def extract_with_dom(url, html):
+    parser = parse.Parser(html, url)
+    parser.bs  # build DOM tree, so fast path is skipped
+    return parser.get_all_urls()
+
+
+def extract_with_fast_path(url, html):
+    return parse.Parser(html, url).get_all_urls()
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='benchmark of link extraction fast path.')
+    argparser.add_argument('--pages', type=int, default=10000, help='synthetic gallery pages, default: 10000')
+    argparser.add_argument('--pages-dir', help='directory of saved pages with index.json, /full/ pages skipped')
+    arguments = argparser.parse_args()
+
+    if arguments.pages_dir:
+        corpus = [page for page in pages.load_saved_pages(arguments.pages_dir) if '/full/' not in page[0]]
+    else:
+        corpus = pages.generate_pages(arguments.pages, 'gallery')
+
+    begin = time.perf_counter()
+    dom_urls = [extract_with_dom(url, html) for url, html in corpus]
+    dom_time = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    fast_urls = [extract_with_fast_path(url, html) for url, html in corpus]
+    fast_time = time.perf_counter() - begin
+
+    mismatches = sum(1 for dom, fast in zip(dom_urls, fast_urls) if dom != fast)
+    print('%u pages, %u differ' % (len(corpus), mismatches))
+    print('DOM tree:  %8.1f pages/sec' % (len(corpus) / dom_time))
+    print('fast path: %8.1f pages/sec' % (len(corpus) / fast_time))
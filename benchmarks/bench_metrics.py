@@ -0,0 +1,66 @@
+"""
+Measure overhead of metrics on parse stage, the hottest instrumented path,
+with metrics disabled and enabled, against the cost of a page.
+
+Usage:
+    python -m benchmarks.bench_metrics --pages 400 --rounds 5
+"""
+import argparse
+import time
+
+from fa_scraper import metrics
+from fa_scraper import parsepool
+from benchmarks import pages
+from benchmarks.bench_parsepool import get_url_type
+
+
+def parse_corpus(corpus):
+    # seconds to parse every page like scraper does
+    begin = time.perf_counter()
+    for url, html, url_type in corpus:
+        parsepool.parse_page(html, url, url_type)
+    return time.perf_counter() - begin
+
+
+def time_calls(count):
+    # seconds of count timer blocks and counter increments, as one page does
+    begin = time.perf_counter()
+    for _ in range(count):
+        with metrics.timer('parse', 'view'):
+            pass
+        metrics.increment('pages_parsed', 'view')
+    return time.perf_counter() - begin
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='benchmark of metrics overhead.')
+    argparser.add_argument('--pages', type=int, default=400, help='synthetic pages, half full half gallery, '
+                                                                  'default: 400')
+    argparser.add_argument('--rounds', type=int, default=5, help='rounds, best is reported, default: 5')
+    arguments = argparser.parse_args()
+
+    corpus = pages.generate_pages(arguments.pages // 2, 'full') + \
+        pages.generate_pages(arguments.pages - arguments.pages // 2, 'gallery')
+    corpus = [(url, html, get_url_type(url)) for url, html in corpus]
+    parse_corpus(corpus)
+
+    calls = 100000
+    parse_seconds = {False: [], True: []}
+    call_seconds = {False: [], True: []}
+    # modes alternate every round, so machine load drifting affects both alike
+    for _ in range(arguments.rounds):
+        for enabled in (False, True):
+            metrics.enabled = enabled
+            parse_seconds[enabled].append(parse_corpus(corpus))
+            call_seconds[enabled].append(time_calls(calls))
+    metrics.enabled = False
+
+    for enabled in (False, True):
+        print('metrics %-8s: %7.1f pages/sec, timer + counter %6.2fus' % (
+            'enabled' if enabled else 'disabled', len(corpus) / min(parse_seconds[enabled]),
+            min(call_seconds[enabled]) / calls * 1e6))
+    # a page runs at most 3 timers and 1 counter in parse stage
+    per_page = 2 * min(call_seconds[False]) / calls
+    print('disabled instrumentation costs %.4f%% of a page' % (
+        per_page / (min(parse_seconds[False]) / len(corpus)) * 100))
+    print('enabled vs disabled parse time: %+.2f%%' % ((min(parse_seconds[True]) / min(parse_seconds[False]) - 1) * 100))
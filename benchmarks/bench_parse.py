@@ -0,0 +1,85 @@
+"""
+Measure parse time per artwork page, comparing single-pass ArtworkParser with
+the former access pattern that searched DOM tree once per field.
+
+Usage:
+    python -m benchmarks.bench_parse --pages 200
+    python -m benchmarks.bench_parse --pages-dir saved_pages
+"""
+import argparse
+import re
+import time
+
+from bs4 import BeautifulSoup
+
+from fa_scraper import parse
+from benchmarks import pages
+
+
+def legacy_extract(html, regex_table, tag_table):
+    # every getter searched tree on its own, and every attribute serialized its tag again
+    bs = BeautifulSoup(html, 'html.parser')
+    stats_tag = bs.find('td', {'class': 'alt1 stats-container'})
+    tags = {'stats_tag': stats_tag, 'cat_tag': bs.find('td', {'class': 'cat'}),
+            'keywords_tag': stats_tag.find('div', {'id': 'keywords'}) if stats_tag else None}
+    if stats_tag:
+        stats_tag.find('span', {'class': 'popup_date'})
+        stats_tag.find('div', {'align': 'left'})
+    for attribute, regex in regex_table.items():
+        re.findall(regex, str(tags[tag_table[attribute].replace('_html', '_tag')]))
+    bs.find('td', {'class': 'alt1 stats-container'})  # get_filename
+    bs.find('meta', {'property': 'og:title'})  # get_posted_title, called twice
+    bs.find('meta', {'property': 'og:title'})
+    bs.find('img', {'id': 'submissionImg'})  # get_download_link
+    bs.find('object', {'id': 'flash_embed'})
+    bs.find('a', text='Download')  # get_alt_download_link
+    bs.find('b', text='Category:')  # get_alt_and_description
+    bs.findAll('table', {'class': 'maintable'})
+    bs.findAll('table', {'class': 'maintable'})  # save_description
+    bs.find('div', {'class': 'classic-submission-title information'})  # get_artist
+    bs.find('title')  # get_title
+    bs.find_all('b', string='registered')  # get_registered_users_online
+
+
+def single_pass_extract(html, url):
+    parser = parse.ArtworkParser(html, url)
+    parser.get_artwork_attributes()
+    parser.get_filename()
+    parser.get_download_link()
+    parser.get_alt_download_link()
+    parser.get_alt_and_description()
+    parser.get_artist()
+    parser.get_title()
+    parser.get_registered_users_online()
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='benchmark of artwork page parsing.')
+    argparser.add_argument('--pages', type=int, default=200, help='synthetic pages to parse, default: 200')
+    argparser.add_argument('--pages-dir', help='directory of saved /full/ pages with index.json')
+    arguments = argparser.parse_args()
+
+    parse.resume_on_user = ''
+    if arguments.pages_dir:
+        artwork_pages = [page for page in pages.load_saved_pages(arguments.pages_dir) if '/full/' in page[0]]
+    else:
+        artwork_pages = pages.generate_pages(arguments.pages, 'full')
+
+    # warm regex tables
+    single_pass_extract(*reversed(artwork_pages[0]))
+    regex_table = parse.ArtworkParser.REGEX_TABLE
+    tag_table = parse.ArtworkParser.TAG_TABLE
+
+    begin = time.perf_counter()
+    for url, html in artwork_pages:
+        legacy_extract(html, regex_table, tag_table)
+    legacy = (time.perf_counter() - begin) / len(artwork_pages)
+
+    begin = time.perf_counter()
+    for url, html in artwork_pages:
+        single_pass_extract(html, url)
+    single_pass = (time.perf_counter() - begin) / len(artwork_pages)
+
+    print('%u pages' % len(artwork_pages))
+    print('per-field lookups: %8.2f ms/page' % (legacy * 1000))
+    print('single pass:       %8.2f ms/page' % (single_pass * 1000))
@@ -0,0 +1,74 @@
+"""
+Measure how parse throughput scales with worker processes of ParsePool,
+compared with parsing in one process, and check restored parsers return the
+same results.
+
+Usage:
+    python -m benchmarks.bench_parsepool --pages 400 --workers 1 2 4 8
+    python -m benchmarks.bench_parsepool --pages-dir saved_pages
+"""
+import argparse
+import os
+import time
+
+from fa_scraper import parse
+from fa_scraper import parsepool
+from benchmarks import pages
+
+
+def get_url_type(url):
+    # /full/ pages are what scraper fetches for views
+    return 'view' if url.startswith('/full/') else parse.Parser.get_url_type(url)
+
+
+def summarize(url_type, parser, urls):
+    # everything handle_page reads from a parse result, parser of other pages isn't used
+    if url_type != 'view':
+        return urls, None
+    return urls, (parser.is_available(), parser.get_artwork_attributes(), parser.get_download_link(),
+                  parser.get_alt_download_link(), parser.get_filename(), parser.get_artist(),
+                  parser.get_registered_users_online())
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='benchmark of multi-process parse pool.')
+    argparser.add_argument('--pages', type=int, default=400, help='synthetic pages, half full half gallery, '
+                                                                  'default: 400')
+    argparser.add_argument('--pages-dir', help='directory of saved pages with index.json')
+    argparser.add_argument('--workers', type=int, nargs='+', help='worker counts, default: 1 2 4 ... cpu count')
+    arguments = argparser.parse_args()
+
+    if arguments.pages_dir:
+        corpus = pages.load_saved_pages(arguments.pages_dir)
+    else:
+        corpus = pages.generate_pages(arguments.pages // 2, 'full') + \
+            pages.generate_pages(arguments.pages - arguments.pages // 2, 'gallery')
+    corpus = [(url, html, get_url_type(url)) for url, html in corpus]
+
+    cpu_count = os.cpu_count() or 1
+    worker_counts = arguments.workers
+    if not worker_counts:
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= cpu_count:
+            worker_counts.append(worker_counts[-1] * 2)
+
+    begin = time.perf_counter()
+    expected = [summarize(url_type, *parsepool.parse_page(html, url, url_type)) for url, html, url_type in corpus]
+    single = len(corpus) / (time.perf_counter() - begin)
+    print('%u pages, %u cpus' % (len(corpus), cpu_count))
+    print('in process:    %8.1f pages/sec' % single)
+
+    for worker_count in worker_counts:
+        pool = parsepool.ParsePool(worker_count)
+        # wait for workers to start and warm up, start up isn't measured
+        url, html, url_type = corpus[0]
+        pool.parse(html, url, url_type)
+        begin = time.perf_counter()
+        futures = [pool.submit(html, url, url_type) for url, html, url_type in corpus]
+        results = [summarize(url_type, *pool.restore(future.result()))
+                   for future, (url, html, url_type) in zip(futures, corpus)]
+        throughput = len(corpus) / (time.perf_counter() - begin)
+        pool.shutdown()
+        mismatches = sum(1 for result, expect in zip(results, expected) if result != expect)
+        print('%2u workers:    %8.1f pages/sec, %.2fx, %u differ' % (
+            worker_count, throughput, throughput / single, mismatches))
@@ -0,0 +1,75 @@
+"""
+Measure response store: compression ratio and write rate of each codec, and
+how fast reparse rebuilds artwork records from stored pages with a growing
+number of worker processes, compared with fetching pages at scrapy interval.
+
+Usage:
+    python -m benchmarks.bench_replay --pages 2000 --workers 1 2 4
+    python -m benchmarks.bench_replay --pages-dir saved_pages
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from fa_scraper import database
+from fa_scraper import replay
+from benchmarks import pages
+
+
+def fill_store(store, corpus):
+    # store every page like open_url does, returns seconds
+    begin = time.perf_counter()
+    for url, html in corpus:
+        store.put(url, html.encode('utf-8'))
+    return time.perf_counter() - begin
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='benchmark of response store and reparse mode.')
+    argparser.add_argument('--pages', type=int, default=2000, help='synthetic full pages, default: 2000')
+    argparser.add_argument('--pages-dir', help='directory of saved pages with index.json, /full/ ones are used')
+    argparser.add_argument('--workers', type=int, nargs='+', help='worker counts, default: 1 2 4 ... cpu count')
+    argparser.add_argument('--interval', type=float, default=60,
+                           help='scrapy interval(seconds) re-crawl is compared with, default: 60')
+    arguments = argparser.parse_args()
+
+    if arguments.pages_dir:
+        corpus = [(url, html) for url, html in pages.load_saved_pages(arguments.pages_dir) if url.startswith('/full/')]
+    else:
+        corpus = pages.generate_pages(arguments.pages, 'full')
+    raw_bytes = sum(len(html.encode('utf-8')) for url, html in corpus)
+    cpu_count = os.cpu_count() or 1
+    worker_counts = arguments.workers
+    if not worker_counts:
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= cpu_count:
+            worker_counts.append(worker_counts[-1] * 2)
+    print('%u pages, %.1f KiB raw html, %u cpus' % (len(corpus), raw_bytes / 1024.0, cpu_count))
+
+    workdir = tempfile.mkdtemp(prefix='bench_replay_')
+    try:
+        codecs = [codec for codec in replay.CODECS if codec != 'zstd' or replay.zstandard]
+        for codec in codecs:
+            store = replay.ResponseStore(os.path.join(workdir, codec + '.db'), codec)
+            seconds = fill_store(store, corpus)
+            print('%-5s ratio %5.2fx, %8.1f pages/sec stored' % (
+                codec, raw_bytes / float(store.stored_bytes), len(corpus) / seconds))
+            store.close()
+        if 'zstd' not in codecs:
+            print('zstd skipped, zstandard is not installed')
+
+        store = replay.ResponseStore(os.path.join(workdir, codecs[-1] + '.db'))
+        for worker_count in worker_counts:
+            db = database.Database(os.path.join(workdir, 'fa_scraper_%u.db' % worker_count), 1000)
+            begin = time.perf_counter()
+            rebuilt_count, skipped_count = replay.reparse_artworks(store, db, worker_count, archived_only=False)
+            seconds = time.perf_counter() - begin
+            db.close_db()
+            print('%2u workers: %8.1f pages/sec, %u rebuilt, %u skipped, 1M pages in %.1f hours' % (
+                worker_count, len(corpus) / seconds, rebuilt_count, skipped_count, 1e6 * seconds / len(corpus) / 3600))
+        store.close()
+        print('re-crawl at %gs interval: 1M pages in %.0f days' % (arguments.interval, 1e6 * arguments.interval / 86400))
+    finally:
+        shutil.rmtree(workdir)
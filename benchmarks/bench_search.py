@@ -0,0 +1,111 @@
+"""
+Compare searching artworks by keyword with LIKE scan over Keywords column,
+keyword table index and full-text search table, on a synthetic database.
+
+Usage:
+    python -m benchmarks.bench_search --rows 5000000
+    python -m benchmarks.bench_search --database search.db
+"""
+import argparse
+import itertools
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from fa_scraper import database
+from benchmarks.bench_database import generate_artwork
+
+WORDS = ['dragon', 'wolf', 'fox', 'cat', 'cave', 'forest', 'night', 'ice', 'fire', 'sketch',
+         'commission', 'portrait', 'comic', 'story', 'winter', 'flight', 'armor', 'river']
+
+
+def fill_database(db, rows, vocabulary_size, seed=0):
+    """
+    Insert synthetic artworks with keywords drawn from a long-tailed vocabulary,
+    like tags are, a few are very common and most are rare.
+
+    Args:
+        db - database instance
+        rows - number of artworks
+        vocabulary_size - number of distinct keywords
+        seed - seed of random generator
+    """
+    rand = random.Random(seed)
+    vocabulary = ['tag%06u' % rank for rank in range(vocabulary_size)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(vocabulary_size)))
+    begin = time.perf_counter()
+    for artwork_id in range(1, rows + 1):
+        artwork = generate_artwork(artwork_id)
+        artwork['Name'] = '%s %s %u' % (rand.choice(WORDS), rand.choice(WORDS), artwork_id)
+        artwork['Keywords'] = ' '.join(set(rand.choices(vocabulary, cum_weights=cum_weights, k=rand.randint(1, 12))))
+        artwork['Description'] = ' '.join(rand.choices(WORDS, k=8))
+        db.insert_or_replace_artwork(artwork)
+        if artwork_id % 500000 == 0:
+            print('  %u rows, %.0fs' % (artwork_id, time.perf_counter() - begin))
+    db.flush()
+    print('filled %u rows in %.0fs' % (rows, time.perf_counter() - begin))
+
+
+def timed(function, repeat):
+    # best of repeat runs, returns (seconds, result)
+    best = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - begin
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='benchmark of keyword table and full-text search.')
+    argparser.add_argument('--rows', type=int, default=5000000, help='synthetic artworks, default: 5000000')
+    argparser.add_argument('--vocabulary', type=int, default=50000, help='distinct keywords, default: 50000')
+    argparser.add_argument('--database', help='database to use, filled if it has no artworks, it is kept')
+    argparser.add_argument('--keep', action='store_true', help='keep synthetic database for next runs')
+    argparser.add_argument('--repeat', type=int, default=3, help='runs of each query, best is reported, default: 3')
+    arguments = argparser.parse_args()
+
+    workdir = None if arguments.database else tempfile.mkdtemp(prefix='bench_search_')
+    database_name = arguments.database or os.path.join(workdir, 'search.db')
+    db = database.Database(database_name, 10000)
+    if not db.conn.execute('SELECT 1 FROM ARTWORK LIMIT 1;').fetchone():
+        fill_database(db, arguments.rows, arguments.vocabulary)
+    rows = db.conn.execute('SELECT COUNT(*) FROM ARTWORK;').fetchone()[0]
+    print('%u artworks, full-text search %s' % (rows, 'enabled' if db.search_enabled else 'DISABLED'))
+
+    # common, medium and rare keyword
+    for keyword in ('tag000000', 'tag000099', 'tag009999'):
+        like_seconds, like_count = timed(lambda: db.conn.execute(
+            'SELECT COUNT(*) FROM ARTWORK WHERE KEYWORDS LIKE ?;', ('%' + keyword + '%',)).fetchone()[0],
+            arguments.repeat)
+        keyword_seconds, keyword_count = timed(lambda: sum(1 for _ in db.iter_artwork_ids_with_keyword(keyword)),
+                                               arguments.repeat)
+        print('%s: LIKE scan %8.3fs(%u), keyword table %8.3fs(%u), %.0fx' % (
+            keyword, like_seconds, like_count, keyword_seconds, keyword_count, like_seconds / max(keyword_seconds, 1e-6)))
+        if db.search_enabled:
+            fts_seconds, fts_count = timed(lambda: db.conn.execute(
+                'SELECT COUNT(*) FROM ARTWORK_SEARCH WHERE ARTWORK_SEARCH MATCH ?;',
+                ('KEYWORDS:' + keyword,)).fetchone()[0], arguments.repeat)
+            top_seconds, top = timed(lambda: db.search_artworks('KEYWORDS:' + keyword, 100), arguments.repeat)
+            print('%s: full-text count %8.3fs(%u), top 100 by rank %8.3fs' % (
+                ' ' * len(keyword), fts_seconds, fts_count, top_seconds))
+
+    if db.search_enabled:
+        query = 'cave AND dragon'
+        like_seconds, like_count = timed(lambda: db.conn.execute(
+            'SELECT COUNT(*) FROM ARTWORK WHERE NAME LIKE \'%cave%\' AND NAME LIKE \'%dragon%\';').fetchone()[0],
+            arguments.repeat)
+        fts_seconds, fts_count = timed(lambda: db.conn.execute(
+            'SELECT COUNT(*) FROM ARTWORK_SEARCH WHERE ARTWORK_SEARCH MATCH ?;', ('NAME:(' + query + ')',)
+        ).fetchone()[0], arguments.repeat)
+        print('name "%s": LIKE scan %8.3fs(%u), full-text %8.3fs(%u)' % (
+            query, like_seconds, like_count, fts_seconds, fts_count))
+
+    db.close_db()
+    if arguments.database or arguments.keep:
+        print('database kept at "%s".' % database_name)
+    else:
+        shutil.rmtree(workdir)
@@ -0,0 +1,103 @@
+"""
+Offline benchmark of update mode against local mock site: crawl it, then
+refresh every artwork twice. First round fetches and parses every page and
+saves validators, before the second one a fraction of artworks is changed,
+so unchanged pages take the fast path(304, or the same stats hash if mock
+site sends no ETag). Bytes sent, pages parsed and time of both rounds are
+reported.
+
+Usage:
+    python -m benchmarks.bench_update --artworks 200 --changed 0.1
+    python -m benchmarks.bench_update --no-etags
+    python -m benchmarks.bench_update --latency 0.1 --workers 1
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import mocksite
+from benchmarks.bench_crawl import FA_PATH
+
+
+def run_fa(site, workdir, fa_arguments):
+    # run fa.py against site, returns seconds
+    environment = dict(os.environ, FA_BASE_URL=site.base_url)
+    begin = time.perf_counter()
+    subprocess.run([sys.executable, FA_PATH, '--log-level', 'fatal'] + fa_arguments, cwd=workdir, env=environment,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - begin
+
+
+def expire_all(workdir):
+    # make every artwork expired
+    conn = sqlite3.connect(os.path.join(workdir, 'fa_scraper.db'))
+    with conn:
+        conn.execute('UPDATE ARTWORK SET ADDED = \'2000-01-01 00:00\';')
+    conn.close()
+
+
+def read_counters(workdir):
+    # counters of last fa.py run, keyed by name(url type)
+    with open(os.path.join(workdir, 'metrics.json')) as file:
+        return {counter['name'] + ('(%s)' % counter['url_type'] if counter['url_type'] else ''): counter['value']
+                for counter in json.load(file)['counters']}
+
+
+def run_update(site, workdir, interval, worker_count):
+    # expire every artwork and refresh them, returns results of the round
+    expire_all(workdir)
+    counts = dict(site.counts)
+    bytes_sent = site.bytes_sent
+    seconds = run_fa(site, workdir, ['-m', 'update', '--expire-time', '1', '-i', str(interval),
+                                     '--refresh-workers', str(worker_count), '--metrics-file', 'metrics.json'])
+    counters = read_counters(workdir)
+    return {'seconds': seconds, 'bytes': site.bytes_sent - bytes_sent,
+            'full': site.counts['full'] - counts['full'],
+            'not_modified': site.counts['not_modified'] - counts['not_modified'],
+            'parsed': counters.get('artworks_written', 0), 'touched': counters.get('artworks_touched', 0)}
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='offline benchmark of update mode conditional requests.')
+    argparser.add_argument('--artworks', type=int, default=200, help='artworks in mock site, default: 200')
+    argparser.add_argument('--changed', type=float, default=0.1,
+                           help='fraction of artworks changed before second round, default: 0.1')
+    argparser.add_argument('--latency', type=float, default=0.0, help='seconds per response, default: 0')
+    argparser.add_argument('--interval', type=float, default=0.001,
+                           help='seconds between two requests, default: 0.001')
+    argparser.add_argument('--workers', type=int, default=2, help='refresh workers of update mode, default: 2')
+    argparser.add_argument('--no-etags', action='store_true', help='mock site sends no ETag, only stats hash works')
+    arguments = argparser.parse_args()
+
+    site = mocksite.MockSite(arguments.artworks, latency=arguments.latency, image_size=1024,
+                             etags=not arguments.no_etags)
+    site.start()
+    workdir = tempfile.mkdtemp(prefix='bench_update_')
+    try:
+        # crawl gallery of the artist, so every artwork is in database
+        run_fa(site, workdir, ['-i', str(arguments.interval), '--download-interval', str(arguments.interval),
+                               '--begin-url', '/gallery/%s/' % site.artist, '--skip-check'])
+        first = run_update(site, workdir, arguments.interval, arguments.workers)
+        for artwork_id in random.Random(0).sample(site.artwork_ids, int(len(site.artwork_ids) * arguments.changed)):
+            site.change_artwork(artwork_id)
+        second = run_update(site, workdir, arguments.interval, arguments.workers)
+    finally:
+        site.stop()
+        shutil.rmtree(workdir)
+
+    print('%u artworks, %.0f%% changed before second round, ETag %s, %u refresh workers' % (
+        arguments.artworks, arguments.changed * 100, 'disabled' if arguments.no_etags else 'enabled',
+        arguments.workers))
+    for name, results in (('first round', first), ('second round', second)):
+        print('%-13s %6.2fs, %9u bytes, %4u full pages, %4u not modified, %4u parsed, %4u touched' % (
+            name, results['seconds'], results['bytes'], results['full'], results['not_modified'], results['parsed'],
+            results['touched']))
+    print('second round: %.1f%% bytes, %.1f%% time of first round' % (
+        second['bytes'] * 100.0 / max(first['bytes'], 1), second['seconds'] * 100 / first['seconds']))
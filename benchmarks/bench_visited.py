@@ -0,0 +1,79 @@
+"""
+Measure memory and lookup time of VisitedSet against a set of url strings.
+
+Usage:
+    python -m benchmarks.bench_visited --sizes 1000000 10000000 50000000
+"""
+import argparse
+import time
+import tracemalloc
+
+from fa_scraper import visited
+
+
+def measure_string_set(size):
+    # baseline, the scrapied set used to hold full url strings
+    tracemalloc.start()
+    scrapied_set = set()
+    for artwork_id in range(1, size + 1):
+        scrapied_set.add('/view/%u/' % artwork_id)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    begin = time.perf_counter()
+    for artwork_id in range(1, size + 1, max(1, size // 100000)):
+        '/view/%u/' % artwork_id in scrapied_set
+    lookups = len(range(1, size + 1, max(1, size // 100000)))
+    return memory, (time.perf_counter() - begin) / lookups
+
+
+def measure_visited_set(size):
+    tracemalloc.start()
+    visited_set = visited.VisitedSet()
+    for artwork_id in range(1, size + 1):
+        visited_set.add_id(artwork_id)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    begin = time.perf_counter()
+    for artwork_id in range(1, size + 1, max(1, size // 100000)):
+        '/view/%u/' % artwork_id in visited_set
+    lookups = len(range(1, size + 1, max(1, size // 100000)))
+    return memory, (time.perf_counter() - begin) / lookups
+
+
+def measure_url_hashes(size):
+    # non-view urls, stored as 64-bit hashes
+    tracemalloc.start()
+    visited_set = visited.VisitedSet()
+    for page in range(1, size + 1):
+        visited_set.add('/gallery/artist%u/%u/' % (page % 100000, page))
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return memory
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='benchmark of visited set memory usage.')
+    argparser.add_argument('--sizes', type=int, nargs='+', default=[1000000, 10000000, 50000000],
+                           help='numbers of IDs to insert, default: 1M 10M 50M')
+    argparser.add_argument('--max-string-set', type=int, default=10000000,
+                           help='largest size measured with set of url strings, default: 10M')
+    argparser.add_argument('--url-hashes', type=int, default=1000000,
+                           help='number of non-view urls stored as hashes, default: 1M')
+    arguments = argparser.parse_args()
+
+    print('%12s %16s %16s %14s %14s' % ('IDs', 'string set', 'visited set', 'string lookup', 'visited lookup'))
+    for size in arguments.sizes:
+        visited_memory, visited_lookup = measure_visited_set(size)
+        if size <= arguments.max_string_set:
+            string_memory, string_lookup = measure_string_set(size)
+            print('%12u %13.1f MB %13.1f MB %11.0f ns %11.0f ns' % (
+                size, string_memory / 2 ** 20, visited_memory / 2 ** 20, string_lookup * 1e9, visited_lookup * 1e9))
+        else:
+            print('%12u %16s %13.1f MB %14s %11.0f ns' % (
+                size, 'skipped', visited_memory / 2 ** 20, 'skipped', visited_lookup * 1e9))
+
+    if arguments.url_hashes:
+        print('%u non-view urls as 64-bit hashes: %.1f MB' % (
+            arguments.url_hashes, measure_url_hashes(arguments.url_hashes) / 2 ** 20))
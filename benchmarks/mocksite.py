@@ -0,0 +1,244 @@
+"""
+Local mock of FurAffinity serving synthetic or recorded pages, used by
+benchmarks that run the whole scraper.
+
+Every artist has a gallery and a scraps split into pages that link to
+/view/<id>/ of its artworks. Front page "/" links to new submissions, which
+list the newest artworks, and to a watchlist of all artists, so a crawl from
+"/" visits view, full, gallery, scraps, msg/submissions and watchlist pages.
+/full/<id>/ pages link images to a second host name of the same server, so
+html and images are rate limited separately like on the real site.
+Recorded pages(see benchmarks.pages.load_saved_pages) are served instead of
+synthetic ones for the urls they were fetched from.
+Full pages are sent with an ETag of their content, and requests with a
+matching If-None-Match are answered 304, unless etags is False.
+Point scraper at it by setting FA_BASE_URL to base_url before fa_scraper is
+imported.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import random
+import re
+import threading
+import time
+
+from benchmarks import pages
+
+GALLERY_REGEX = re.compile(r'^/(gallery|scraps)/([^/]+)/?(?:(\d+)/)?$')
+SUBMISSIONS_REGEX = re.compile(r'^/msg/submissions/(?:new~(\d+)@72/)?$')
+WATCHLIST_REGEX = re.compile(r'^/watchlist/by/([^/]+)/$')
+FULL_REGEX = re.compile(r'^/(?:full|view)/(\d+)/?$')
+IMAGE_REGEX = re.compile(r'^/art/.*_artwork_(\d+)\.\w+$')
+
+# kinds of responses counted, 'error' is an injected error, 'not_modified' is
+# a 304 answered to a full page request with matching If-None-Match
+KINDS = ('home', 'gallery', 'scraps', 'submissions', 'watchlist', 'full', 'recorded', 'image', 'missing', 'error',
+         'not_modified')
+
+# artworks listed by one new submissions page
+SUBMISSIONS_PER_PAGE = 72
+
+
+class MockSite(object):
+    """
+    MockSite class runs mock server in a background thread.
+
+    Attributes:
+        artist - name of the first artist, later ones are artist1, artist2...
+        artists - names of all artists
+        listings - dictionary maps ('gallery' or 'scraps', artist) to IDs of
+    artworks listed
+        artwork_ids - IDs of all artworks
+        submission_ids - IDs listed by new submissions, newest first
+        per_page - artworks listed in one gallery page
+        latency - seconds every response is delayed, simulates network round trip
+        image_size - bytes of every image
+        error_rate - fraction of requests answered with error_code
+        error_code - status code of injected errors, 503 is retried by scraper
+        recorded - dictionary maps url to (body, content type) of recorded pages
+        etags - if full pages are sent with ETag and answered 304
+        versions - dictionary maps artwork ID to times its page is changed
+        counts - dictionary maps kind in KINDS to number of requests served
+        bytes_sent - bytes of response bodies sent
+    """
+
+    def __init__(self, artwork_count=200, per_page=48, latency=0.05, image_size=32 * 1024, artist='mockartist',
+                 artist_count=1, scraps_ratio=0.0, submission_count=0, error_rate=0.0, error_code=503,
+                 recorded_pages=None, seed=0, etags=True):
+        self.artist = artist
+        self.artists = [artist] + ['artist%u' % index for index in range(1, artist_count)]
+        self.artwork_ids = list(range(40000000, 40000000 + artwork_count))
+        # artworks are dealt to artists in turn, last scraps_ratio of each go to scraps
+        self.listings = {}
+        for index, name in enumerate(self.artists):
+            ids = self.artwork_ids[index::len(self.artists)]
+            scraps_count = int(len(ids) * scraps_ratio)
+            self.listings[('gallery', name)] = ids[:len(ids) - scraps_count]
+            self.listings[('scraps', name)] = ids[len(ids) - scraps_count:]
+        self.submission_ids = self.artwork_ids[::-1][:submission_count]
+        self.per_page = per_page
+        self.latency = latency
+        self.image_size = image_size
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.random = random.Random(seed)
+        self.recorded = {}
+        for url, body in recorded_pages or []:
+            content_type = 'text/html; charset=utf-8' if url.endswith('/') else 'application/octet-stream'
+            self.recorded[url] = (body.encode('utf-8') if isinstance(body, str) else body, content_type)
+        self.etags = etags
+        self.versions = {}
+        self.counts = dict.fromkeys(KINDS, 0)
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    def start(self):
+        # start server on a free port
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                # scraper quotes '@' of submissions urls
+                kind, body, content_type = site.respond(unquote(self.path), self.headers.get('If-None-Match'))
+                time.sleep(site.latency)
+                if kind == 'error':
+                    self.send_response(site.error_code)
+                    self.send_header('Retry-After', '0')
+                elif kind == 'not_modified':
+                    self.send_response(304)
+                else:
+                    self.send_response(404 if kind == 'missing' else 200)
+                if site.etags and kind in ('full', 'not_modified'):
+                    self.send_header('ETag', site.get_etag(self.path))
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def base_url(self):
+        return 'http://127.0.0.1:%u' % self.port
+
+    @property
+    def image_host(self):
+        # same server, different host name so it gets its own rate limit
+        return 'localhost:%u' % self.port
+
+    def change_artwork(self, artwork_id):
+        # change page of an artwork, its ETag and stats change
+        with self.lock:
+            self.versions[artwork_id] = self.versions.get(artwork_id, 0) + 1
+
+    def get_page_count(self, ids):
+        return (len(ids) + self.per_page - 1) // self.per_page
+
+    def get_page_kinds(self):
+        # kinds of html pages, all kinds but image, missing and error
+        return [kind for kind in KINDS if kind not in ('image', 'missing', 'error')]
+
+    def generate_page(self, path):
+        """
+        Generate synthetic html page of path.
+
+        Args:
+            self - instance of class MockSite
+            path - requested path
+
+        Returns:
+            (kind, html) - kind of page, (None, None) if there is no such page
+        """
+        if path == '/':
+            return 'home', pages.generate_home_page('/msg/submissions/' if self.submission_ids else None,
+                                                    '/watchlist/by/%s/' % self.artist)
+        match = GALLERY_REGEX.match(path)
+        if match:
+            kind, user = match.group(1), match.group(2)
+            ids = self.listings.get((kind, user), [])
+            page = int(match.group(3) or 1)
+            listed = ids[(page - 1) * self.per_page:page * self.per_page]
+            if listed or page == 1:
+                return kind, pages.generate_gallery_page(user, page, listed, page < self.get_page_count(ids), kind)
+        match = SUBMISSIONS_REGEX.match(path)
+        if match and self.submission_ids:
+            # new~<id>@72 lists from given ID on
+            start = 0
+            if match.group(1):
+                newer = [artwork_id for artwork_id in self.submission_ids if artwork_id > int(match.group(1))]
+                start = len(newer)
+            listed = self.submission_ids[start:start + SUBMISSIONS_PER_PAGE]
+            if listed:
+                following = self.submission_ids[start + SUBMISSIONS_PER_PAGE:start + SUBMISSIONS_PER_PAGE + 1]
+                next_url = '/msg/submissions/new~%u@72/' % following[0] if following else None
+                return 'submissions', pages.generate_submissions_page(listed, next_url)
+        match = WATCHLIST_REGEX.match(path)
+        if match:
+            return 'watchlist', pages.generate_watchlist_page(match.group(1), self.artists)
+        match = FULL_REGEX.match(path)
+        if match and int(match.group(1)) in self.artwork_ids:
+            artwork_id = int(match.group(1))
+            # changed artworks get another seed
+            version = self.versions.get(artwork_id, 0)
+            return 'full', pages.generate_full_page(artwork_id, artwork_id + version * 1000000007,
+                                                    image_host=self.image_host)
+        return None, None
+
+    def get_etag(self, path):
+        # full pages are generated from artwork ID, so ID and version identify content
+        match = FULL_REGEX.match(unquote(path))
+        return '"%s-%u"' % (match.group(1), self.versions.get(int(match.group(1)), 0)) if match else ''
+
+    def respond(self, path, if_none_match=None):
+        """
+        Build response of path.
+
+        Args:
+            self - instance of class MockSite
+            path - requested path
+            if_none_match - If-None-Match header of request
+
+        Returns:
+            (kind, body, content_type) - kind of response counted, and response
+        """
+        kind, body, content_type = 'missing', b'not found', 'text/plain'
+        with self.lock:
+            inject_error = self.error_rate and self.random.random() < self.error_rate
+        if inject_error:
+            kind, body = 'error', b'service unavailable'
+        elif self.etags and if_none_match and FULL_REGEX.match(path) and if_none_match == self.get_etag(path):
+            kind, body = 'not_modified', b''
+        elif path in self.recorded:
+            kind = 'recorded'
+            body, content_type = self.recorded[path]
+        else:
+            page_kind, html = self.generate_page(path)
+            if page_kind:
+                kind, body, content_type = page_kind, html.encode('utf-8'), 'text/html; charset=utf-8'
+            match = IMAGE_REGEX.match(path)
+            if match:
+                # deterministic content, differs between artworks
+                seed = match.group(1).encode('ascii')
+                kind, body, content_type = 'image', (seed * (self.image_size // len(seed) + 1))[:self.image_size], \
+                    'image/png'
+        with self.lock:
+            self.counts[kind] = self.counts[kind] + 1
+            self.bytes_sent = self.bytes_sent + len(body)
+        return kind, body, content_type
@@ -0,0 +1,284 @@
+"""
+Synthetic FurAffinity(classic theme) pages and saved page loader, used by
+benchmarks when no recorded pages are provided.
+
+Saved pages directory holds html files and an index.json that maps each
+filename to the url it was fetched from:
+    {"26350907.html": "/full/26350907/", "gallery-foo-1.html": "/gallery/foo/1/"}
+"""
+import json
+import os
+import random
+
+KEYWORDS = ['art', 'dessin', 'ice', 'dragon', 'western', 'fantasy', 'digital', 'sketch', 'wings', 'scales']
+SPECIES = ['Western Dragon', 'Eastern Dragon', 'Wolf', 'Fox', 'Gryphon']
+CATEGORIES = ['Artwork (Digital)', 'Artwork (Traditional)', 'Story', 'Music', 'Flash']
+
+
+def generate_full_page(artwork_id, seed=None, image_host='d.furaffinity.net'):
+    """
+    Generate /full/<id>/ page of an artwork.
+
+    Args:
+        artwork_id - ID of the artwork
+        seed - random seed, defaults to artwork ID so pages are reproducible
+        image_host - host(and port) images are linked to
+
+    Returns:
+        html - html of the page
+    """
+    rand = random.Random(artwork_id if seed is None else seed)
+    artist = 'artist%u' % (artwork_id % 997)
+    title = 'Artwork number %u' % artwork_id
+    category = rand.choice(CATEGORIES)
+    keywords = rand.sample(KEYWORDS, rand.randint(1, len(KEYWORDS)))
+    timestamp = 1500000000 + artwork_id
+    extension = 'swf' if category == 'Flash' else 'png'
+    image = '//%s/art/%s/%u/%u.%s_artwork_%u.%s' % (
+        image_host, artist, timestamp, timestamp, artist, artwork_id, extension)
+    if category == 'Flash':
+        image_tag = '<object id="flash_embed" data="%s" type="application/x-shockwave-flash"></object>' % image
+    else:
+        image_tag = '<img id="submissionImg" alt="%s" src="%s" />' % (title, image)
+    rating = rand.choice(['General', 'Mature', 'Adult'])
+    keyword_links = '\n'.join('<a href="/search/@keywords %s">%s</a>' % (keyword, keyword) for keyword in keywords)
+    # filler comments make page size close to a real one
+    comments = '\n'.join(
+        '<table class="container-comment" id="cid:%u"><tr><td class="alt1">'
+        '<a href="/user/commenter%u/">commenter%u</a> wrote: comment text %u</td></tr></table>' % (
+            artwork_id * 100 + index, index, index, index) for index in range(rand.randint(0, 40)))
+    return '''<!DOCTYPE html>
+<html>
+<head>
+<title>%(title)s by %(artist)s -- Fur Affinity [dot] net</title>
+<meta property="og:title" content="%(title)s by %(artist)s" />
+<meta name="twitter:data2" content="%(rating)s" />
+</head>
+<body>
+<div class="block-menu-top"><a href="/msg/submissions/">Submissions</a> <a href="/user/%(artist)s/">%(artist)s</a></div>
+<table class="maintable" width="100%%">
+<tr><td class="cat" valign="top">
+<b>%(title)s</b> - by <a href="/user/%(artist)s/">%(artist)s</a>
+</td></tr>
+<tr><td class="alt1">
+<div class="classic-submission-title information"><h2>%(title)s</h2>
+by <a href="/user/%(artist)s/"><strong title="%(artist)s">%(artist)s</strong></a></div>
+<b><a href="%(image)s">Download</a></b>
+%(image_tag)s
+</td></tr>
+</table>
+<table class="maintable" width="100%%">
+<tr><td class="cat">Submission Information</td></tr>
+<tr><td valign="top" align="left" width="70%%" class="alt1 stats-container">
+<b>Submission Information:</b><br/>
+<b>Posted:</b> <span title="Jul 14th, 2017 02:40 AM" class="popup_date">Jul 14th, 2017 02:40 AM</span><br/>
+<b>Category:</b> %(category)s<br/>
+<b>Theme:</b> Fantasy<br/>
+<b>Species:</b> %(species)s<br/>
+<b>Gender:</b> Male<br/>
+<b>Favorites:</b> %(favorites)u<br/>
+<b>Comments:</b> %(comments_count)u<br/>
+<b>Views:</b> %(views)u<br/>
+<b>Resolution:</b> 1920x1080<br/>
+<br/>
+<div id="keywords">
+%(keyword_links)s
+</div>
+<div align="left"><img alt="%(rating)s rating" src="/themes/classic/img/labels/%(rating)s.gif" /></div>
+</td></tr>
+<tr><td class="alt1" width="100%%">Description of artwork %(artwork_id)u, drawn by %(artist)s.</td></tr>
+</table>
+%(comments)s
+<div class="footer">
+<div class="online-stats">%(online)u users online (%(guests)u guests, %(registered)u <b>registered</b> and 120 other)</div>
+</div>
+</body>
+</html>
+''' % {'title': title, 'artist': artist, 'rating': rating, 'image': image, 'image_tag': image_tag,
+       'category': category, 'species': rand.choice(SPECIES), 'favorites': rand.randint(0, 500),
+       'comments_count': rand.randint(0, 40), 'views': rand.randint(0, 5000), 'keyword_links': keyword_links,
+       'artwork_id': artwork_id, 'comments': comments, 'online': 12000, 'guests': 3000,
+       'registered': rand.choice([8000, 9000, 11000])}
+
+
+def generate_gallery_page(user, page, artwork_ids, has_next=True, kind='gallery'):
+    """
+    Generate /gallery/<user>/<page>/ or /scraps/<user>/<page>/ page.
+
+    Args:
+        user - name of the artist
+        page - page number
+        artwork_ids - IDs of artworks listed in the page
+        has_next - if there is a next page link
+        kind - 'gallery' or 'scraps'
+
+    Returns:
+        html - html of the page
+    """
+    figures = '\n'.join(
+        '<figure id="sid-%u" class="r-general t-image"><b><u><a href="/view/%u/">'
+        '<img alt="" src="//t.furaffinity.net/%u@200-1500000000.jpg"/></a></u></b>'
+        '<figcaption><p><a href="/view/%u/" title="Artwork number %u">Artwork number %u</a></p>'
+        '<p><i>by</i> <a href="/user/%s/" title="%s">%s</a></p></figcaption></figure>' % (
+            artwork_id, artwork_id, artwork_id, artwork_id, artwork_id, artwork_id, user, user, user)
+        for artwork_id in artwork_ids)
+    next_link = '<a class="button-link right" href="/%s/%s/%u/">Next  &gt;&gt;</a>' % (
+        kind, user, page + 1) if has_next else ''
+    return '''<!DOCTYPE html>
+<html>
+<head><title>%(title)s for %(user)s -- Fur Affinity [dot] net</title></head>
+<body>
+<div class="block-menu-top"><a href="/msg/submissions/">Submissions</a> <a href="/user/%(user)s/">%(user)s</a></div>
+<table class="maintable"><tr><td class="cat">Gallery</td></tr><tr><td class="alt1">
+<section class="gallery s-250">
+%(figures)s
+</section>
+<div class="page-options">%(next_link)s</div>
+</td></tr></table>
+<div class="footer"><div class="online-stats">12000 users online (3000 guests, 9000 <b>registered</b> and 120 other)</div></div>
+</body>
+</html>
+''' % {'user': user, 'figures': figures, 'next_link': next_link,
+       'title': 'Scraps' if kind == 'scraps' else 'Artwork Gallery'}
+
+
+def generate_submissions_page(artwork_ids, next_url=None, prev_url=None):
+    """
+    Generate /msg/submissions/ page.
+
+    Args:
+        artwork_ids - IDs of artworks listed in the page
+        next_url - url of next page, None if last page
+        prev_url - url of previous page, None if first page
+
+    Returns:
+        html - html of the page
+    """
+    figures = '\n'.join(
+        '<figure id="sid-%u" class="r-general t-image"><b><u><a href="/view/%u/">'
+        '<img alt="" src="//t.furaffinity.net/%u@200-1500000000.jpg"/></a></u></b></figure>' % (
+            artwork_id, artwork_id, artwork_id) for artwork_id in artwork_ids)
+    links = ''
+    if prev_url:
+        links = links + '<a class="more prev" href="%s">Prev 72</a>' % prev_url
+    if next_url:
+        links = links + '<a class="more" href="%s">Next 72</a>' % next_url
+        links = links + '<a class="more-half" href="%s">Next 36</a>' % next_url
+    return '''<!DOCTYPE html>
+<html>
+<head><title>New Submissions -- Fur Affinity [dot] net</title></head>
+<body>
+<!-- <a class="more" href="/msg/submissions/old/">commented out</a> -->
+<script type="text/javascript">var next = '<a class="more" href="/js/">';</script>
+<form><section class="gallery messagecenter">
+%(figures)s
+</section>
+<div class="navigation">%(links)s</div></form>
+</body>
+</html>
+''' % {'figures': figures, 'links': links}
+
+
+def generate_watchlist_page(user, watched_users):
+    """
+    Generate /watchlist/by/<user>/ page.
+
+    Args:
+        user - owner of the watchlist
+        watched_users - names of watched users
+
+    Returns:
+        html - html of the page
+    """
+    anchors = '\n'.join('<span class="artist_name"><a href="/user/%s/">%s</a></span>' % (watched, watched)
+                         for watched in watched_users)
+    return '''<!DOCTYPE html>
+<html>
+<head><title>Users watched by %(user)s -- Fur Affinity [dot] net</title></head>
+<body>
+<table class="maintable"><tr><td class="alt1">
+%(anchors)s
+</td></tr></table>
+</body>
+</html>
+''' % {'user': user, 'anchors': anchors}
+
+
+def generate_home_page(more_url=None, right_url=None):
+    """
+    Generate front page linking to other pages. Scraper only follows figures,
+    "more" anchors and "button-link right" anchors of a page that isn't a
+    watchlist, so links are made of them.
+
+    Args:
+        more_url - url of "more" anchor, None if absent
+        right_url - url of "button-link right" anchor, None if absent
+
+    Returns:
+        html - html of the page
+    """
+    links = ''
+    if more_url:
+        links = links + '<a class="more" href="%s">New Submissions</a>' % more_url
+    if right_url:
+        links = links + '<a class="button-link right" href="%s">Watching</a>' % right_url
+    return '''<!DOCTYPE html>
+<html>
+<head><title>Fur Affinity [dot] net</title></head>
+<body>
+<div class="navigation">%(links)s</div>
+</body>
+</html>
+''' % {'links': links}
+
+
+def generate_pages(count, kind='full'):
+    """
+    Generate pages for benchmark.
+
+    Args:
+        count - number of pages
+        kind - 'full', 'gallery', 'submissions' or 'watchlist'
+
+    Returns:
+        pages - list of (url, html)
+    """
+    pages = []
+    for index in range(count):
+        if kind == 'full':
+            artwork_id = 20000000 + index
+            pages.append(('/full/%u/' % artwork_id, generate_full_page(artwork_id)))
+        elif kind == 'submissions':
+            artwork_ids = range(30000000 + index * 72, 30000000 + index * 72 + 72)
+            url = '/msg/submissions/new~%u@72/' % (30000000 + index * 72)
+            pages.append((url, generate_submissions_page(
+                artwork_ids, '/msg/submissions/new~%u@72/' % (30000000 + (index + 1) * 72),
+                url if index else None)))
+        elif kind == 'watchlist':
+            user = 'watcher%u' % index
+            watched_users = ['artist%u' % ((index * 31 + offset) % 997) for offset in range(200)]
+            pages.append(('/watchlist/by/%s/' % user, generate_watchlist_page(user, watched_users)))
+        else:
+            user = 'artist%u' % (index % 997)
+            artwork_ids = range(20000000 + index * 48, 20000000 + index * 48 + 48)
+            pages.append(('/gallery/%s/%u/' % (user, index + 1), generate_gallery_page(user, index + 1, artwork_ids)))
+    return pages
+
+
+def load_saved_pages(directory):
+    """
+    Load saved pages from directory with index.json.
+
+    Args:
+        directory - directory holds pages and index.json
+
+    Returns:
+        pages - list of (url, html bytes)
+    """
+    with open(os.path.join(directory, 'index.json'), 'r') as file:
+        index = json.load(file)
+    pages = []
+    for filename, url in sorted(index.items()):
+        with open(os.path.join(directory, filename), 'rb') as page:
+            pages.append((url, page.read()))
+    return pages
@@ -1,30 +1,52 @@
 from fa_scraper import *
 
 import argparse
+import atexit
 import sys
 import os
 import signal
 import pickle
 
-import json
-
 import logging
 import logging.config
 import logging.handlers
 
 
 def signal_handler(signum, frame):
-    # exit signal received, use pickle to dump scraper
+    # exit signal received, scrapying progress is already saved in frontier
     logger.info('exit signal received, saving scrapying progress...')
     logger.info('current scraper with %u urls scrapied, and %u scrapying urls.' % (
-        len(scraper.scrapied_set), len(scraper.scrapying_queue)))
-    with open('scraper.cache', 'wb') as temp_cache:
-        pickle.dump(scraper, temp_cache)
-        logger.info('successfully saved scrapying progress to scraper.cache.')
+        scraper.frontier.get_scrapied_count(), scraper.frontier.get_queue_length()))
+    # save artworks already downloaded, unfinished ones are requeued
+    for artwork in scraper.get_downloaded_artworks():
+        save_artwork(db, artwork)
+    scraper.close_scraper()
+
+    # write buffered artworks before exit
+    db.close_db()
 
     exit(0)
 
 
+def save_artwork(db, artwork):
+    """
+    Save scrapied artwork into database.
+
+    Args:
+        db - database instance
+        artwork - attributes dictionary of artwork
+    """
+    # extend added time
+    artwork['Added'] = util.get_current_time()
+
+    information = util.get_artwork_information(artwork)
+    logger.info('scrapied artwork information: %s' % information)
+
+    # insert into database
+    db.insert_or_replace_artwork(artwork)
+    logger.info('completed to scrapy artwork with ID: %u.' % artwork.get('ID'))
+
+
 def parse_arguments():
     """
     Parse arguments from commandline.
@@ -37,14 +59,54 @@ def parse_arguments():
         description='A scraper of furaffinity.net written with python.'
     )
 
-    # scrapy-mode - can be choosen from 'default', 'update'
+    # scrapy-mode - can be choosen from 'default', 'update', 'reparse'
     # default is 'default', set scrapy mode
     argparser.add_argument(
         '-m', '--scrapy-mode',
         nargs=1,
         default=['default'],
-        choices=['default', 'update'],
-        help='sets scrapying mode, default: default'
+        choices=['default', 'update', 'reparse'],
+        help='sets scrapying mode, reparse rebuilds artwork records from pages in responses.db without '
+             'network requests, default: default'
+    )
+
+    # engine - can be choosen from 'sync', 'async'
+    # only works when scrapy-mode is 'default'
+    argparser.add_argument(
+        '--engine',
+        nargs=1,
+        default=['sync'],
+        choices=['sync', 'async'],
+        help='sets crawl engine, async fetches pages concurrently and needs "pip install aiohttp", default: sync'
+    )
+
+    # async-concurrency - int, max requests in flight per host when engine is 'async'
+    argparser.add_argument(
+        '--async-concurrency',
+        nargs=1,
+        type=int,
+        default=[4],
+        help='sets max requests in flight per host of async engine, still limited by scrapy interval, default: 4'
+    )
+
+    # parse-workers - int, processes parsing pages for async engine, 0 parses in a thread
+    argparser.add_argument(
+        '--parse-workers',
+        nargs=1,
+        type=int,
+        default=[0],
+        help='sets number of processes parsing pages for async engine, 0 parses in a thread, '
+             'in reparse mode 0 uses all cores, default: 0'
+    )
+
+    # response-store - can be choosen from 'none', 'gzip', 'zstd'
+    argparser.add_argument(
+        '--response-store',
+        nargs=1,
+        default=['none'],
+        choices=['none', 'gzip', 'zstd'],
+        help='records raw html of scrapied pages compressed in responses.db for reparse mode, '
+             'zstd needs "pip install zstandard", default: none'
     )
 
     # expire-time - int, set expire time
@@ -57,6 +119,17 @@ def parse_arguments():
         help='sets expire time(days) for scrapied images, default: 15'
     )
 
+    # refresh-workers - int, threads refreshing expired artworks
+    # only works when scrapy-mode is 'update'
+    argparser.add_argument(
+        '--refresh-workers',
+        nargs=1,
+        type=int,
+        default=[2],
+        help='sets number of threads refreshing expired artworks in update mode, requests are still limited by '
+             'scrapy interval, default: 2'
+    )
+
     # scrapy-interval - float ,set scraper's sleep interval between two requests
     argparser.add_argument(
         '-i', '--scrapy-interval',
@@ -66,6 +139,83 @@ def parse_arguments():
         help='sets sleep interval(seconds) between two network requests, default: 60'
     )
 
+    # db-batch-size - int, number of artworks buffered before written to database
+    argparser.add_argument(
+        '--db-batch-size',
+        nargs=1,
+        type=int,
+        default=[100],
+        help='sets number of artworks buffered before written to database in one transaction, '
+             '1 commits every artwork, default: 100'
+    )
+
+    # db-flush-interval - float, max seconds buffered artworks wait before written to database
+    argparser.add_argument(
+        '--db-flush-interval',
+        nargs=1,
+        type=float,
+        default=[30],
+        help='sets max seconds buffered artworks wait before written to database, default: 30'
+    )
+
+    # visited-bloom-size - int, bits of bloom filter used to remember scrapied non-view urls
+    argparser.add_argument(
+        '--visited-bloom-size',
+        nargs=1,
+        type=int,
+        default=[0],
+        help='sets bits of bloom filter that remembers scrapied non-view urls in memory, '
+             '0 stores 64-bit hashes instead, default: 0'
+    )
+
+    # download-interval - float, interval between two requests to each image host
+    argparser.add_argument(
+        '--download-interval',
+        nargs=1,
+        type=float,
+        default=[1],
+        help='sets interval(seconds) between two requests to each image host, '
+             'separate from scrapy interval of html pages, default: 1'
+    )
+
+    # download-workers - int, number of threads downloading images
+    argparser.add_argument(
+        '--download-workers',
+        nargs=1,
+        type=int,
+        default=[2],
+        help='sets number of threads downloading images while pages are scrapied, '
+             '0 downloads images in scrapying loop, default: 2'
+    )
+
+    # download-queue-size - int, max number of images waiting for download workers
+    argparser.add_argument(
+        '--download-queue-size',
+        nargs=1,
+        type=int,
+        default=[16],
+        help='sets max number of images waiting for download workers, default: 16'
+    )
+
+    # http-pool-size - int, max connections kept alive per host, 0 means download workers + 1
+    argparser.add_argument(
+        '--http-pool-size',
+        nargs=1,
+        type=int,
+        default=[0],
+        help='sets max connections kept alive per host, default: 0(download workers + 1)'
+    )
+
+    # image-links - how image paths point to content-addressed blobs, 'none' saves plain files
+    argparser.add_argument(
+        '--image-links',
+        nargs=1,
+        default=['hardlink'],
+        choices=['hardlink', 'symlink', 'none'],
+        help='sets how image paths link to deduplicated blobs in images/.blobs, none saves plain files, '
+             'default: hardlink'
+    )
+
     # cookies - filename, use cookies(json) provided to scrape as logined
     argparser.add_argument(
         '-c', '--cookies',
@@ -87,6 +237,58 @@ def parse_arguments():
         help='skip integrity check(ONLY works in default mode) between database and images'
     )
 
+    # check-workers - int, threads scanning images directory in integrity check
+    argparser.add_argument(
+        '--check-workers',
+        nargs=1,
+        type=int,
+        default=[8],
+        help='sets number of threads scanning images directory in integrity check, default: 8'
+    )
+
+    # refresh-metadata - when specified, scrapy archived artworks again to update metadata, images are kept
+    argparser.add_argument(
+        '--refresh-metadata',
+        action='store_true',
+        help='scrapy pages of archived artworks again to update their metadata, images are not downloaded again'
+    )
+
+    # metrics-file - filename, write stage timings and counters to it periodically
+    argparser.add_argument(
+        '--metrics-file',
+        nargs=1,
+        default=[''],
+        help='writes per-stage timing metrics to file every %us, JSON if it ends with .json, '
+             'Prometheus text otherwise, default: disabled' % metrics.WRITE_INTERVAL
+    )
+
+    # metrics-port - int, serve metrics on localhost, 0 means disabled
+    argparser.add_argument(
+        '--metrics-port',
+        nargs=1,
+        type=int,
+        default=[0],
+        help='serves metrics on http://127.0.0.1:<port>/metrics(Prometheus) and /metrics.json, '
+             'default: 0(disabled)'
+    )
+
+    # profile - can be choosen from 'none', 'cprofile', 'pyinstrument'
+    argparser.add_argument(
+        '--profile',
+        nargs=1,
+        default=['none'],
+        choices=['none', 'cprofile', 'pyinstrument'],
+        help='profiles main loop, pyinstrument samples and needs "pip install pyinstrument", default: none'
+    )
+
+    # profile-output - filename, report of profiler
+    argparser.add_argument(
+        '--profile-output',
+        nargs=1,
+        default=['fa_scraper.prof'],
+        help='sets file profile is saved to, cProfile stats or pyinstrument html, default: fa_scraper.prof'
+    )
+
     # log-level - cen be choosen from 'debug', 'info', 'warning', 'error', 'fatal'
     # default is info, set the console log level
     argparser.add_argument(
@@ -117,6 +319,15 @@ def parse_arguments():
         help='specifies if and how you want subfolders set'
     )
 
+    # parser-backend - tree builder used to parse html, lxml is faster but needs to be installed
+    argparser.add_argument(
+        '--parser-backend',
+        nargs=1,
+        default=['html.parser'],
+        choices=['html.parser', 'lxml'],
+        help='sets html parser backend, lxml is faster but needs "pip install lxml", default: html.parser'
+    )
+
     # descriptions
     argparser.add_argument(
         '--descriptions',
@@ -222,43 +433,35 @@ def config_logger(console_log_level):
     return fa_logger
 
 
-def check_and_fix_artworks(db, scraper):
+def check_and_fix_artworks(db, scraper, worker_count=8):
     """
     Integrity check step.
     Traverse through database and see if for each artwork,
-    there exists a corresponding image in images subdirectory.
+    there exists a corresponding image in images directory or its subdirectories.
     If there are artworks missing, remove them from database, and add there urls
     to scraper's scrapying queue.
+    Images directory is recorded in an on-disk manifest, only directories
+    changed since last check are scanned.
     ONLY works in default mode.
 
     Args:
         db - database instance
         scraper - scraper instance
+        worker_count - number of threads scanning directories
     """
-    # get all artwork IDs from artwork, and initialize a set
-    artwork_ids = set(db.get_artwork_ids())
-    # traverse through 'images' subdirectory
-    os.chdir('images')
-    logger.debug('changed working directory to images.')
-
-    artworks = os.listdir('.')
-    for artwork in artworks:
-        if os.path.isfile(artwork):
-            artwork_id = int(os.path.splitext(os.path.basename(artwork))[0])
-            # if exists image named 'artwork ID', remove it from set
-            if artwork_id in artwork_ids:
-                artwork_ids.remove(artwork_id)
-
-    # remove remaining artwork records from database
-    db.delete_artworks(artwork_ids)
-
-    # convert artwork IDs to urls and add to scrapying queue
-    unscrapied_urls = list(map(util.generate_url_from_id, list(artwork_ids)))
+    manifest = integrity.ImageManifest('fa_scraper.db', worker_count)
+    manifest.update('images')
+    manifest.close()
+
+    # remove artworks without an image in manifest, set difference is done by
+    # sqlite so IDs aren't loaded into memory
+    delete_count, deleted_ids = db.delete_artworks(db.iter_artwork_ids_without_image())
+
+    # convert deleted artwork IDs to urls and add to scrapying queue
+    unscrapied_urls = list(map(util.generate_url_from_id, deleted_ids))
     scraper.add_unscrapied_urls(unscrapied_urls)
 
-    os.chdir('..')
-    logger.debug('changed working directory to origin.')
-    logger.info('%u wrong records removed from database.' % len(artwork_ids))
+    logger.info('%u wrong records removed from database.' % delete_count)
 
 
 if __name__ == '__main__':
@@ -278,126 +481,178 @@ if __name__ == '__main__':
     scrapy.description_arg = arguments.descriptions[0]
 
     parse.resume_on_user = arguments.watchlist_resume[0]
+    parse.parser_backend = arguments.parser_backend[0]
+
+    # metrics are recorded only if they are exported
+    if arguments.metrics_file[0] or arguments.metrics_port[0]:
+        metrics.enabled = True
+        if arguments.metrics_file[0]:
+            metrics_writer = metrics.MetricsWriter(arguments.metrics_file[0])
+            atexit.register(metrics_writer.close)
+        if arguments.metrics_port[0]:
+            metrics.MetricsServer(arguments.metrics_port[0])
+
+    profiler = None
+    if arguments.profile[0] != 'none':
+        if arguments.profile[0] == 'pyinstrument' and metrics.pyinstrument is None:
+            logger.fatal('pyinstrument profiler needs pyinstrument, install it with "pip install pyinstrument".')
+            exit(-1)
+        profiler = metrics.Profiler(arguments.profile[0], arguments.profile_output[0])
 
     # set signal handler
     signal.signal(signal.SIGINT, signal_handler)
 
     # initialize database and scraper
-    db = database.Database('fa_scraper.db')
-    if util.if_cache_exists():
-        # trying to load scraper from scraper.cache
-        with open('scraper.cache', 'rb') as temp:
-            scraper = pickle.load(temp)
-            logger.info('continued with last scrapying progress, with %u scrapied urls and %u scrapying urls.' % (
-                len(scraper.scrapied_set), len(scraper.scrapying_queue)))
-        # os.remove('scraper.cache') commented for potiential error
-
-        # fix Scraper lazy load *manually* because pickle will NOT save class variable
-        scrapy.Scraper.SCRAPIED_BASE = True
+    db = database.Database('fa_scraper.db', arguments.db_batch_size[0], arguments.db_flush_interval[0])
+    cookies = {}
+    if arguments.cookies:
+        # load provided cookies from file
+        cookies = util.get_cookies(arguments.cookies[0])
+
+    begin_url = None
+    if arguments.begin_url:
+        # alternative begin-url specified
+        begin_url = arguments.begin_url[0]
+
+    description_arg = 'none'
+    if arguments.descriptions[0]:
+        description_arg = arguments.descriptions[0]
+
+    fileNaming = '%Y-%m-%d_%H-%M {title} by {user}'
+    if arguments.file_naming:
+        # alternate file naming formate specified
+        fileNaming = arguments.file_naming[0]
+
+    startingId = 1
+    if arguments.starting_id:
+        # alternate starting id
+        startingId = arguments.starting_id[0]
+
+    stopId = 0
+    if arguments.stop_id:
+        # alternate stop id
+        stopId = arguments.stop_id[0]
+
+    if arguments.engine[0] == 'async' and engine.aiohttp is None:
+        logger.fatal('async engine needs aiohttp, install it with "pip install aiohttp".')
+        exit(-1)
 
-        description_arg = 'none'
-        if arguments.descriptions[0]:
-            scraper.description_arg = arguments.descriptions[0]
+    response_store = None
+    if arguments.response_store[0] != 'none':
+        if arguments.response_store[0] == 'zstd' and replay.zstandard is None:
+            logger.fatal('zstd response store needs zstandard, install it with "pip install zstandard".')
+            exit(-1)
+        response_store = replay.ResponseStore('responses.db', arguments.response_store[0])
 
-        # reset scrapy_interval
-        scraper.scrapy_interval = arguments.scrapy_interval[0]
+    # only default mode downloads images, update and reparse mode don't need
+    # download pool or blob store
+    scrapy_mode = arguments.scrapy_mode[0]
+    blob_store = None
+    if scrapy_mode == 'default' and arguments.image_links[0] != 'none':
+        # store images by content, database has created index tables
+        blob_store = blobstore.BlobStore('fa_scraper.db', link_mode=arguments.image_links[0])
+
+    download_workers = arguments.download_workers[0] if scrapy_mode == 'default' else 0
+    if scrapy_mode == 'default' and arguments.engine[0] == 'async' and download_workers < 1:
+        # async engine never downloads images in its event loop
+        logger.info('async engine needs download workers, set download workers to 1.')
+        download_workers = 1
+
+    id_mode = 'false'
+    if arguments.id_mode:
+        # use id mode?
+        id_mode = arguments.id_mode[0]
+
+    if id_mode == 'false':
+        scraper = scrapy.Scraper(arguments.scrapy_interval[0], cookies, begin_url, description_arg=description_arg,
+                                 visited_bloom_size=arguments.visited_bloom_size[0],
+                                 download_workers=download_workers,
+                                 download_queue_size=arguments.download_queue_size[0],
+                                 download_interval=arguments.download_interval[0],
+                                 http_pool_size=arguments.http_pool_size[0], blob_store=blob_store, database=db,
+                                 refresh_metadata=arguments.refresh_metadata, response_store=response_store)
+    elif id_mode == 'true':
+        scraper = scrapy.Scraper(arguments.scrapy_interval[0], cookies, begin_url, startingId, stopId, id_mode,
+                                 description_arg, visited_bloom_size=arguments.visited_bloom_size[0],
+                                 download_workers=download_workers,
+                                 download_queue_size=arguments.download_queue_size[0],
+                                 download_interval=arguments.download_interval[0],
+                                 http_pool_size=arguments.http_pool_size[0], blob_store=blob_store, database=db,
+                                 refresh_metadata=arguments.refresh_metadata, response_store=response_store)
     else:
-        cookies = {}
-        if arguments.cookies:
-            # load provided cookies from file
-            cookies = util.get_cookies(arguments.cookies[0])
-
-        begin_url = None
-        if arguments.begin_url:
-            # alternative begin-url specified
-            begin_url = arguments.begin_url[0]
-
-        description_arg = 'none'
-        if arguments.descriptions[0]:
-            description_arg = arguments.descriptions[0]
-
-        fileNaming = '%Y-%m-%d_%H-%M {title} by {user}'
-        if arguments.file_naming:
-            # alternate file naming formate specified
-            fileNaming = arguments.file_naming[0]
-
-        startingId = 1
-        if arguments.starting_id:
-            # alternate starting id
-            startingId = arguments.starting_id[0]
-
-        stopId = 0
-        if arguments.stop_id:
-            # alternate stop id
-            stopId = arguments.stop_id[0]
-
-        id_mode = 'false'
-        if arguments.id_mode:
-            # use id mode?
-            id_mode = arguments.id_mode[0]
-
-        if id_mode == 'false':
-            scraper = scrapy.Scraper(arguments.scrapy_interval[0], cookies, begin_url, description_arg)
-        elif id_mode == 'true':
-            scraper = scrapy.Scraper(arguments.scrapy_interval[0], cookies, begin_url, startingId, stopId, id_mode,
-                                     description_arg)
-        else:
-            logger.error('arg id mode is neither true nor false')
+        logger.error('arg id mode is neither true nor false')
+
+    if util.if_cache_exists():
+        # import progress saved by older versions, which pickled whole scraper
+        with open('scraper.cache', 'rb') as temp:
+            cached_scraper = pickle.load(temp)
+        scraper.frontier.import_urls(cached_scraper.scrapied_set, cached_scraper.scrapying_queue)
+        scraper.frontier.set_state('base_scrapied', 'scraper.cache')
+        os.rename('scraper.cache', 'scraper.cache.imported')
+        logger.info('imported scraper.cache into frontier, renamed it to scraper.cache.imported.')
+
+    if scraper.frontier.get_state('base_scrapied'):
+        logger.info('continued with last scrapying progress, with %u scrapied urls and %u scrapying urls.' % (
+            scraper.frontier.get_scrapied_count(), scraper.frontier.get_queue_length()))
 
     logger.info('initialization completed.')
 
-    scrapy_mode = arguments.scrapy_mode[0]
     logger.info('scrapy mode set to %s' % scrapy_mode)
 
     # try to perform integrity check
     if not arguments.skip_check:
         if scrapy_mode == 'default':
-            check_and_fix_artworks(db, scraper)
+            check_and_fix_artworks(db, scraper, arguments.check_workers[0])
             logger.info('integrity check completed.')
         else:
-            logger.info('will not perform integrity check in update mode.')
+            logger.info('will not perform integrity check in %s mode.' % scrapy_mode)
     else:
         logger.info('skipped integrity check.')
 
-    # main body
-    if scrapy_mode == 'default':
+    # main body, default mode only ends by signal, so profile is saved at exit
+    if profiler:
+        profiler.start()
+        atexit.register(profiler.stop)
+    if scrapy_mode == 'default' and arguments.engine[0] == 'async':
+        # scrapy concurrently until queue is empty and downloads are finished
+        parse_pool = parsepool.ParsePool(arguments.parse_workers[0]) if arguments.parse_workers[0] > 0 else None
+        crawl_engine = engine.AsyncEngine(scraper, lambda artwork: save_artwork(db, artwork),
+                                          arguments.async_concurrency[0], parse_pool=parse_pool)
+        crawl_engine.run()
+        if parse_pool:
+            parse_pool.shutdown()
+    elif scrapy_mode == 'default':
         while True:
             # scrapy loop
             # try to get artwork from scraper
             artwork = scraper.scrapy_pending_url()
             if artwork:
-                # extend added time
-                artwork['Added'] = util.get_current_time()
-
-                information = json.dumps(artwork)
-                logger.info('scrapied artwork information: %s' % information)
-
-                # insert into database
-                db.insert_or_replace_artwork(artwork)
-                logger.info('completed to scrapy artwork with ID: %u.' % artwork.get('ID'))
-            else:
+                save_artwork(db, artwork)
+            elif not scraper.download_pool:
                 logger.info('didn\'t scrapy artwork in current round.')
-    elif scrapy_mode == 'update':
-        # get expired artwork IDs from database
-        expired_artwork_ids = db.get_expired_artwork_ids(arguments.expire_time[0])
-        logger.info('retrieved all expired artwork IDs.')
-
-        for artwork_id in expired_artwork_ids:
-            # try to artwork attributes
-            artwork = scraper.scrapy_expired_url(util.generate_url_from_id(artwork_id))
-            if artwork:
-                # update added time and set ID
-                artwork['ID'] = artwork_id
-                artwork['Added'] = util.get_current_time()
-
-                information = json.dumps(artwork)
-                logger.info('updated artwork information: %s' % information)
 
-                # replace record in database
-                db.insert_or_replace_artwork(artwork)
-                logger.info('completed to re-scrapy expired artwork(with ID: %u)\'s info .' % artwork.get('ID'))
-
-    db.close_db(conn)
+            # artworks downloaded by download pool
+            for artwork in scraper.get_downloaded_artworks():
+                save_artwork(db, artwork)
+    elif scrapy_mode == 'update':
+        # refresh expired artworks in order of priority, progress is kept in database.
+        # scheduler stops its workers on interrupt, then database is closed below
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        refresh_scheduler = refresh.RefreshScheduler(db, scraper, arguments.refresh_workers[0])
+        refresh_scheduler.run(arguments.expire_time[0])
+    elif scrapy_mode == 'reparse':
+        # rebuild records from recorded pages, nothing is fetched
+        if not os.path.isfile('responses.db'):
+            logger.fatal('no recorded pages, scrapy with --response-store first.')
+            exit(-1)
+        stored_responses = response_store or replay.ResponseStore('responses.db')
+        replay.reparse_artworks(stored_responses, db, arguments.parse_workers[0])
+        if not response_store:
+            stored_responses.close()
+
+    # sync default mode only ends by signal, other modes get here
+    scraper.close_scraper()
+    db.close_db()
 
     logger.info('exiting scraper...')
     exit(0)
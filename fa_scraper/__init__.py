@@ -1 +1 @@
-__all__ = ['database', 'scrapy', 'util', 'parse', 'constant']
+__all__ = ['blobstore', 'database', 'download', 'engine', 'frontier', 'integrity', 'metrics', 'scrapy', 'util', 'parse', 'parsepool', 'ratelimit', 'refresh', 'replay', 'session', 'constant', 'visited']
@@ -0,0 +1,142 @@
+import sqlite3
+
+from fa_scraper import util
+
+import os
+import threading
+
+import logging
+
+logger = logging.getLogger('default')
+
+
+class BlobStore(object):
+    """
+    BlobStore class to keep downloaded images content-addressed by SHA-256.
+    Every distinct content is stored once under blob directory, and readable
+    paths under images directory are hardlinks(or symlinks) to blobs, so the
+    same image saved under several paths, crawled again or downloaded as alt
+    link doesn't take space again.
+    Blob and file index are BLOB and FILE tables of fa_scraper.db, created by
+    Database's migration. Store is used by download workers, so it has its own
+    connection guarded by a lock.
+
+    Attributes:
+        conn - connection to database holds index tables
+        images_directory - directory readable paths are relative to
+        blob_directory - directory blobs are stored in, must be on the same file
+    system as images directory for hardlinks
+        link_mode - 'hardlink' or 'symlink', hardlink falls back to symlink if
+    file system refuses it
+        saved_bytes - bytes not written again because content was stored
+    """
+
+    def __init__(self, database_name, images_directory='images', blob_directory='images/.blobs',
+                 link_mode='hardlink'):
+        # timeout is needed as main thread writes artworks to the same database
+        self.conn = sqlite3.connect(database_name, timeout=60, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.images_directory = images_directory
+        self.blob_directory = blob_directory
+        self.link_mode = link_mode
+        self.saved_bytes = 0
+        os.makedirs(blob_directory, exist_ok=True)
+        logger.debug('blob store initialized, %s readable paths to "%s".' % (link_mode, blob_directory))
+
+    def get_blob_path(self, sha256):
+        # fan out by first two hex digits, keeps directories small
+        return os.path.join(self.blob_directory, sha256[:2], sha256)
+
+    def store(self, path, filename, sha256, artwork_id=None):
+        """
+        Move downloaded file into store, and link its readable path to blob.
+        If content is already stored, downloaded file is removed instead.
+
+        Args:
+            self - instance of class BlobStore
+            path - path of downloaded file, it is moved or removed
+            filename - readable path relative to images directory
+            sha256 - hex SHA-256 of downloaded file
+            artwork_id - ID of the artwork, defaults to the one in filename
+
+        Returns:
+            stored - True if content is new, False if it was deduplicated
+        """
+        if artwork_id is None:
+            artwork_id = util.get_artwork_id_from_filename(filename)
+        blob_path = self.get_blob_path(sha256)
+        size = os.path.getsize(path)
+        with self.lock:
+            known = self.conn.execute('SELECT 1 FROM BLOB WHERE SHA256 = ?;', (sha256,)).fetchone()
+            stored = not (known and os.path.isfile(blob_path))
+            if stored:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(path, blob_path)
+            else:
+                os.remove(path)
+                self.saved_bytes = self.saved_bytes + size
+            self.link(blob_path, os.path.join(self.images_directory, filename))
+            with self.conn:
+                self.conn.execute('INSERT OR IGNORE INTO BLOB (SHA256, SIZE, ADDED) VALUES(?, ?, ?);',
+                                  (sha256, size, util.get_current_time()))
+                self.conn.execute('INSERT OR REPLACE INTO FILE (PATH, SHA256, ARTWORK_ID) VALUES(?, ?, ?);',
+                                  (filename, sha256, artwork_id))
+        if stored:
+            logger.debug('stored blob %s for "%s".' % (sha256, filename))
+        else:
+            logger.info('"%s" has the same content as stored blob %s, skipped %u bytes.' % (filename, sha256, size))
+        return stored
+
+    def has_artwork_file(self, artwork_id):
+        # True if a readable path of the artwork is indexed and still exists
+        with self.lock:
+            rows = self.conn.execute('SELECT PATH FROM FILE WHERE ARTWORK_ID = ?;', (artwork_id,)).fetchall()
+        return any(os.path.exists(os.path.join(self.images_directory, path)) for path, in rows)
+
+    def link(self, blob_path, link_path):
+        """
+        Point readable path to blob, replacing whatever is there atomically.
+
+        Args:
+            self - instance of class BlobStore
+            blob_path - path of stored blob
+            link_path - readable path
+        """
+        if os.path.exists(link_path) and os.path.samefile(blob_path, link_path):
+            return
+        temp_path = link_path + '.link'
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        if self.link_mode == 'hardlink':
+            try:
+                os.link(blob_path, temp_path)
+                os.replace(temp_path, link_path)
+                return
+            except OSError as error:
+                logger.warning('cannot hardlink "%s"(%s), using symlinks instead.' % (link_path, str(error)))
+                self.link_mode = 'symlink'
+        # relative target keeps links valid when whole directory is moved
+        os.symlink(os.path.relpath(blob_path, os.path.dirname(link_path) or '.'), temp_path)
+        os.replace(temp_path, link_path)
+
+    def get_stats(self):
+        """
+        Get size of store.
+
+        Args:
+            self - instance of class BlobStore
+
+        Returns:
+            (blob_count, blob_bytes, file_count) - number and total size of
+        blobs, and number of readable paths linked to them
+        """
+        with self.lock:
+            blob_count, blob_bytes = self.conn.execute('SELECT COUNT(*), TOTAL(SIZE) FROM BLOB;').fetchone()
+            file_count = self.conn.execute('SELECT COUNT(*) FROM FILE;').fetchone()[0]
+        return blob_count, int(blob_bytes), file_count
+
+    def close(self):
+        blob_count, blob_bytes, file_count = self.get_stats()
+        logger.info('blob store holds %u blobs(%u bytes) for %u files, %u bytes deduplicated this run.' % (
+            blob_count, blob_bytes, file_count, self.saved_bytes))
+        self.conn.close()
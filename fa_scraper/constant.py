@@ -1,5 +1,13 @@
-# base url for scrapying website FurAffinity
-BASE_URL = 'https://www.furaffinity.net'
+from urllib.parse import urlparse
+
+import os
+
+# base url for scrapying website FurAffinity, FA_BASE_URL overrides it to
+# scrapy a mirror or local mock site
+BASE_URL = os.environ.get('FA_BASE_URL', 'https://www.furaffinity.net')
+
+# host of html pages, image hosts(d.furaffinity.net e.g.) use their own rate limit
+HTML_HOST = urlparse(BASE_URL).netloc
 
 # all sub-url recognized by scraper
 # default URL_TYPES
@@ -12,3 +20,16 @@ SCRAPIED_CATEGORIES = {'Artwork (Digital)', 'All', 'Cellshading'}
 # keywords to check for when downloading a description
 # case is ignored.
 DESCRIPTION_KEYWORDS = ['story', 'chapter', 'music', 'flash', 'animation']
+
+# md5 of default images served instead of story/music submissions, not saved
+DEFAULT_IMAGE_MD5S = {'a4a6d1c090e7f06b7b97bb2a01865cfa',  # story
+                      '68443c527e3b3ab118c1125b7d68bbbc'}  # music
+
+# bytes read from network at a time when downloading images
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# times a broken image download is resumed before giving up, part file is kept
+DOWNLOAD_RESUME_ATTEMPTS = 5
+
+# times an artwork whose image failed to download is queued again in one run
+FAILED_DOWNLOAD_RETRIES = 2
@@ -1,6 +1,9 @@
 import sqlite3
 
-from fa_scraper import util
+from fa_scraper import metrics
+
+import atexit
+import time
 
 import logging
 
@@ -13,7 +16,31 @@ class Database(object):
 
     Attributes:
         conn - connected object of database
+        batch_size - max number of buffered artworks before they are written,
+    1 means every artwork is committed immediately
+        flush_interval - max seconds buffered artworks may wait before they are
+    written, 0 means no time limit
+        pending_artworks - buffered attribute tuples waiting to be written
+        pending_descriptions - dictionary maps ID of buffered artwork to its
+    description text, written to full-text search index only
+        pending_touches - buffered (added, ID) of unchanged artworks whose added
+    time is set
+        pending_validators - dictionary maps artwork ID to buffered validator
+    tuple
+        pending_refreshed - buffered (ID,) of artworks refreshed by update mode,
+    removed from refresh queue together with their records written
+        last_flush - time of last flush, used by flush_interval
+        flush_callbacks - functions called after every flush, once buffered
+    records are written
+        search_enabled - True if full-text search table exists, sqlite may be
+    built without FTS5
     """
+    DATABASE_VERSION = 6  # schema version, stored in sqlite's user_version
+
+    INSERT_OR_REPLACE_ARTWORK = ('INSERT OR REPLACE INTO ARTWORK (ID, NAME, WIDTH, HEIGHT, AUTHOR, '
+                                 'POSTED, CATEGORY, THEME, SPECIES, GENDER, FAVORITES, '
+                                 'COMMENTS, VIEWS, ADULT, KEYWORDS, ADDED) VALUES(?, ?, ?, '
+                                 '?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);')
 
     def create_artwork_table(self):
         """
@@ -77,12 +104,154 @@ class Database(object):
         self.conn.commit()
         logger.debug('created/retrieved artwork table.')
 
-    def __init__(self, database_name):
+    def migrate_database(self):
+        """
+        Upgrade schema of an existing database to DATABASE_VERSION, version of
+        database file is stored in sqlite's user_version.
+        Version 1:
+            ARTWORK_ADDED - index on (Added, ID), used by update mode to find
+        expired artworks without scanning whole artwork table
+        Version 2:
+            BLOB - (SHA256, Size, Added) of images in content-addressed blob store
+            FILE - (Path, SHA256, Artwork ID) of readable paths under images
+        linked to blobs, path is relative to images directory
+            FILE_ARTWORK - index on (Artwork ID) of file table
+        Version 3:
+            MANIFEST - (Path, Directory, Size, Mtime, Artwork ID) of files under
+        images, recorded by integrity check
+            MANIFEST_DIRECTORY - (Path, Mtime, Parent) of directories under
+        images, unchanged directories are not scanned again
+            MANIFEST_IN_DIRECTORY, MANIFEST_ARTWORK - indexes on (Directory) and
+        (Artwork ID) of manifest table
+        Version 4:
+            ARTWORK_KEYWORD - (Artwork ID, Keyword) of each keyword of artworks,
+        keyword compares case-insensitively
+            KEYWORD_ARTWORK - index on (Keyword, Artwork ID) of keyword table
+            ARTWORK_SEARCH - FTS5 table over (Name, Keywords, Description), rowid
+        is artwork ID, skipped if sqlite has no FTS5
+        Version 5:
+            VALIDATOR - (Artwork ID, ETag, Last-Modified, Stats Hash) of artwork
+        page when it was last fetched, used by update mode's conditional requests
+        Version 6:
+            REFRESH_QUEUE - (Seq, Artwork ID) of expired artworks update mode
+        refreshes, in order of priority, so an interrupted update resumes
+
+        Args:
+            self - instance of class Database
+        """
+        version = self.conn.execute('PRAGMA user_version;').fetchone()[0]
+        if version >= Database.DATABASE_VERSION:
+            logger.debug('database schema is up to date(version %u).' % version)
+            return
+
+        with self.conn:
+            if version < 1:
+                self.conn.execute('CREATE INDEX IF NOT EXISTS ARTWORK_ADDED ON ARTWORK(ADDED, ID);')
+                logger.info('created index on added time of artwork table.')
+            if version < 2:
+                self.conn.execute('CREATE TABLE IF NOT EXISTS BLOB('
+                                  'SHA256 TEXT PRIMARY KEY     NOT NULL, '
+                                  'SIZE           INT          NOT NULL, '
+                                  'ADDED          DATETIME) WITHOUT ROWID;')
+                self.conn.execute('CREATE TABLE IF NOT EXISTS FILE('
+                                  'PATH TEXT PRIMARY KEY       NOT NULL, '
+                                  'SHA256         TEXT         NOT NULL, '
+                                  'ARTWORK_ID     INT) WITHOUT ROWID;')
+                self.conn.execute('CREATE INDEX IF NOT EXISTS FILE_ARTWORK ON FILE(ARTWORK_ID);')
+                logger.info('created blob and file index tables.')
+            if version < 3:
+                self.conn.execute('CREATE TABLE IF NOT EXISTS MANIFEST('
+                                  'PATH TEXT PRIMARY KEY       NOT NULL, '
+                                  'DIRECTORY      TEXT         NOT NULL, '
+                                  'SIZE           INT, '
+                                  'MTIME          INT, '
+                                  'ARTWORK_ID     INT) WITHOUT ROWID;')
+                self.conn.execute('CREATE TABLE IF NOT EXISTS MANIFEST_DIRECTORY('
+                                  'PATH TEXT PRIMARY KEY       NOT NULL, '
+                                  'MTIME          INT, '
+                                  'PARENT         TEXT) WITHOUT ROWID;')
+                self.conn.execute('CREATE INDEX IF NOT EXISTS MANIFEST_IN_DIRECTORY ON MANIFEST(DIRECTORY);')
+                self.conn.execute('CREATE INDEX IF NOT EXISTS MANIFEST_ARTWORK ON MANIFEST(ARTWORK_ID);')
+                logger.info('created image manifest tables.')
+            if version < 4:
+                self.create_keyword_tables()
+            if version < 5:
+                self.conn.execute('CREATE TABLE IF NOT EXISTS VALIDATOR('
+                                  'ARTWORK_ID INTEGER PRIMARY KEY NOT NULL, '
+                                  'ETAG           TEXT, '
+                                  'LAST_MODIFIED  TEXT, '
+                                  'STATS_HASH     TEXT);')
+                logger.info('created page validator table.')
+            if version < 6:
+                self.conn.execute('CREATE TABLE IF NOT EXISTS REFRESH_QUEUE('
+                                  'SEQ INTEGER PRIMARY KEY     NOT NULL, '
+                                  'ARTWORK_ID     INT          NOT NULL);')
+                self.conn.execute('CREATE INDEX IF NOT EXISTS REFRESH_QUEUE_ARTWORK ON REFRESH_QUEUE(ARTWORK_ID);')
+                logger.info('created refresh queue table.')
+            # pragma cannot be parameterized, version is an int
+            self.conn.execute('PRAGMA user_version = %u;' % Database.DATABASE_VERSION)
+        logger.info('migrated database schema from version %u to %u.' % (version, Database.DATABASE_VERSION))
+
+    def create_keyword_tables(self):
+        """
+        Create keyword and full-text search tables, and fill them from
+        existing artwork records. Descriptions of existing records are unknown
+        until they are scrapied again. Must be called in transaction.
+
+        Args:
+            self - instance of class Database
+        """
+        self.conn.execute('CREATE TABLE IF NOT EXISTS ARTWORK_KEYWORD('
+                          'ARTWORK_ID     INT          NOT NULL, '
+                          'KEYWORD        TEXT         NOT NULL COLLATE NOCASE, '
+                          'PRIMARY KEY (ARTWORK_ID, KEYWORD)) WITHOUT ROWID;')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS KEYWORD_ARTWORK ON ARTWORK_KEYWORD(KEYWORD, ARTWORK_ID);')
+        self.conn.executemany('INSERT OR IGNORE INTO ARTWORK_KEYWORD (ARTWORK_ID, KEYWORD) VALUES(?, ?);',
+                              ((artwork_id, keyword) for artwork_id, keywords in
+                               self.conn.execute('SELECT ID, KEYWORDS FROM ARTWORK WHERE KEYWORDS IS NOT NULL;')
+                               for keyword in keywords.split()))
+        logger.info('created artwork keyword table.')
+
+        try:
+            self.conn.execute('CREATE VIRTUAL TABLE IF NOT EXISTS ARTWORK_SEARCH USING '
+                              'fts5(NAME, KEYWORDS, DESCRIPTION);')
+        except sqlite3.OperationalError as error:
+            logger.warning('sqlite has no FTS5(%s), full-text search disabled.' % str(error))
+            return
+        self.conn.execute('INSERT INTO ARTWORK_SEARCH (rowid, NAME, KEYWORDS) SELECT ID, NAME, KEYWORDS FROM ARTWORK;')
+        logger.info('created artwork full-text search table.')
+
+    def __init__(self, database_name, batch_size=1, flush_interval=0):
         # connect database
         self.conn = sqlite3.connect(database_name)
         logger.debug('connected to database "%s".' % database_name)
+        # use write-ahead log, so a commit appends to the log instead of
+        # rewriting pages, and readers do not block the writer
+        journal_mode = self.conn.execute('PRAGMA journal_mode=WAL;').fetchone()[0]
+        self.conn.execute('PRAGMA synchronous=NORMAL;')
+        logger.debug('set database journal mode to %s.' % journal_mode)
         # create artwork table if not exists
         self.create_artwork_table()
+        # upgrade tables and indexes created by older versions
+        self.migrate_database()
+        self.search_enabled = self.conn.execute('SELECT 1 FROM sqlite_master WHERE NAME = \'ARTWORK_SEARCH\';'
+                                                ).fetchone() is not None
+
+        # initialize write buffer
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.pending_artworks = []
+        self.pending_descriptions = {}
+        self.pending_touches = []
+        self.pending_validators = {}
+        self.pending_refreshed = []
+        self.last_flush = time.monotonic()
+        self.flush_callbacks = []
+        if self.batch_size > 1:
+            # make sure buffered artworks are written when program exits
+            atexit.register(self.flush)
+            logger.info('buffered database writer enabled, batch size %u, flush interval %us.' % (
+                self.batch_size, self.flush_interval))
         logger.debug('database initialized.')
 
     @staticmethod
@@ -98,6 +267,8 @@ class Database(object):
     def insert_or_replace_artwork(self, artwork):
         """
         Insert or replace(update) artwork record from given dictionary.
+        Artwork is buffered and written together with other artworks when
+        batch size or flush interval is reached.
 
         Args:
             self - instance of class Database
@@ -105,12 +276,146 @@ class Database(object):
         """
         # artwork['Adult'] = util.convert_boolean(artwork['Adult'])
         attribute_tuple = self.attribute_dictionary_to_tuple(artwork)
-        self.conn.execute('INSERT OR REPLACE INTO ARTWORK (ID, NAME, WIDTH, HEIGHT, AUTHOR, '
-                          'POSTED, CATEGORY, THEME, SPECIES, GENDER, FAVORITES, '
-                          'COMMENTS, VIEWS, ADULT, KEYWORDS, ADDED) VALUES(?, ?, ?, '
-                          '?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);', attribute_tuple)
-        self.conn.commit()
-        logger.debug('inserted/replaced artwork information into artwork table.')
+        self.pending_artworks.append(attribute_tuple)
+        self.pending_descriptions[attribute_tuple[0]] = artwork.get('Description')
+        self.check_flush()
+
+    def touch_artwork(self, artwork_id, added):
+        """
+        Set added time of an unchanged artwork, so it isn't expired again until
+        expire time passes. Buffered like insert_or_replace_artwork.
+
+        Args:
+            self - instance of class Database
+            artwork_id - ID of the artwork
+            added - added time, format: YYYY-mm-DD HH:MM
+        """
+        self.pending_touches.append((added, artwork_id))
+        self.check_flush()
+
+    def add_flush_callback(self, callback):
+        # call function after every flush, frontier marks urls scrapied once their records are written e.g.
+        if not self.flush_callbacks and self.batch_size == 1:
+            atexit.register(self.flush)
+        self.flush_callbacks.append(callback)
+
+    def check_flush(self):
+        # flush if batch size or flush interval is reached
+        pending_count = len(self.pending_artworks) + len(self.pending_touches)
+        if pending_count >= self.batch_size:
+            self.flush()
+        elif self.flush_interval and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+        else:
+            logger.debug('buffered artwork information, %u artworks pending.' % pending_count)
+
+    def flush(self):
+        """
+        Write all buffered artworks into artwork table in one transaction,
+        together with their keywords and full-text search rows, added time of
+        touched artworks, page validators and refresh queue, then call flush
+        callbacks.
+
+        Args:
+            self - instance of class Database
+        """
+        self.last_flush = time.monotonic()
+        if self.pending_artworks or self.pending_touches or self.pending_validators or self.pending_refreshed:
+            self.write_pending()
+        for callback in self.flush_callbacks:
+            callback()
+
+    def write_pending(self):
+        # write buffered records in one transaction and clear buffer
+        with metrics.timer('db_commit'), self.conn:
+            # commits once for whole batch, rollbacks if any row fails
+            self.conn.executemany(Database.INSERT_OR_REPLACE_ARTWORK, self.pending_artworks)
+            # the last buffered tuple of an artwork is the one in artwork table
+            artworks = list({artwork[0]: artwork for artwork in self.pending_artworks}.values())
+            self.replace_keywords(artworks)
+            self.conn.executemany('UPDATE ARTWORK SET ADDED = ? WHERE ID = ?;', self.pending_touches)
+            self.conn.executemany('INSERT OR REPLACE INTO VALIDATOR (ARTWORK_ID, ETAG, LAST_MODIFIED, STATS_HASH) '
+                                  'VALUES(?, ?, ?, ?);', self.pending_validators.values())
+            self.conn.executemany('DELETE FROM REFRESH_QUEUE WHERE ARTWORK_ID = ?;', self.pending_refreshed)
+        metrics.increment('artworks_written', amount=len(self.pending_artworks))
+        metrics.increment('artworks_touched', amount=len(self.pending_touches))
+        logger.debug('inserted/replaced %u artworks information into artwork table, touched %u artworks.' % (
+            len(self.pending_artworks), len(self.pending_touches)))
+        self.pending_artworks = []
+        self.pending_descriptions = {}
+        self.pending_touches = []
+        self.pending_validators = {}
+        self.pending_refreshed = []
+
+    def replace_keywords(self, artworks):
+        # replace keyword and search rows of artwork tuples, must be called in transaction
+        artwork_ids = [(artwork[0],) for artwork in artworks]
+        self.conn.executemany('DELETE FROM ARTWORK_KEYWORD WHERE ARTWORK_ID = ?;', artwork_ids)
+        # Keywords is the 15th field of artwork tuple
+        self.conn.executemany('INSERT OR IGNORE INTO ARTWORK_KEYWORD (ARTWORK_ID, KEYWORD) VALUES(?, ?);',
+                              ((artwork[0], keyword) for artwork in artworks if artwork[14]
+                               for keyword in artwork[14].split()))
+        if self.search_enabled:
+            self.conn.executemany('DELETE FROM ARTWORK_SEARCH WHERE rowid = ?;', artwork_ids)
+            self.conn.executemany('INSERT INTO ARTWORK_SEARCH (rowid, NAME, KEYWORDS, DESCRIPTION) '
+                                  'VALUES(?, ?, ?, ?);',
+                                  ((artwork[0], artwork[1], artwork[14], self.pending_descriptions.get(artwork[0]))
+                                   for artwork in artworks))
+
+    def close_db(self):
+        """
+        Flush buffered artworks and close database connection.
+
+        Args:
+            self - instance of class Database
+        """
+        self.flush()
+        self.conn.close()
+        logger.debug('database closed.')
+
+    def has_artwork(self, artwork_id):
+        """
+        Check if artwork is in database, including buffered ones.
+
+        Args:
+            self - instance of class Database
+            artwork_id - ID of the artwork
+
+        Returns:
+            True if artwork record exists
+        """
+        # ID is the first field of buffered tuples
+        if any(artwork[0] == artwork_id for artwork in self.pending_artworks):
+            return True
+        return self.conn.execute('SELECT 1 FROM ARTWORK WHERE ID = ?;', (artwork_id,)).fetchone() is not None
+
+    def get_validators(self, artwork_id):
+        """
+        Get validators of artwork page saved when it was last fetched.
+
+        Args:
+            self - instance of class Database
+            artwork_id - ID of the artwork
+
+        Returns:
+            (etag, last_modified, stats_hash) - None for every validator unknown
+        """
+        if artwork_id in self.pending_validators:
+            return self.pending_validators[artwork_id][1:]
+        record = self.conn.execute('SELECT ETAG, LAST_MODIFIED, STATS_HASH FROM VALIDATOR WHERE ARTWORK_ID = ?;',
+                                   (artwork_id,)).fetchone()
+        return tuple(record) if record else (None, None, None)
+
+    def set_validators(self, artwork_id, validators):
+        """
+        Save validators of artwork page, buffered and written by next flush.
+
+        Args:
+            self - instance of class Database
+            artwork_id - ID of the artwork
+            validators - (etag, last_modified, stats_hash) of the page
+        """
+        self.pending_validators[artwork_id] = (artwork_id,) + tuple(validators)
 
     def get_artwork_ids(self):
         """
@@ -123,60 +428,238 @@ class Database(object):
             artwork_ids - a list of artworks' IDs,
             [26350907, 26350909, 26350911] e.g.
         """
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT ID FROM ARTWORK')
-
-        artwork_ids = list(map(lambda x: x.__getitem__(0), cursor.fetchall()))
-        # use map to get all ids from returned one-element tuples list
+        artwork_ids = list(self.iter_artwork_ids())
         logger.debug('%u artworks retrieved from database.' % len(artwork_ids))
         return artwork_ids
 
+    def iter_artwork_ids(self, chunk_size=1000):
+        """
+        Iterate all records' ID, reading them in chunks, so IDs are never held
+        in memory all together.
+
+        Args:
+            self - instance of class Database
+            chunk_size - number of IDs fetched at a time
+
+        Returns:
+            artwork_ids - an iterator of artworks' IDs
+        """
+        self.flush()
+        cursor = self.conn.execute('SELECT ID FROM ARTWORK;')
+        records = cursor.fetchmany(chunk_size)
+        while records:
+            for record in records:
+                yield record[0]
+            records = cursor.fetchmany(chunk_size)
+
+    def iter_artwork_ids_without_image(self, chunk_size=1000):
+        """
+        Iterate IDs of records that have no image in image manifest, set
+        difference is done by sqlite with an anti-join on MANIFEST table, which
+        must be brought up to date by ImageManifest first.
+
+        Args:
+            self - instance of class Database
+            chunk_size - number of IDs fetched at a time
+
+        Returns:
+            artwork_ids - an iterator of IDs of artworks missing on disk
+        """
+        self.flush()
+        # uses index MANIFEST_ARTWORK for each artwork
+        cursor = self.conn.execute('SELECT ID FROM ARTWORK WHERE NOT EXISTS '
+                                   '(SELECT 1 FROM MANIFEST WHERE MANIFEST.ARTWORK_ID = ARTWORK.ID);')
+        records = cursor.fetchmany(chunk_size)
+        while records:
+            for record in records:
+                yield record[0]
+            records = cursor.fetchmany(chunk_size)
+
+    def iter_artwork_ids_with_keyword(self, keyword, chunk_size=1000):
+        """
+        Iterate IDs of artworks tagged with keyword, using index of keyword
+        table instead of scanning Keywords of every record.
+
+        Args:
+            self - instance of class Database
+            keyword - keyword, compares case-insensitively
+            chunk_size - number of IDs fetched at a time
+
+        Returns:
+            artwork_ids - an iterator of artworks' IDs in ascending order
+        """
+        self.flush()
+        cursor = self.conn.execute('SELECT ARTWORK_ID FROM ARTWORK_KEYWORD WHERE KEYWORD = ? '
+                                   'ORDER BY ARTWORK_ID;', (keyword,))
+        records = cursor.fetchmany(chunk_size)
+        while records:
+            for record in records:
+                yield record[0]
+            records = cursor.fetchmany(chunk_size)
+
+    def search_artworks(self, query, limit=100):
+        """
+        Full-text search on name, keywords and description of artworks.
+
+        Args:
+            self - instance of class Database
+            query - FTS5 query, 'dragon', 'KEYWORDS:ice AND NAME:cave' e.g.
+            limit - max number of IDs returned
+
+        Returns:
+            artwork_ids - list of matched artworks' IDs, best matches first
+        """
+        if not self.search_enabled:
+            logger.error('full-text search is disabled as sqlite has no FTS5.')
+            return []
+        self.flush()
+        cursor = self.conn.execute('SELECT rowid FROM ARTWORK_SEARCH WHERE ARTWORK_SEARCH MATCH ? '
+                                   'ORDER BY rank LIMIT ?;', (query, limit))
+        artwork_ids = [artwork_id for artwork_id, in cursor]
+        logger.debug('%u artworks matched "%s".' % (len(artwork_ids), query))
+        return artwork_ids
+
     def delete_artworks(self, artwork_ids):
         """
         Delete artwork records in database given the artworks' IDs.
+        IDs are loaded into a temporary table and deleted by one statement in
+        one transaction, instead of one statement per ID.
 
         Args:
             self - instance of class Database
-            artwork_ids - container holds artwork ids
+            artwork_ids - iterable holds artwork ids
+
+        Returns:
+            (delete_count, deleted_ids) - number and list of IDs of records
+        actually deleted, IDs not in database are left out
         """
-        delete_count = 0
-        for artwork_id in artwork_ids:
-            self.conn.execute('DELETE FROM ARTWORK WHERE ID = ?', (artwork_id,))
-            delete_count = delete_count + 1
+        self.flush()
+        with self.conn:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS DELETE_ID (ID INTEGER PRIMARY KEY);')
+            self.conn.execute('DELETE FROM temp.DELETE_ID;')
+            self.conn.executemany('INSERT OR IGNORE INTO temp.DELETE_ID (ID) VALUES(?);',
+                                  ((artwork_id,) for artwork_id in artwork_ids))
+            # IDs that have a record, so caller knows what is really removed
+            cursor = self.conn.execute('SELECT ARTWORK.ID FROM temp.DELETE_ID '
+                                       'JOIN ARTWORK ON ARTWORK.ID = DELETE_ID.ID;')
+            deleted_ids = [artwork_id for artwork_id, in cursor]
+            self.conn.execute('DELETE FROM ARTWORK WHERE ID IN (SELECT ID FROM temp.DELETE_ID);')
+            self.conn.execute('DELETE FROM ARTWORK_KEYWORD WHERE ARTWORK_ID IN (SELECT ID FROM temp.DELETE_ID);')
+            if self.search_enabled:
+                self.conn.execute('DELETE FROM ARTWORK_SEARCH WHERE rowid IN (SELECT ID FROM temp.DELETE_ID);')
+            self.conn.execute('DELETE FROM VALIDATOR WHERE ARTWORK_ID IN (SELECT ID FROM temp.DELETE_ID);')
+            self.conn.execute('DELETE FROM REFRESH_QUEUE WHERE ARTWORK_ID IN (SELECT ID FROM temp.DELETE_ID);')
+            self.conn.execute('DELETE FROM temp.DELETE_ID;')
 
-        self.conn.commit()  # will not call commit repeatedly
-        logger.debug('%u artwork records deleted from database.' % delete_count)
+        logger.debug('%u artwork records deleted from database.' % len(deleted_ids))
+        return len(deleted_ids), deleted_ids
 
-    @staticmethod
-    def if_time_expired(id_time_tuple, current_time, expire_time):
-        # given (id, added_time), current time and expire time
-        # returns True if expired
-        # or False if it hasn't expired
-        if (util.parse_datetime(id_time_tuple[1]) - util.parse_datetime(current_time)) >= expire_time * 86400:
-            return True
-        else:
-            return False
+    def get_expire_before(self, expire_time):
+        # artworks added before returned time are expired, the same format as
+        # util.get_current_time so strings compare in order
+        cursor = self.conn.execute('SELECT strftime(\'%Y-%m-%d %H:%M\', \'now\', \'localtime\', ?);',
+                                   ('-%d days' % expire_time,))
+        expire_before = cursor.fetchone()[0]
+        logger.debug('artworks added before %s are expired.' % expire_before)
+        return expire_before
 
-    def get_expired_artwork_ids(self, expire_time):
+    def fill_refresh_queue(self, expire_time, priority_function):
         """
-        Given expire time, and return all expired artwork IDs' list.
+        Fill refresh queue with all expired artworks in order of priority, the
+        most important first. Sorting is done by sqlite, so artworks aren't
+        loaded into memory.
 
         Args:
-            self - instance of class method
+            self - instance of class Database
             expire_time - expire time, days
+            priority_function - function(stale_days, favorites, views) returns
+        priority of an artwork, larger is refreshed earlier
+
+        Returns:
+            queued_count - number of artworks queued
+        """
+        self.flush()
+        expire_before = self.get_expire_before(expire_time)
+        self.conn.create_function('REFRESH_PRIORITY', 3, priority_function)
+        with self.conn:
+            self.conn.execute('DELETE FROM REFRESH_QUEUE;')
+            cursor = self.conn.execute('INSERT INTO REFRESH_QUEUE (ARTWORK_ID) SELECT ID FROM ARTWORK '
+                                       'WHERE ADDED <= ? ORDER BY REFRESH_PRIORITY(julianday(\'now\', '
+                                       '\'localtime\') - julianday(ADDED), FAVORITES, VIEWS) DESC, ID;',
+                                       (expire_before,))
+        logger.debug('%u expired artworks queued for refresh.' % cursor.rowcount)
+        return cursor.rowcount
+
+    def get_refresh_queue_length(self):
+        return self.conn.execute('SELECT COUNT(*) FROM REFRESH_QUEUE;').fetchone()[0]
+
+    def iter_refresh_queue(self, chunk_size=1000):
+        """
+        Iterate artwork IDs in refresh queue in order of priority, read in
+        chunks after the last sequence number read, so queue can be changed
+        while iterating.
+
+        Args:
+            self - instance of class Database
+            chunk_size - number of IDs read by each query
 
         Returns:
-            expired_artwork_ids - a list of all expired artwork IDs'
+            artwork_ids - an iterator of queued artwork IDs
+        """
+        last_seq = 0
+        while True:
+            records = self.conn.execute('SELECT SEQ, ARTWORK_ID FROM REFRESH_QUEUE WHERE SEQ > ? '
+                                        'ORDER BY SEQ LIMIT ?;', (last_seq, chunk_size)).fetchall()
+            if not records:
+                break
+            for record in records:
+                yield record[1]
+            last_seq = records[-1][0]
+
+    def finish_refresh(self, artwork_id):
+        """
+        Remove artwork from refresh queue, buffered and written by next flush
+        together with its record.
+
+        Args:
+            self - instance of class Database
+            artwork_id - ID of the artwork
         """
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT ID, ADDED FROM ARTWORK')
+        self.pending_refreshed.append((artwork_id,))
+        self.check_flush()
 
-        current_time = util.get_current_time()
+    def get_expired_artwork_ids(self, expire_time, chunk_size=1000):
+        """
+        Given expire time, iterate all expired artwork IDs.
+        Expire time is evaluated by sqlite once, and records are read in chunks
+        ordered by index on (Added, ID), so artworks updated while iterating
+        are not visited again.
+
+        Args:
+            self - instance of class method
+            expire_time - expire time, days
+            chunk_size - number of IDs read by each query
+
+        Returns:
+            expired_artwork_ids - an iterator of all expired artwork IDs
+        """
+        self.flush()
+        expire_before = self.get_expire_before(expire_time)
 
-        # use filter and map to simplify code
-        expired_records = filter(lambda t: self.if_time_expired(t, current_time, expire_time), cursor.fetchall())
-        expired_artwork_ids = list(map(lambda x: x.__getitem__(0), expired_records))
+        expired_count = 0
+        cursor = self.conn.execute('SELECT ADDED, ID FROM ARTWORK WHERE ADDED <= ? '
+                                   'ORDER BY ADDED, ID LIMIT ?;', (expire_before, chunk_size))
+        records = cursor.fetchall()
+        while records:
+            for record in records:
+                yield record[1]
+            expired_count = expired_count + len(records)
 
-        logger.debug('%u expired records retrieved from database.' % len(expired_artwork_ids))
+            # continue after last record of previous chunk
+            last_added, last_id = records[-1]
+            cursor = self.conn.execute('SELECT ADDED, ID FROM ARTWORK WHERE ADDED <= ? '
+                                       'AND (ADDED, ID) > (?, ?) ORDER BY ADDED, ID LIMIT ?;',
+                                       (expire_before, last_added, last_id, chunk_size))
+            records = cursor.fetchall()
 
-        return expired_artwork_ids
+        logger.debug('%u expired records retrieved from database.' % expired_count)
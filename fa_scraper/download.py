@@ -0,0 +1,153 @@
+import queue
+import threading
+
+import logging
+
+logger = logging.getLogger('default')
+
+
+class DownloadPool(object):
+    """
+    DownloadPool class to download artworks in worker threads, so scrapying
+    pages doesn't wait for image transfers.
+    Jobs are (filename, download_link) pairs, optionally carrying attributes
+    and origin url of the artwork, which are handed back by get_completed once
+    the download finishes, whether it succeeds or not.
+
+    Attributes:
+        download_function - function(filename, download_link), returns True if
+    download succeeds, None if image is skipped on purpose
+        jobs - bounded queue holds pending jobs, submit blocks when it is full
+        completed - queue holds (attributes, origin_url, succeeded) of finished
+    jobs
+        workers - list of worker threads
+        active_count - number of workers downloading now
+        outstanding_urls - origin urls submitted but not handed back yet
+    """
+
+    def __init__(self, download_function, worker_count=2, max_queue_size=16):
+        self.download_function = download_function
+        self.jobs = queue.Queue(max_queue_size)
+        self.completed = queue.Queue()
+        self.lock = threading.Lock()
+        self.active_count = 0
+        self.outstanding_urls = {}  # origin url -> number of jobs, used as a counted set
+        self.running = True
+
+        self.workers = []
+        for index in range(worker_count):
+            worker = threading.Thread(target=self.work, name='download-worker-%u' % index, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        logger.info('download pool started with %u workers, queue size %u.' % (worker_count, max_queue_size))
+
+    def submit(self, filename, download_link, attributes=None, origin_url=None):
+        """
+        Submit download job, blocks while job queue is full.
+
+        Args:
+            self - instance of class DownloadPool
+            filename - filename of the artwork
+            download_link - download link of the artwork
+            attributes - attributes of the artwork, handed back when succeeds
+            origin_url - url the artwork is scrapied from
+        """
+        if origin_url:
+            with self.lock:
+                self.outstanding_urls[origin_url] = self.outstanding_urls.get(origin_url, 0) + 1
+        self.jobs.put((filename, download_link, attributes, origin_url))
+        logger.debug('queued download "%s", queue depth %u, %u/%u workers busy.' % (
+            filename, self.get_queue_depth(), self.get_active_count(), self.get_worker_count()))
+
+    def work(self):
+        # worker thread, takes jobs until pool is shut down
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            filename, download_link, attributes, origin_url = job
+            with self.lock:
+                self.active_count = self.active_count + 1
+            try:
+                succeeded = self.download_function(filename, download_link)
+            except Exception as error:
+                logger.error('error when downloading "%s": %s' % (filename, str(error)))
+                succeeded = False
+            finally:
+                with self.lock:
+                    self.active_count = self.active_count - 1
+
+            self.completed.put((attributes, origin_url, succeeded))
+            self.jobs.task_done()
+
+    def get_completed(self):
+        """
+        Get finished jobs without blocking.
+
+        Args:
+            self - instance of class DownloadPool
+
+        Returns:
+            completed - list of (attributes, origin_url, succeeded) of finished
+        jobs which carry origin url, failed ones should be scrapied again
+        """
+        completed = []
+        while True:
+            try:
+                attributes, origin_url, succeeded = self.completed.get_nowait()
+            except queue.Empty:
+                return completed
+            if origin_url:
+                with self.lock:
+                    self.outstanding_urls[origin_url] = self.outstanding_urls[origin_url] - 1
+                    if not self.outstanding_urls[origin_url]:
+                        del self.outstanding_urls[origin_url]
+                completed.append((attributes, origin_url, succeeded))
+
+    def join(self):
+        # wait until all submitted jobs are finished
+        self.jobs.join()
+
+    def shutdown(self):
+        """
+        Stop workers after their current downloads, drop pending jobs.
+
+        Args:
+            self - instance of class DownloadPool
+
+        Returns:
+            unfinished_urls - origin urls whose jobs are not handed back by
+        get_completed, so they can be scrapied again
+        """
+        if not self.running:
+            return []
+        self.running = False
+        # drop pending jobs
+        while True:
+            try:
+                self.jobs.get_nowait()
+                self.jobs.task_done()
+            except queue.Empty:
+                break
+        for worker in self.workers:
+            self.jobs.put(None)
+        with self.lock:
+            unfinished_urls = list(self.outstanding_urls)
+            self.outstanding_urls = {}
+        logger.info('download pool shut down, %u unfinished artworks.' % len(unfinished_urls))
+        return unfinished_urls
+
+    def get_queue_depth(self):
+        return self.jobs.qsize()
+
+    def get_worker_count(self):
+        return len(self.workers)
+
+    def get_active_count(self):
+        with self.lock:
+            return self.active_count
+
+    def has_pending_jobs(self):
+        # True if some jobs are queued, downloading or not handed back yet
+        return self.jobs.unfinished_tasks > 0 or not self.completed.empty()
@@ -0,0 +1,244 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlparse
+
+import asyncio
+import random
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from fa_scraper import metrics
+from fa_scraper import ratelimit
+from fa_scraper.constant import *
+
+import logging
+
+logger = logging.getLogger('default')
+
+
+class AsyncEngine(object):
+    """
+    AsyncEngine class to scrapy pages with asyncio, as an alternative to
+    calling Scraper.scrapy_pending_url in a loop.
+    Several pages are fetched at the same time, each host has at most
+    concurrency requests in flight and still obeys scraper's rate limiter.
+    Pages are parsed in an executor or a parse pool, while frontier, download
+    pool and database are only touched from event loop's thread, with the
+    same Scraper methods sync engine uses. Images are downloaded by scraper's
+    download pool.
+
+    Attributes:
+        scraper - instance of class Scraper, must have a download pool
+        save_artwork - function(attributes) that saves a downloaded artwork
+        concurrency - max requests in flight per host
+        parse_executor - executor parsing runs in if there is no parse pool
+        parse_pool - instance of class ParsePool parsing pages in processes, None
+    to parse in parse executor
+        semaphores - dictionary maps host to semaphore limits its requests
+        session - aiohttp session, exists while crawl is running
+    """
+
+    def __init__(self, scraper, save_artwork, concurrency=4, parse_executor=None, parse_pool=None):
+        if aiohttp is None:
+            raise ImportError('async engine needs aiohttp, install it with "pip install aiohttp".')
+        self.scraper = scraper
+        self.save_artwork = save_artwork
+        self.concurrency = concurrency
+        self.parse_executor = parse_executor if parse_executor else ThreadPoolExecutor(1)
+        self.parse_pool = parse_pool
+        self.semaphores = {}
+        self.session = None
+
+    def run(self):
+        # scrapy until scrapying queue is empty and all downloads are finished
+        asyncio.run(self.crawl())
+
+    def create_session(self):
+        # create aiohttp session sharing cookies and user agent of scraper's session
+        cookies = dict(self.scraper.cookies) if self.scraper.cookies else {}
+        cookies.update(self.get_clearance_cookies())
+        connector = aiohttp.TCPConnector(limit_per_host=self.concurrency)
+        return aiohttp.ClientSession(connector=connector, cookies=cookies,
+                                     headers={'User-Agent': self.get_user_agent()},
+                                     timeout=aiohttp.ClientTimeout(total=60))
+
+    def get_clearance_cookies(self):
+        # cloudflare cookies passed by any of scraper's sessions, shared by session factory
+        clearance = self.scraper.session_factory.clearance
+        return {cookie['name']: cookie['value'] for cookie in clearance.get('cookies', [])}
+
+    def get_user_agent(self):
+        # user agent clearance is bound to, or the one of scraper's session
+        clearance = self.scraper.session_factory.clearance
+        return clearance.get('user_agent') or self.scraper.scraper.headers['User-Agent']
+
+    def get_semaphore(self, url):
+        host = urlparse(url).netloc
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.concurrency)
+        return self.semaphores[host]
+
+    @staticmethod
+    def is_cloudflare_challenge(status, headers, body):
+        # same check as cfscrape, challenge needs to be solved by cfscrape session
+        return status in (503, 429) and headers.get('Server', '').startswith('cloudflare') and \
+            b'jschl_vc' in body and b'jschl_answer' in body
+
+    async def open_url(self, url, url_type='other'):
+        """
+        Open url and return response content, retries like Scraper.request_url.
+
+        Args:
+            self - instance of class AsyncEngine
+            url - url that to be opened
+            url_type - type of url, label of request metrics
+
+        Returns:
+            content - the content of HTTP Response, None if fails
+        """
+        origin_url = url
+        # use quote to deal with arabic/... url, safe ':/' is needed
+        url = quote(url, safe=':/')
+        rate_limiter = self.scraper.rate_limiter
+        attempts = 0
+        while attempts < 15:
+            # wait for host's rate limiter without blocking other requests
+            with metrics.timer('rate_limit_wait', url_type):
+                await asyncio.sleep(rate_limiter.reserve(url))
+            # back off a random long delay on error if server doesn't tell how long
+            long_delay = random.randint(30, 70)
+            try:
+                async with self.get_semaphore(url):
+                    with metrics.timer('network', url_type):
+                        async with self.session.get(url) as response:
+                            status = response.status
+                            headers = response.headers
+                            body = await response.read()
+                metrics.increment('requests', url_type)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                attempts += 1
+                metrics.increment('request_errors', url_type)
+                logger.error('error when sending request to "%s". attempt %s' % (url, attempts))
+                rate_limiter.backoff(url, long_delay)
+                continue
+
+            if status == 200:
+                logger.info('received response from "%s".' % url)
+                if self.scraper.response_store:
+                    # compressing and writing response blocks, keep it off event loop
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(None, self.scraper.record_response, origin_url, body)
+                return body
+            if self.is_cloudflare_challenge(status, headers, body):
+                # let cfscrape session solve it, and share clearance with aiohttp session
+                logger.info('cloudflare challenge received from "%s", solving it with cfscrape.' % url)
+                loop = asyncio.get_running_loop()
+                # Scraper.open_url quotes url itself, pass unquoted one
+                body = await loop.run_in_executor(None, self.scraper.open_url, origin_url, url_type)
+                self.session.cookie_jar.update_cookies(self.get_clearance_cookies())
+                self.session.headers['User-Agent'] = self.get_user_agent()
+                return body
+            if status == 503 or status == 429:
+                # try again but a bit slower this time
+                logger.error('request sent to "%s" returned error code: %u.' % (url, status))
+                retry_after = ratelimit.RateLimiter.parse_retry_after(headers.get('Retry-After'))
+                rate_limiter.backoff(url, long_delay if retry_after is None else retry_after)
+                continue
+            elif status == 404:
+                logger.warning('request sent to "%s" returned error code: %u.' % (url, status))
+                return None
+            else:
+                logger.error('request sent to "%s" returned error code: %u.' % (url, status))
+                rate_limiter.backoff(url, long_delay)
+            attempts += 1
+
+    async def scrapy_url(self, url_type, url):
+        """
+        Fetch and parse page, without touching frontier.
+
+        Args:
+            self - instance of class AsyncEngine
+            url_type - type of url returned by Scraper.prepare_url
+            url - sub-url of the page
+
+        Returns:
+            (parser, urls) - returned by Scraper.parse_page, None if fails
+        """
+        html = await self.open_url(BASE_URL + url, url_type)
+        if not html:
+            return None
+        logger.info('scrapied "%s" site with url %s.' % (url_type, url))
+        scraper = self.scraper
+        if self.parse_pool:
+            # only html and plain result cross process boundary
+            result = await asyncio.wrap_future(self.parse_pool.submit(html, url, url_type, scraper.id_mode,
+                                                                      scraper.starting_id, scraper.stopId))
+            return self.parse_pool.restore(result, scraper.id_mode, scraper.starting_id, scraper.stopId)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.parse_executor, scraper.parse_page, html, url, url_type)
+
+    def save_downloaded_artworks(self):
+        for artwork in self.scraper.get_downloaded_artworks():
+            self.save_artwork(artwork)
+
+    async def crawl(self):
+        """
+        Scrapy pages until scrapying queue is empty and all downloads finish.
+
+        Args:
+            self - instance of class AsyncEngine
+        """
+        scraper = self.scraper
+        loop = asyncio.get_running_loop()
+        self.session = self.create_session()
+        try:
+            # lazy load technical, scrapy base url if it hasn't
+            if not scraper.frontier.get_state('base_scrapied'):
+                url = scraper.get_base_url()
+                main_html = await self.open_url(url, 'base')
+                if main_html:
+                    scraper.add_base_page(url, main_html)
+
+            tasks = {}  # task -> (origin_url, url_type, url)
+            while True:
+                # keep pages in flight, they are limited per host by semaphores
+                while len(tasks) < self.concurrency:
+                    origin_url = scraper.frontier.pop_url()
+                    if origin_url is None:
+                        break
+                    url_type, url = scraper.prepare_url(origin_url)
+                    if not url_type:
+                        scraper.frontier.finish_url(origin_url)
+                        continue
+                    tasks[asyncio.ensure_future(self.scrapy_url(url_type, url))] = (origin_url, url_type, url)
+
+                if not tasks:
+                    if scraper.download_pool.has_pending_jobs():
+                        # downloads never add urls, wait for them and finish
+                        logger.info('scrapying queue empty, waiting for downloads to finish.')
+                        await loop.run_in_executor(None, scraper.download_pool.join)
+                        self.save_downloaded_artworks()
+                        continue
+                    logger.info('scrapying queue empty.')
+                    return
+
+                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    origin_url, url_type, url = tasks.pop(task)
+                    result = task.result()
+                    if result is None:
+                        # failed url is not marked scrapied, same as sync engine
+                        scraper.frontier.finish_url(origin_url)
+                        continue
+                    parser, urls = result
+                    artwork = scraper.handle_page(origin_url, url, url_type, parser, urls)
+                    if artwork:
+                        self.save_artwork(artwork)
+
+                # artworks downloaded by download pool
+                self.save_downloaded_artworks()
+        finally:
+            await self.session.close()
+            self.session = None
@@ -0,0 +1,222 @@
+import sqlite3
+
+from fa_scraper import visited
+
+import logging
+
+logger = logging.getLogger('default')
+
+
+class Frontier(object):
+    """
+    Frontier class to keep scraper's scrapying queue and scrapied set in a
+    sqlite database. Every push and pop is committed immediately, so scrapying
+    progress survives crashes and resumes without loading the queue.
+    Scrapied urls are also kept in a compact in-memory visited set, so checking
+    whether a url has been scrapied doesn't touch disk.
+    Popped urls stay in in-flight table until they are finished, so urls being
+    fetched or downloaded when scraper stops are queued again by next run.
+    If scrapied urls are deferred, they are only written to scrapied table by
+    commit_scrapied_urls, after records they produced are written to database.
+
+    Attributes:
+        conn - connected object of frontier database
+        visited - VisitedSet holds scrapied urls
+        defer_scrapied - if True, scrapied urls stay in flight until
+    commit_scrapied_urls is called
+        pending_scrapied_urls - scrapied urls waiting for commit_scrapied_urls
+    """
+
+    def create_frontier_tables(self):
+        """
+        Creates frontier tables if they not exist.
+        Queue Table:
+        +------------+------------+--------------------------------------------+
+        |Seq         |Integer     |push order, url with largest seq pops first |
+        |------------+------------+--------------------------------------------|
+        |URL         |Text        |url to be scrapied, '/view/26350907/' e.g.  |
+        +------------+------------+--------------------------------------------+
+        Scrapied Table:
+        +------------+------------+--------------------------------------------+
+        |URL         |Text        |url that has been scrapied                  |
+        +------------+------------+--------------------------------------------+
+        In-flight Table:
+        +------------+------------+--------------------------------------------+
+        |URL         |Text        |url popped but not finished yet             |
+        +------------+------------+--------------------------------------------+
+        State Table:
+        +------------+------------+--------------------------------------------+
+        |Key         |Text        |name of state, 'base_scrapied' e.g.         |
+        |------------+------------+--------------------------------------------|
+        |Value       |Text        |value of state                              |
+        +------------+------------+--------------------------------------------+
+
+        Args:
+            self - instance of class Frontier
+        """
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS QUEUE('
+                              'SEQ INTEGER PRIMARY KEY AUTOINCREMENT, '
+                              'URL            TEXT NOT NULL);')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS SCRAPIED('
+                              'URL TEXT PRIMARY KEY        NOT NULL) WITHOUT ROWID;')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS INFLIGHT('
+                              'URL TEXT PRIMARY KEY        NOT NULL) WITHOUT ROWID;')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS STATE('
+                              'KEY TEXT PRIMARY KEY        NOT NULL, '
+                              'VALUE          TEXT);')
+        logger.debug('created/retrieved frontier tables.')
+
+    def __init__(self, frontier_name, bloom_size=0, defer_scrapied=False):
+        # connect database
+        self.conn = sqlite3.connect(frontier_name)
+        self.conn.execute('PRAGMA journal_mode=WAL;')
+        self.conn.execute('PRAGMA synchronous=NORMAL;')
+        logger.debug('connected to frontier "%s".' % frontier_name)
+        self.create_frontier_tables()
+
+        # load scrapied urls into visited set
+        self.visited = visited.VisitedSet(bloom_size, self.if_scrapied_in_table)
+        for record in self.conn.execute('SELECT URL FROM SCRAPIED;'):
+            self.visited.add(record[0])
+        logger.debug('loaded %u scrapied urls into visited set.' % len(self.visited))
+        self.defer_scrapied = defer_scrapied
+        self.pending_scrapied_urls = []
+
+        # urls popped by last run but not finished, push them back
+        requeued_count = self.requeue_in_flight_urls()
+        if requeued_count:
+            logger.info('requeued %u unfinished urls.' % requeued_count)
+        logger.debug('frontier initialized.')
+
+    def push_urls(self, urls):
+        """
+        Push urls into scrapying queue in one transaction.
+
+        Args:
+            self - instance of class Frontier
+            urls - list of urls, the last one will be popped first
+        """
+        with self.conn:
+            self.conn.executemany('INSERT INTO QUEUE (URL) VALUES(?);', ((url,) for url in urls))
+
+    def pop_url(self):
+        """
+        Pop the latest pushed url from scrapying queue, and keep it in
+        in-flight table until it is finished, scrapied or requeued.
+
+        Args:
+            self - instance of class Frontier
+
+        Returns:
+            url - popped url, None if scrapying queue is empty
+        """
+        with self.conn:
+            record = self.conn.execute('SELECT SEQ, URL FROM QUEUE ORDER BY SEQ DESC LIMIT 1;').fetchone()
+            if not record:
+                return None
+            self.conn.execute('DELETE FROM QUEUE WHERE SEQ = ?;', (record[0],))
+            self.conn.execute('INSERT OR IGNORE INTO INFLIGHT (URL) VALUES(?);', (record[1],))
+        return record[1]
+
+    def finish_url(self, url):
+        # remove popped url from in-flight table without marking it scrapied
+        with self.conn:
+            self.conn.execute('DELETE FROM INFLIGHT WHERE URL = ?;', (url,))
+
+    def requeue_urls(self, urls):
+        # push popped urls back into scrapying queue, they are no longer in flight
+        with self.conn:
+            self.conn.executemany('DELETE FROM INFLIGHT WHERE URL = ?;', ((url,) for url in urls))
+            self.conn.executemany('INSERT INTO QUEUE (URL) VALUES(?);', ((url,) for url in urls))
+
+    def requeue_in_flight_urls(self):
+        """
+        Push every unfinished url back into scrapying queue, scrapied ones are
+        dropped, and ones waiting for commit_scrapied_urls are kept in flight.
+
+        Args:
+            self - instance of class Frontier
+
+        Returns:
+            requeued_count - number of urls pushed back
+        """
+        pending_urls = set(self.pending_scrapied_urls)
+        in_flight_urls = [record[0] for record in self.conn.execute('SELECT URL FROM INFLIGHT;')
+                          if record[0] not in pending_urls]
+        urls = [url for url in in_flight_urls if not self.is_scrapied(url)]
+        with self.conn:
+            self.conn.executemany('DELETE FROM INFLIGHT WHERE URL = ?;', ((url,) for url in in_flight_urls))
+            self.conn.executemany('INSERT INTO QUEUE (URL) VALUES(?);', ((url,) for url in urls))
+        return len(urls)
+
+    def clear_queue(self):
+        # remove all urls from scrapying queue
+        with self.conn:
+            self.conn.execute('DELETE FROM QUEUE;')
+
+    def add_scrapied_url(self, url):
+        # add url to visited set and scrapied table, ignored if exists, url is finished
+        self.visited.add(url)
+        if self.defer_scrapied:
+            self.pending_scrapied_urls.append(url)
+            return
+        with self.conn:
+            self.conn.execute('INSERT OR IGNORE INTO SCRAPIED (URL) VALUES(?);', (url,))
+            self.conn.execute('DELETE FROM INFLIGHT WHERE URL = ?;', (url,))
+
+    def commit_scrapied_urls(self):
+        # write deferred scrapied urls to scrapied table, they are no longer in flight
+        if not self.pending_scrapied_urls:
+            return
+        urls = [(url,) for url in self.pending_scrapied_urls]
+        self.pending_scrapied_urls = []
+        with self.conn:
+            self.conn.executemany('INSERT OR IGNORE INTO SCRAPIED (URL) VALUES(?);', urls)
+            self.conn.executemany('DELETE FROM INFLIGHT WHERE URL = ?;', urls)
+
+    def is_scrapied(self, url):
+        # returns True if url has been scrapied, answered by visited set
+        return url in self.visited
+
+    def if_scrapied_in_table(self, url):
+        # exact lookup in scrapied table, used to confirm bloom filter positives
+        return self.conn.execute('SELECT 1 FROM SCRAPIED WHERE URL = ?;', (url,)).fetchone() is not None
+
+    def get_queue_length(self):
+        return self.conn.execute('SELECT COUNT(*) FROM QUEUE;').fetchone()[0]
+
+    def get_scrapied_count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM SCRAPIED;').fetchone()[0]
+
+    def get_state(self, key):
+        # get value of state, None if state not set
+        record = self.conn.execute('SELECT VALUE FROM STATE WHERE KEY = ?;', (key,)).fetchone()
+        return record[0] if record else None
+
+    def set_state(self, key, value):
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO STATE (KEY, VALUE) VALUES(?, ?);', (key, value))
+
+    def import_urls(self, scrapied_urls, scrapying_urls):
+        """
+        Import scrapied set and scrapying queue saved by an older scraper.cache.
+
+        Args:
+            self - instance of class Frontier
+            scrapied_urls - container holds scrapied urls
+            scrapying_urls - container holds scrapying urls, the last one will
+        be popped first
+        """
+        for url in scrapied_urls:
+            self.visited.add(url)
+        with self.conn:
+            self.conn.executemany('INSERT OR IGNORE INTO SCRAPIED (URL) VALUES(?);',
+                                  ((url,) for url in scrapied_urls))
+            self.conn.executemany('INSERT INTO QUEUE (URL) VALUES(?);', ((url,) for url in scrapying_urls))
+        logger.info('imported %u scrapied urls and %u scrapying urls into frontier.' % (
+            len(scrapied_urls), len(scrapying_urls)))
+
+    def close_frontier(self):
+        self.conn.close()
+        logger.debug('frontier closed.')
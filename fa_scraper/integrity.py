@@ -0,0 +1,166 @@
+import sqlite3
+
+from concurrent.futures import ThreadPoolExecutor
+
+from fa_scraper import util
+
+import os
+import re
+
+import logging
+
+logger = logging.getLogger('default')
+
+# images saved by old versions are named "<id>.<extension>"
+LEGACY_FILENAME_REGEX = re.compile(r'^(\d+)\.\w+$')
+
+# files that aren't artwork images: partial downloads, link temp files and descriptions
+IGNORED_SUFFIXES = ('.part', '.link', ' Description.html')
+
+
+def get_image_artwork_id(name):
+    """
+    Get artwork ID from name of a file under images directory.
+
+    Args:
+        name - filename without directory
+
+    Returns:
+        artwork_id - ID of the artwork, None if file isn't an artwork image
+    """
+    if name.endswith(IGNORED_SUFFIXES):
+        return None
+    match = LEGACY_FILENAME_REGEX.match(name)
+    if match:
+        return int(match.group(1))
+    return util.get_artwork_id_from_filename(name)
+
+
+def scan_directory(path, known_mtime):
+    """
+    Scan one directory unless it is unchanged since last scan.
+
+    Args:
+        path - path of the directory
+        known_mtime - mtime(ns) recorded by last scan, None if never scanned
+
+    Returns:
+        (mtime, files, subdirectories) - mtime of directory, list of (name, size,
+    mtime) of files and list of subdirectory names, files and subdirectories are
+    None if directory is unchanged, mtime is None if directory is gone
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        if mtime == known_mtime:
+            # adding, removing or renaming entries changes mtime of directory
+            return mtime, None, None
+        files = []
+        subdirectories = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.name)
+                elif entry.is_file():
+                    # follows symlinks, a broken link to blob is not an image
+                    stat = entry.stat()
+                    files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        return mtime, files, subdirectories
+    except FileNotFoundError:
+        return None, None, None
+
+
+class ImageManifest(object):
+    """
+    ImageManifest class keeps an on-disk manifest of images directory, so
+    integrity check only scans directories changed since last check.
+    Manifest is MANIFEST and MANIFEST_DIRECTORY tables of fa_scraper.db, created
+    by Database's migration. Directories are scanned in parallel, as scandir and
+    stat spend most time waiting for file system.
+
+    Attributes:
+        conn - connection to database holds manifest tables
+        worker_count - number of threads scanning directories
+        ignored_directories - directory names not scanned, blob store e.g.
+    """
+
+    def __init__(self, database_name, worker_count=8, ignored_directories=('.blobs',)):
+        self.conn = sqlite3.connect(database_name, timeout=60)
+        self.worker_count = worker_count
+        self.ignored_directories = set(ignored_directories)
+
+    def update(self, root='images'):
+        """
+        Walk images directory, scanning only changed directories, and bring
+        manifest up to date.
+
+        Args:
+            self - instance of class ImageManifest
+            root - images directory, paths in manifest are relative to it
+
+        Returns:
+            (scanned, unchanged) - number of directories scanned and skipped
+        """
+        # directory -> (mtime, parent) recorded by last check
+        known = {path: (mtime, parent) for path, mtime, parent in
+                 self.conn.execute('SELECT PATH, MTIME, PARENT FROM MANIFEST_DIRECTORY;')}
+        children = {}
+        for path, (mtime, parent) in known.items():
+            children.setdefault(parent, []).append(path)
+
+        visited = set()
+        scanned = 0
+        pending = ['']
+        with ThreadPoolExecutor(self.worker_count) as executor, self.conn:
+            while pending:
+                # scan a whole level of directories in parallel
+                futures = [(path, executor.submit(scan_directory, os.path.join(root, path) if path else root,
+                                                  known.get(path, (None, None))[0])) for path in pending]
+                pending = []
+                for path, future in futures:
+                    mtime, files, subdirectories = future.result()
+                    if mtime is None:
+                        continue
+                    visited.add(path)
+                    if files is None:
+                        pending.extend(children.get(path, []))
+                        continue
+                    scanned = scanned + 1
+                    subdirectories = [os.path.join(path, name) if path else name for name in subdirectories
+                                      if name not in self.ignored_directories]
+                    self.replace_directory(path, mtime, os.path.dirname(path) if path else None, files)
+                    pending.extend(subdirectories)
+
+            # directories removed since last check
+            for path in set(known) - visited:
+                self.conn.execute('DELETE FROM MANIFEST WHERE DIRECTORY = ?;', (path,))
+                self.conn.execute('DELETE FROM MANIFEST_DIRECTORY WHERE PATH = ?;', (path,))
+
+        logger.info('image manifest updated, %u directories scanned, %u unchanged, %u removed.' % (
+            scanned, len(visited) - scanned, len(set(known) - visited)))
+        return scanned, len(visited) - scanned
+
+    def replace_directory(self, path, mtime, parent, files):
+        # replace manifest rows of a scanned directory, must be called in transaction
+        self.conn.execute('DELETE FROM MANIFEST WHERE DIRECTORY = ?;', (path,))
+        self.conn.executemany('INSERT OR REPLACE INTO MANIFEST (PATH, DIRECTORY, SIZE, MTIME, ARTWORK_ID) '
+                              'VALUES(?, ?, ?, ?, ?);',
+                              ((os.path.join(path, name) if path else name, path, size, file_mtime,
+                                get_image_artwork_id(name)) for name, size, file_mtime in files))
+        self.conn.execute('INSERT OR REPLACE INTO MANIFEST_DIRECTORY (PATH, MTIME, PARENT) VALUES(?, ?, ?);',
+                          (path, mtime, parent))
+
+    def get_artwork_ids(self):
+        """
+        Get IDs of artworks that have an image in manifest.
+
+        Args:
+            self - instance of class ImageManifest
+
+        Returns:
+            artwork_ids - set of artwork IDs
+        """
+        cursor = self.conn.execute('SELECT DISTINCT ARTWORK_ID FROM MANIFEST WHERE ARTWORK_ID IS NOT NULL;')
+        return {artwork_id for artwork_id, in cursor}
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,348 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+import logging
+
+logger = logging.getLogger('default')
+
+# if metrics are recorded, set by fa.py, every call returns at once if not
+enabled = False
+
+# upper bounds(seconds) of latency histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# seconds between two writes of metrics file
+WRITE_INTERVAL = 30
+
+
+class Metrics(object):
+    """
+    Metrics class holds counters and latency histograms, labelled by url type.
+    It is shared by threads, and a copy in each parse worker process is drained
+    and merged into main process's one.
+
+    Attributes:
+        counters - dictionary maps (name, url_type) to value
+        histograms - dictionary maps (stage, url_type) to [bucket counts...,
+    +Inf count, sum of seconds]
+        lock - lock guards counters and histograms
+        started - wall clock time metrics started
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def increment(self, name, url_type='', amount=1):
+        key = (name, url_type)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, stage, seconds, url_type=''):
+        key = (stage, url_type)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            index = 0
+            while index < len(BUCKETS) and seconds > BUCKETS[index]:
+                index = index + 1
+            histogram[index] = histogram[index] + 1
+            histogram[-1] = histogram[-1] + seconds
+
+    def drain(self):
+        """
+        Take recorded samples and clear them, used by parse worker processes.
+
+        Args:
+            self - instance of class Metrics
+
+        Returns:
+            samples - (counters, histograms), None if nothing is recorded
+        """
+        with self.lock:
+            if not self.counters and not self.histograms:
+                return None
+            samples = (self.counters, self.histograms)
+            self.counters = {}
+            self.histograms = {}
+        return samples
+
+    def merge(self, samples):
+        # add samples drained from another process
+        counters, histograms = samples
+        with self.lock:
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, values in histograms.items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    self.histograms[key] = list(values)
+                else:
+                    self.histograms[key] = [old + new for old, new in zip(histogram, values)]
+
+    def to_json(self):
+        """
+        Export metrics as JSON, histogram buckets are not cumulative.
+
+        Args:
+            self - instance of class Metrics
+
+        Returns:
+            text - JSON string
+        """
+        with self.lock:
+            counters = [{'name': name, 'url_type': url_type, 'value': value}
+                        for (name, url_type), value in sorted(self.counters.items())]
+            stages = [{'stage': stage, 'url_type': url_type, 'count': sum(histogram[:-1]),
+                       'seconds': histogram[-1], 'buckets': dict(zip(list(map(str, BUCKETS)) + ['+Inf'],
+                                                                     histogram[:-1]))}
+                      for (stage, url_type), histogram in sorted(self.histograms.items())]
+        return json.dumps({'started': self.started, 'updated': time.time(), 'counters': counters,
+                           'stages': stages}, indent=2)
+
+    def to_prometheus(self):
+        """
+        Export metrics in Prometheus text format, counters are named
+        fa_scraper_<name>_total and stage latencies fa_scraper_stage_seconds.
+
+        Args:
+            self - instance of class Metrics
+
+        Returns:
+            text - Prometheus text exposition
+        """
+        lines = []
+        with self.lock:
+            names = sorted({name for name, url_type in self.counters})
+            for name in names:
+                lines.append('# TYPE fa_scraper_%s_total counter' % name)
+                for (counter_name, url_type), value in sorted(self.counters.items()):
+                    if counter_name == name:
+                        lines.append('fa_scraper_%s_total{url_type="%s"} %s' % (name, url_type, value))
+            if self.histograms:
+                lines.append('# TYPE fa_scraper_stage_seconds histogram')
+            for (stage, url_type), histogram in sorted(self.histograms.items()):
+                labels = 'stage="%s",url_type="%s"' % (stage, url_type)
+                cumulative = 0
+                for bound, count in zip(list(map(str, BUCKETS)) + ['+Inf'], histogram[:-1]):
+                    cumulative = cumulative + count
+                    lines.append('fa_scraper_stage_seconds_bucket{%s,le="%s"} %u' % (labels, bound, cumulative))
+                lines.append('fa_scraper_stage_seconds_sum{%s} %.6f' % (labels, histogram[-1]))
+                lines.append('fa_scraper_stage_seconds_count{%s} %u' % (labels, cumulative))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        # write metrics file atomically, JSON if path ends with .json, Prometheus text otherwise
+        text = self.to_json() if path.endswith('.json') else self.to_prometheus()
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as file:
+            file.write(text)
+        os.replace(temp_path, path)
+
+
+# metrics of this process
+registry = Metrics()
+
+
+class Timer(object):
+    # context manager observes seconds spent in its block
+    __slots__ = ('stage', 'url_type', 'begin')
+
+    def __init__(self, stage, url_type):
+        self.stage = stage
+        self.url_type = url_type
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        registry.observe(self.stage, time.perf_counter() - self.begin, self.url_type)
+
+
+class NullTimer(object):
+    # timer used when metrics are disabled, does nothing
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+
+NULL_TIMER = NullTimer()
+
+
+def timer(stage, url_type=''):
+    """
+    Time a block of code as a stage.
+    with metrics.timer('parse', 'view'):
+        ...
+
+    Args:
+        stage - name of stage, 'network' e.g.
+        url_type - type of url the stage works on
+
+    Returns:
+        timer - context manager, a shared one doing nothing if disabled
+    """
+    if not enabled:
+        return NULL_TIMER
+    return Timer(stage, url_type)
+
+
+def increment(name, url_type='', amount=1):
+    if enabled:
+        registry.increment(name, url_type, amount)
+
+
+def observe(stage, seconds, url_type=''):
+    if enabled:
+        registry.observe(stage, seconds, url_type)
+
+
+class MetricsWriter(object):
+    """
+    MetricsWriter class writes metrics file periodically in a daemon thread,
+    and once more when it is closed.
+
+    Attributes:
+        path - path of metrics file
+        interval - seconds between two writes
+        stopped - event set when writer is closed
+        thread - writer thread
+    """
+
+    def __init__(self, path, interval=WRITE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='metrics-writer', daemon=True)
+        self.thread.start()
+        logger.info('writing metrics to "%s" every %us.' % (path, interval))
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            registry.write(self.path)
+        except EnvironmentError as error:
+            logger.error('failed to write metrics to "%s"(%s).' % (self.path, str(error)))
+
+    def close(self):
+        self.stopped.set()
+        self.write()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    # serves /metrics in Prometheus text format and /metrics.json
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = registry.to_prometheus(), 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body, content_type = registry.to_json(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        body = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # requests of metrics endpoint don't go to scraper's log
+        return
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    # http.server has one since python 3.7
+    daemon_threads = True
+
+
+class MetricsServer(object):
+    """
+    MetricsServer class serves metrics on localhost in a daemon thread.
+
+    Attributes:
+        server - HTTP server bound to 127.0.0.1
+        thread - serving thread
+    """
+
+    def __init__(self, port):
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, name='metrics-server', daemon=True)
+        self.thread.start()
+        logger.info('serving metrics on http://127.0.0.1:%u/metrics.' % self.server.server_address[1])
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Profiler(object):
+    """
+    Profiler class profiles main loop with cProfile(deterministic) or
+    pyinstrument(sampling, lower overhead), and saves report when stopped.
+
+    Attributes:
+        mode - 'cprofile' or 'pyinstrument'
+        path - path of report, cProfile stats(load with pstats) or
+    pyinstrument html
+        profiler - underlying profiler
+    """
+
+    def __init__(self, mode, path):
+        if mode == 'pyinstrument' and pyinstrument is None:
+            raise ImportError('pyinstrument profiler needs pyinstrument, install it with "pip install pyinstrument".')
+        self.mode = mode
+        self.path = path
+        self.profiler = pyinstrument.Profiler() if mode == 'pyinstrument' else cProfile.Profile()
+
+    def start(self):
+        if self.mode == 'pyinstrument':
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+        logger.info('profiling main loop with %s.' % self.mode)
+
+    def stop(self):
+        """
+        Stop profiling, save report and log a summary.
+
+        Args:
+            self - instance of class Profiler
+        """
+        if self.mode == 'pyinstrument':
+            self.profiler.stop()
+            with open(self.path, 'w') as report:
+                report.write(self.profiler.output_html())
+            logger.info('profile summary:\n%s' % self.profiler.output_text())
+        else:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.path)
+            summary = io.StringIO()
+            pstats.Stats(self.profiler, stream=summary).sort_stats('cumulative').print_stats(20)
+            logger.info('profile summary:\n%s' % summary.getvalue())
+        logger.info('profile saved to "%s".' % self.path)
@@ -1,28 +1,65 @@
 from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+from urllib.parse import urljoin
 
+import hashlib
+import html as html_entities
 import re
 import unicodedata
 
 from fa_scraper import util
 from fa_scraper.constant import *
 
-from functools import reduce
-
 import logging
 
 logger = logging.getLogger('default')
 
+# user a watchlist starts from, set by fa.py
+resume_on_user = ''
+
+# tree builder used by BeautifulSoup, 'html.parser' or 'lxml', set by fa.py
+parser_backend = 'html.parser'
+
 
 class Parser(object):
     """
     Parser class to initialize from a html and parse information from it
 
     Attributes:
-        bs - BeautifulSoup object to parse tags/attributes easily from DOM tree
+        bs - BeautifulSoup object to parse tags/attributes easily from DOM tree,
+    built on first access
+        html - html the parser initialized from
+        link_table - links used by get_all_urls, loaded on first use
     """
     # compiled url regex table
     URL_REGEX_TABLE = {}
 
+    # compiled regexes used by link extraction fast path
+    # comments, scripts and styles are skipped by DOM tree, so they are removed first
+    IGNORED_REGEX = re.compile(r'<!--.*?-->|<(script|style)\b.*?</\1\s*>', re.S | re.I)
+    LINK_TAG_START_REGEX = re.compile(r'<(?:a|figure)[\s/>]', re.I)
+    LINK_TAG_REGEX = re.compile(r'<(a|figure)(\s[^<>]*?)?/?>', re.I)
+    ATTRIBUTE_REGEX = re.compile(r'([^\s"\'<>/=]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'=<>`]+)))?')
+
+    # tree builder actually used, resolved from parser_backend on first instance
+    BACKEND = None
+
+    @classmethod
+    def resolve_backend(cls):
+        """
+        Resolve tree builder from parser_backend, fall back to html.parser if
+        the backend isn't installed.
+
+        Args:
+            cls - Parser class
+        """
+        backend = parser_backend
+        if not builder_registry.lookup(backend):
+            logger.warning('html parser backend "%s" is not installed, using html.parser.' % backend)
+            backend = 'html.parser'
+        logger.info('html parser backend set to %s.' % backend)
+        cls.BACKEND = backend
+
     @classmethod
     def generate_url_regex_table(cls):
         """
@@ -60,9 +97,13 @@ class Parser(object):
         # instance initialized.
         if not Parser.URL_REGEX_TABLE:
             Parser.generate_url_regex_table()
+        if not Parser.BACKEND:
+            Parser.resolve_backend()
 
-        # initialize bs object for parsing
-        self.bs = BeautifulSoup(html, "html.parser")
+        # bs object is built lazily, link extraction may not need it
+        self.html = html
+        self.dom = None
+        self.link_table = None
         self.url = url
 
         self.idMode = id_mode
@@ -73,6 +114,128 @@ class Parser(object):
 
         logger.debug('parser initialized.')
 
+    @property
+    def bs(self):
+        # initialize bs object for parsing on first access
+        if self.dom is None:
+            self.dom = BeautifulSoup(self.html, Parser.BACKEND)
+        return self.dom
+
+    @staticmethod
+    def parse_link_tag_attributes(attributes_string):
+        """
+        Parse attributes of a tag matched by LINK_TAG_REGEX.
+
+        Args:
+            attributes_string - string between tag name and '>'
+
+        Returns:
+            attributes - dictionary maps lower case attribute name to unescaped
+        value, None if an attribute is duplicated or has no value
+        """
+        attributes = {}
+        for match in Parser.ATTRIBUTE_REGEX.finditer(attributes_string or ''):
+            name = match.group(1).lower()
+            value = next((group for group in match.groups()[1:] if group is not None), None)
+            if name in attributes or value is None:
+                # DOM tree decides these cases on its own
+                return None
+            attributes[name] = html_entities.unescape(value)
+        return attributes
+
+    @staticmethod
+    def extract_link_table_fast(html, with_anchors):
+        """
+        Extract link table with regexes over raw html, without building DOM tree.
+
+        Args:
+            html - html of page, bytes or str
+            with_anchors - if href of every anchor is needed
+
+        Returns:
+            link_table - the same as get_link_table, None if html cannot be
+        decided without DOM tree
+        """
+        if isinstance(html, bytes):
+            try:
+                html = html.decode('utf-8')
+            except UnicodeDecodeError:
+                return None
+        html = Parser.IGNORED_REGEX.sub('', html)
+
+        link_table = {'anchors': [], 'more': [], 'more_half': None, 'button_right': None, 'figures': []}
+        tag_count = 0
+        for match in Parser.LINK_TAG_REGEX.finditer(html):
+            tag_count = tag_count + 1
+            attributes = Parser.parse_link_tag_attributes(match.group(2))
+            if attributes is None:
+                return None
+            if match.group(1).lower() == 'figure':
+                if 'id' not in attributes:
+                    return None
+                link_table['figures'].append(attributes['id'])
+                continue
+
+            href = attributes.get('href')
+            if with_anchors:
+                link_table['anchors'].append(href)
+            classes = attributes.get('class', '').split()
+            if 'more' in classes:
+                link_table['more'].append((classes, href))
+            if 'more-half' in classes and link_table['more_half'] is None:
+                link_table['more_half'] = href
+            if ' '.join(classes) == 'button-link right' and link_table['button_right'] is None:
+                link_table['button_right'] = href
+
+        # a tag regex cannot match, '>' in quoted attribute e.g.
+        if tag_count != len(Parser.LINK_TAG_START_REGEX.findall(html)):
+            return None
+        return link_table
+
+    def get_link_table(self):
+        """
+        Get links used by get_all_urls from DOM tree.
+
+        Args:
+            self - instance of class Parser
+
+        Returns:
+            link_table - dictionary holds
+                anchors - href of every anchor, only filled for watchlist
+                more - list of (classes, href) of anchors with class more
+                more_half - href of first anchor with class more-half
+                button_right - href of first anchor with class "button-link right"
+                figures - id of every figure
+        """
+        more_half = self.bs.findAll('a', {"class": "more-half"}, limit=1)
+        button_right = self.bs.findAll('a', {"class": "button-link right"}, limit=1)
+        return {'anchors': [tag.get('href') for tag in self.bs.findAll('a')] if '/watchlist/' in self.url else [],
+                'more': [(tag['class'], tag.get('href')) for tag in self.bs.findAll('a', {"class": "more"})],
+                'more_half': more_half[0].get('href') if more_half else None,
+                'button_right': button_right[0].get('href') if button_right else None,
+                'figures': [tag.get('id') for tag in self.bs.findAll('figure')]}
+
+    def load_link_table(self):
+        """
+        Load links used by get_all_urls, with fast path if DOM tree isn't built
+        yet and html can be decided without it.
+
+        Args:
+            self - instance of class Parser
+
+        Returns:
+            link_table - the same as get_link_table
+        """
+        if self.link_table is None:
+            if self.dom is None:
+                # try fast path before building DOM tree
+                self.link_table = self.extract_link_table_fast(self.html, '/watchlist/' in self.url)
+                if self.link_table is None:
+                    logger.debug('link extraction fast path undecided, using DOM tree.')
+            if self.link_table is None:
+                self.link_table = self.get_link_table()
+        return self.link_table
+
     def get_all_urls(self):
         """
         Get all matched urls from html.
@@ -97,12 +260,11 @@ class Parser(object):
         #        urls = urls + temp_urls
 
         if self.idMode == 'false':
-            gallery_user_folders = self.bs.findAll('ul', {"class": "default-group"})
+            link_table = self.load_link_table()
 
             # adds user gallery and scraps from a watch list
             if '/watchlist/' in self.url:
-                temp_users = self.bs.findAll('a')
-                temp_users_list = list(map(lambda tag: tag.get('href'), temp_users))
+                temp_users_list = link_table['anchors']
 
                 # starts list from specified user
                 if not self.resume_on_user == '':
@@ -151,32 +313,27 @@ class Parser(object):
                 urls.append(temp_view_url)
             
             # adds next page url
-            new_submissions_nextpage = self.bs.findAll('a', {"class": "more"})
+            new_submissions_nextpage = link_table['more']
             if new_submissions_nextpage:
                 nextpage_urls = []
                 found_next = False
-                for more in new_submissions_nextpage:
-                    if not 'prev' in more['class'] and found_next is False:
-                        nextpage_urls.append(more['href'])
+                for more_class, more_href in new_submissions_nextpage:
+                    if not 'prev' in more_class and found_next is False:
+                        nextpage_urls.append(more_href)
                         found_next = True
                 url_count = url_count + len(nextpage_urls)
                 urls = nextpage_urls + urls
-            new_submissions_nextpagealt = self.bs.findAll('a', {"class": "more-half"}, limit=1)
-            if new_submissions_nextpagealt:
-                nextpagealt_urls = list(map(lambda tag: tag.get('href'), new_submissions_nextpagealt))
-                url_count = url_count + len(nextpagealt_urls)
-                urls = urls + nextpagealt_urls
-            gallery_nextpagealt = self.bs.findAll('a', {"class": "button-link right"}, limit=1)
-            if gallery_nextpagealt:
-                gallery_nextpagealt_urls = list(map(lambda tag: tag.get('href'), gallery_nextpagealt))
-                url_count = url_count + len(gallery_nextpagealt_urls)
-                urls = urls + gallery_nextpagealt_urls
+            if link_table['more_half'] is not None:
+                url_count = url_count + 1
+                urls = urls + [link_table['more_half']]
+            if link_table['button_right'] is not None:
+                url_count = url_count + 1
+                urls = urls + [link_table['button_right']]
 
             # adds view urls
             if not '/user/' in self.url:
-                temp_urls = self.bs.findAll('figure')
+                temp_urls = list(link_table['figures'])
                 if temp_urls:
-                    temp_urls = list(map(lambda tag: tag.get('id'), temp_urls))
                     url_count = url_count + len(temp_urls)
                     for i in range(len(temp_urls)):
                         temp_urls[i] = temp_urls[i].replace('sid-','')
@@ -242,6 +399,44 @@ class Parser(object):
         return urls
 
 
+class ArtworkRecord(object):
+    """
+    ArtworkRecord class holds every field ArtworkParser extracts from an
+    artwork website, filled once and cannot be modified afterwards.
+
+    Attributes:
+        title - text of title tag
+        posted_title - content of og:title meta, "title by artist"
+        posted_time - string of popup_date span in stats tag
+        artist - title attribute of artist tag
+        image_link - src of submissionImg img, or data of flash_embed object
+        alt_link - href of "Download" a
+        category - text after "Category:" b
+        maturity_rating - content of twitter:data2 meta
+        description - html of second maintable, holds tags and description
+        description_row - html of third row of description
+        registered_users - text before last "registered" b
+        stats_tag - status tag where most attributes are included
+        cat_tag - cat tag where name and author attributes are included
+        keywords_tag - keywords tag in status tag
+        rating_tag - rating img in status tag
+        stats_html, cat_html, keywords_html - serialized tags, used by regexes
+    """
+    __slots__ = ('title', 'posted_title', 'posted_time', 'artist', 'image_link', 'alt_link', 'category',
+                 'maturity_rating', 'description', 'description_row', 'registered_users', 'stats_tag',
+                 'cat_tag', 'keywords_tag', 'rating_tag', 'stats_html', 'cat_html', 'keywords_html')
+    # fields holding strings, kept when record is sent to another process
+    PLAIN_FIELDS = ('title', 'posted_title', 'posted_time', 'artist', 'image_link', 'alt_link', 'category',
+                    'maturity_rating', 'description', 'description_row', 'registered_users')
+
+    def __init__(self, **fields):
+        for field in ArtworkRecord.__slots__:
+            object.__setattr__(self, field, fields.get(field))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ArtworkRecord is immutable.')
+
+
 class ArtworkParser(Parser):
     """
     ArtworkParser class inherit from Parser and parse information from an artwork
@@ -264,6 +459,7 @@ website.
     TAG_TABLE = {}  # tag table
 
     FILENAME_EXTENSION_REGEX = re.compile('.*\.(.+)')  # compiled regex to get file extension from download url
+    HTML_TAG_REGEX = re.compile('<[^>]*>')  # compiled regex to strip tags from description
 
     @classmethod
     def generate_regex_table(cls):
@@ -291,7 +487,8 @@ website.
     @classmethod
     def generate_tag_table(cls):
         """
-        Generate tag table to map attribute to tag(property of ArtworkParser).
+        Generate tag table to map attribute to serialized tag(field of
+        ArtworkRecord).
 
         Args:
             cls -ArtworkParser class
@@ -299,17 +496,117 @@ website.
         tag_table = {}
 
         for attribute in cls.ARTWORK_ATTRIBUTES:
-            tag_table[attribute] = 'stats_tag'
+            tag_table[attribute] = 'stats_html'
 
         # keywords author name uses different tags
-        tag_table.update({'Name': 'cat_tag',
-                          'Author': 'cat_tag',
-                          'Keywords': 'keywords_tag'})
+        tag_table.update({'Name': 'cat_html',
+                          'Author': 'cat_html',
+                          'Keywords': 'keywords_html'})
 
         logger.debug('artwork parser\'s tag table(stores tag name each attribute '
                      'uses) generated.')
         cls.TAG_TABLE = tag_table
 
+    @staticmethod
+    def get_class(tag):
+        # class attribute joined by space, '' if tag has no class
+        classes = tag.get('class')
+        return ' '.join(classes) if classes else ''
+
+    def extract_record(self):
+        """
+        Walk through DOM tree once, and extract every field used by getters into
+        an ArtworkRecord.
+
+        Args:
+            self - instance of class ArtworkParser
+
+        Returns:
+            record - ArtworkRecord of this artwork website
+        """
+        fields = {}
+        description_tables = []
+        registered_tag = None
+        artist_container = None
+        image_tag = None
+        object_tag = None
+
+        for tag in self.bs.find_all(True):
+            name = tag.name
+            if name == 'td':
+                tag_class = self.get_class(tag)
+                if tag_class == 'alt1 stats-container':
+                    fields.setdefault('stats_tag', tag)
+                elif 'cat' in tag_class.split():
+                    fields.setdefault('cat_tag', tag)
+            elif name == 'a':
+                if 'alt_link' not in fields and tag.string == 'Download' and tag.has_attr('href'):
+                    fields['alt_link'] = tag['href']
+            elif name == 'b':
+                string = tag.string
+                if string == 'registered':
+                    registered_tag = tag
+                elif string == 'Category:' and 'category' not in fields:
+                    fields['category'] = tag.next_sibling
+            elif name == 'meta':
+                if tag.get('property') == 'og:title' and 'posted_title' not in fields:
+                    fields['posted_title'] = tag.get('content')
+                elif tag.get('name') == 'twitter:data2' and 'maturity_rating' not in fields:
+                    fields['maturity_rating'] = tag.get('content')
+            elif name == 'table':
+                if 'maintable' in self.get_class(tag).split():
+                    description_tables.append(tag)
+            elif name == 'div':
+                if artist_container is None and self.get_class(tag) == 'classic-submission-title information':
+                    artist_container = tag
+            elif name == 'img':
+                if image_tag is None and tag.get('id') == 'submissionImg':
+                    image_tag = tag
+            elif name == 'object':
+                if object_tag is None and tag.get('id') == 'flash_embed':
+                    object_tag = tag
+            elif name == 'title':
+                if 'title' not in fields:
+                    fields['title'] = tag.text
+
+        # download link, looks for .swf if there isn't image
+        if image_tag and image_tag.has_attr('src'):
+            fields['image_link'] = image_tag['src']
+        elif object_tag and object_tag.has_attr('data'):
+            fields['image_link'] = object_tag['data']
+
+        if artist_container:
+            try:
+                fields['artist'] = artist_container.find('a').contents[0].attrs['title'].strip()
+            except (AttributeError, IndexError, KeyError):
+                logger.debug('cannot parse artist from title tag.')
+
+        if len(description_tables) > 1:
+            fields['description'] = str(description_tables[1])
+            description_rows = description_tables[1].findAll('tr')
+            if len(description_rows) > 2:
+                fields['description_row'] = str(description_rows[2])
+
+        if registered_tag:
+            fields['registered_users'] = str(registered_tag.previous_element)
+
+        # small lookups inside stats tag, and serialize tags once for regexes
+        stats_tag = fields.get('stats_tag')
+        if stats_tag:
+            fields['keywords_tag'] = stats_tag.find('div', {'id': 'keywords'})
+            posted_tag = stats_tag.find('span', {'class': 'popup_date'})
+            fields['posted_time'] = posted_tag.string if posted_tag else None
+            rating_tag = stats_tag.find('div', {'align': 'left'})
+            fields['rating_tag'] = rating_tag.find('img') if rating_tag else None
+            fields['stats_html'] = str(stats_tag)
+            if fields['keywords_tag']:
+                fields['keywords_html'] = str(fields['keywords_tag'])
+        if fields.get('cat_tag'):
+            fields['cat_html'] = str(fields['cat_tag'])
+
+        logger.debug('extracted artwork record.')
+        return ArtworkRecord(**fields)
+
     def parse_tags(self):
         """
         Parse tags that used to extract attributes from html, tags to be parsed
@@ -318,22 +615,15 @@ website.
         Args:
             self - instance of class ArtworkParser
         """
-        self.stats_tag = self.bs.find('td', {'class': 'alt1 stats-container'})
-        self.cat_tag = self.bs.find('td', {'class': 'cat'})
-        if self.stats_tag:
-            self.keywords_tag = self.stats_tag.find('div', {'id': 'keywords'})
-            self.posted_tag = self.stats_tag.find('span', {'class': 'popup_date'}).string
-            logger.debug(self.posted_tag)
-            self.rating_tag = self.stats_tag.find('div', {'align': 'left'})
-            self.rating_tag = self.rating_tag.find('img') if self.rating_tag else None
-        else:
-            # even cannot get stats_tag, still set tag to None to make sure other
-            # method can access property accordingly
-            self.keywords_tag = None
-            self.posted_tag = None
-            self.rating_tag = None
-            logger.debug('cannot parse stats_tag, set keywords_tag and posted_'
-                         'tag to None.')
+        self.record = self.extract_record()
+        self.stats_tag = self.record.stats_tag
+        self.cat_tag = self.record.cat_tag
+        # even cannot get stats_tag, still set tag to None to make sure other
+        # method can access property accordingly
+        self.keywords_tag = self.record.keywords_tag
+        self.posted_tag = self.record.posted_time
+        self.rating_tag = self.record.rating_tag
+        logger.debug(self.posted_tag)
         logger.debug('parsed tags used to retrieve artwork attribute.')
 
     def __init__(self, html, url, id_mode = 'false', startingid = 1, stopId = 0):
@@ -350,8 +640,62 @@ website.
         self.idMode = id_mode
         self.startId = startingid
         self.stopId = stopId
+        self.attributes = None  # cached result of get_artwork_attributes
         logger.debug('artwork parser initialized.')
 
+    def to_result(self):
+        """
+        Get plain extraction result, which holds no BeautifulSoup object so that
+        it can be sent from a parse worker process.
+
+        Args:
+            self - instance of class ArtworkParser
+
+        Returns:
+            result - dictionary with url, string fields of record and cached
+        attributes(None if get_artwork_attributes isn't called)
+        """
+        fields = {}
+        for field in ArtworkRecord.PLAIN_FIELDS:
+            value = getattr(self.record, field)
+            # NavigableString keeps whole tree alive, convert it to str
+            fields[field] = str(value) if value is not None else None
+        return {'url': self.url, 'fields': fields, 'attributes': self.attributes}
+
+    @classmethod
+    def from_result(cls, result, id_mode='false', startingid=1, stopId=0):
+        """
+        Rebuild parser from result of to_result, without html. Getters reading
+        record fields and cached attributes work as usual.
+
+        Args:
+            cls - ArtworkParser class
+            result - dictionary returned by to_result
+            id_mode, startingid, stopId - the same as __init__
+
+        Returns:
+            parser - instance of class ArtworkParser
+        """
+        parser = cls.__new__(cls)
+        parser.html = None
+        parser.dom = None
+        parser.link_table = None
+        parser.url = result['url']
+        parser.idMode = id_mode
+        parser.startId = startingid
+        parser.stopId = stopId
+        parser.resume_on_user = resume_on_user
+        parser.record = ArtworkRecord(**result['fields'])
+        parser.stats_tag = parser.cat_tag = parser.keywords_tag = parser.rating_tag = None
+        parser.posted_tag = parser.record.posted_time
+        parser.attributes = result['attributes']
+        return parser
+
+    def is_available(self):
+        # removed or access denied artworks are served with an error title
+        title = self.get_title()
+        return title != 'System Error' and title != 'FA -- Fur Affinity [dot] net'
+
     def get_download_link(self):
         """
         Get download link from html.
@@ -362,22 +706,14 @@ website.
         Returns:
             download_link - the download link of artwork, '' if it cannot get it
         """
-        try:
-            download_link = ''
-            image_tag = self.bs.find('img', {'id': 'submissionImg'})
-            object_tag = self.bs.find('object', {'id': 'flash_embed'})
-            if image_tag and image_tag.has_attr('src'):
-                download_link = 'https:' + image_tag['src']
-                logger.info('retrieved download link - "%s".' % download_link)
-            # looks for .swf
-            elif object_tag and object_tag.has_attr('data'):
-                download_link = 'https:' + object_tag['data']
-                logger.info('retrieved download link - "%s".' % download_link)
-            else:
-                logger.error('unable to retrieve download link.')
-            return download_link
-        except:
+        download_link = ''
+        if self.record.image_link:
+            # image links are scheme relative(//d.furaffinity.net/...)
+            download_link = urljoin(BASE_URL, self.record.image_link)
+            logger.info('retrieved download link - "%s".' % download_link)
+        else:
             logger.error('unable to retrieve download link.')
+        return download_link
 
     def get_alt_and_description(self):
         """
@@ -385,16 +721,13 @@ website.
         or if submission is a flash or music
         """
         try:
-            category = self.bs.find('b', text='Category:').next_sibling
+            category = self.record.category
             logger.debug('Category found = %s' % category)
             # for getting title of submission
             posted_title = self.get_posted_title()
             logger.debug('Title = %s' % posted_title)
             # for checking the description
-            desc_table = self.bs.findAll('table', {'class': 'maintable'})[1]
-            desc_row = desc_table.findAll('tr')[2]
-            # desc = desc_table.find('td', {'class': 'alt1'})
-            desc = str(desc_row)
+            desc = self.record.description_row
             if DESCRIPTION_KEYWORDS:
                 for keyword in DESCRIPTION_KEYWORDS:
                     if keyword.lower() in category.lower():
@@ -416,12 +749,9 @@ website.
         """
         Get download link from the download link in view page.
         """
-        try:
-            download_not_tag = self.bs.find('a', text='Download')
-            download_link = 'https:' + download_not_tag['href']
-            return download_link
-        except:
-            logger.error('unable to retrieve download link.')
+        if self.record.alt_link is not None:
+            return urljoin(BASE_URL, self.record.alt_link)
+        logger.error('unable to retrieve download link.')
 
     def get_filename(self):
         """
@@ -429,7 +759,6 @@ website.
         """
         try:
             # temp/default filename format
-            stats_tag = self.bs.find('td', {'class': 'alt1 stats-container'})
             posted_title = self.get_posted_title()
             posted_time = self.get_posted_time()
             art_id = self.get_id()
@@ -460,8 +789,7 @@ website.
         returns the table containing tags and description
         """
         try:
-            desc_table = self.bs.findAll('table', {'class': 'maintable'})[1]
-            desc = str(desc_table)
+            desc = self.record.description
             desc = unicodedata.normalize('NFKD', desc)
             desc = (desc.encode('ascii', 'ignore')).decode('utf-8')
             style = """
@@ -481,18 +809,13 @@ website.
             return False
 
     def get_artist(self):
-        try:
-            td_title_by_artist = self.bs.find('div', {'class': 'classic-submission-title information'})
-            artist_url = td_title_by_artist.find('a')
-            artist = artist_url.contents[0]
-            artist_string = artist.attrs['title']
-            return artist_string.strip()
-        except:
-            return '_user_unknown_'
+        if self.record.artist is not None:
+            return self.record.artist
+        return '_user_unknown_'
 
     def get_tag(self, tag):
         try:
-            category = self.bs.find('td', {'class': 'alt1 stats-container'})
+            category = self.record.stats_tag
             for index, content in enumerate(category.contents, start=0):
                 if category.contents[index].string == tag:
                     tag_index = index + 1
@@ -555,18 +878,17 @@ website.
             logger.error("id not returned")
 
     def get_maturity_rating(self):
-        try:
-            rating = self.bs.find('meta', {'name', 'twitter:data2'})
-            rating = rating['content']
+        rating = self.record.maturity_rating
+        if rating is not None:
             logger.debug("Content Rating is: " + rating)
-        except:
-            logger.debug("Content Rating not found")
-            return 'Unknown'
+            return rating
+        logger.debug("Content Rating not found")
+        return 'Unknown'
 
     def get_posted_time(self):  # something needs to change
         # get posted time from meta content
         try:
-            posted_time = self.stats_tag.find('span', {'class': 'popup_date'}).string
+            posted_time = self.record.posted_time
             logger.debug("Posted time is: " + posted_time)
             posted_time = util.parse_datetime(posted_time)
             posted_time = posted_time.strftime("%Y-%m-%d_%H-%M")
@@ -577,13 +899,10 @@ website.
     def get_posted_title(self):
         # get posted time from posted_tag
         # returns "title by artist"
-        try:
-            self.posted_titlename = self.bs.find('meta', {'property': 'og:title'})
-            if self.posted_titlename.has_attr('content'):
-                return self.posted_titlename['content']
-        except:
-            logger.error("No title found for post. using '_no title_")
-            return '_no title_'
+        if self.record.posted_title is not None:
+            return self.record.posted_title
+        logger.error("No title found for post. using '_no title_")
+        return '_no title_'
 
     @staticmethod
     def get_matched_string(tag, regex):
@@ -604,8 +923,15 @@ website.
 
     @staticmethod
     def combine_keywords(keywords):
-        # use reduce to combine all keywords to a string seperate by space
-        return reduce(lambda x, y: x + ' ' + y, keywords)
+        # combine all keywords to a string seperate by space, join is linear
+        return ' '.join(keywords)
+
+    def get_description_text(self):
+        # plain text of description row, used by full-text search
+        if self.record.description_row is None:
+            return None
+        text = html_entities.unescape(ArtworkParser.HTML_TAG_REGEX.sub(' ', self.record.description_row))
+        return ' '.join(text.split()) or None
 
     @staticmethod
     def generate_unparsed_attributes_log(unparsed_attributes):
@@ -613,8 +939,8 @@ website.
         # convert set to list
         unparsed_attributes = list(unparsed_attributes)
         if unparsed_attributes:
-            # use reduce to combine all attributes together seperate by space
-            return 'unparsed attributes: ' + reduce(lambda x, y: x + ' ' + y, unparsed_attributes) + '.'
+            # combine all attributes together seperate by space
+            return 'unparsed attributes: ' + ' '.join(unparsed_attributes) + '.'
         else:
             return 'all attributes parsed.'
 
@@ -638,6 +964,10 @@ website.
         Returns:
             attributes - attribute dictionary
         """
+        # attributes are extracted once, return a copy as caller may modify it
+        if self.attributes is not None:
+            return dict(self.attributes)
+
         # generate unparsed attributes set
         unparsed_set = set(ArtworkParser.ARTWORK_ATTRIBUTES)
         # initalize attributes
@@ -660,11 +990,9 @@ website.
 
         # get other attributes
         for attribute in ArtworkParser.ARTWORK_ATTRIBUTES:
-            # regular form - get tag and regex, and use regex to match from tag
-            tag_name = ArtworkParser.TAG_TABLE[attribute]
-            try:
-                tag = getattr(self, tag_name)
-            except AttributeError as error:
+            # regular form - get serialized tag and regex, and use regex to match from tag
+            tag = getattr(self.record, ArtworkParser.TAG_TABLE[attribute])
+            if tag is None:
                 # failed to get tag, skip
                 continue
             regex = ArtworkParser.REGEX_TABLE[attribute]
@@ -695,9 +1023,15 @@ website.
                 attributes[attribute] = content
                 unparsed_set.remove(attribute)
 
+        # description isn't an artwork table column, it is indexed for search
+        description = self.get_description_text()
+        if description:
+            attributes['Description'] = description
+
         logger.info(self.generate_unparsed_attributes_log(unparsed_set))
 
-        return attributes
+        self.attributes = attributes
+        return dict(attributes)
 
     @staticmethod
     def get_filename_extension(link):
@@ -715,16 +1049,36 @@ website.
         # convert url like /view/ to /full/
         return url.replace('view', 'full')
 
+    @staticmethod
+    def get_stats_hash(html):
+        """
+        Hash submission information table(stats tag and description) of raw
+        html, found without building a tree, so an unchanged page needn't be
+        parsed.
+
+        Args:
+            html - html of /full/ page, bytes or string
+
+        Returns:
+            stats_hash - hex SHA-256 of the table, None if page has no stats tag
+        """
+        if isinstance(html, str):
+            html = html.encode('utf-8')
+        begin = html.find(b'stats-container')
+        end = html.find(b'</table>', begin)
+        if begin < 0 or end < 0:
+            return None
+        return hashlib.sha256(html[begin:end]).hexdigest()
+
     def get_title(self):
-        title = self.bs.find('title')
-        title = title.text
+        title = self.record.title
         logger.info('title is "%s"' % title)
         return title
 
     def get_registered_users_online(self):
         try:
-            c = self.bs.find_all('b',string="registered")[-1].previous_element
-            v = "".join(re.findall(r'\d', str(c)))
+            c = self.record.registered_users
+            v = "".join(re.findall(r'\d', c))
             r = int(v)
             return r
         except:
@@ -0,0 +1,128 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from fa_scraper import metrics
+from fa_scraper import parse
+
+import logging
+
+logger = logging.getLogger('default')
+
+
+def parse_page(html, url, url_type, id_mode='false', starting_id=1, stop_id=0):
+    """
+    Parse scrapied page, touches neither frontier nor files.
+
+    Args:
+        html - html of the page
+        url - sub-url of the page
+        url_type - type of url returned by Scraper.prepare_url
+        id_mode, starting_id, stop_id - id mode settings of scraper
+
+    Returns:
+        (parser, urls) - parser of the page and urls found in it
+    """
+    # initalize parser according to url type
+    # add exception for id mode
+    # DOM tree is built lazily, links are loaded here(with DOM tree unless fast
+    # path decides the page) so that parse stage doesn't leak into get_all_urls
+    with metrics.timer('parse', url_type):
+        if url_type == 'view':
+            parser = parse.ArtworkParser(html, url, id_mode, starting_id, stop_id)
+        else:
+            parser = parse.Parser(html, url, id_mode, starting_id, stop_id)
+            if id_mode == 'false':
+                parser.load_link_table()
+    with metrics.timer('get_all_urls', url_type):
+        urls = parser.get_all_urls()
+    if url_type == 'view' and parser.is_available():
+        # attributes are cached by parser
+        with metrics.timer('attributes', url_type):
+            parser.get_artwork_attributes()
+    metrics.increment('pages_parsed', url_type)
+    return parser, urls
+
+
+def init_worker(backend, resume_on_user, metrics_enabled=False):
+    # settings are set by fa.py in main process, and spawned workers don't have them
+    parse.parser_backend = backend
+    parse.resume_on_user = resume_on_user
+    metrics.enabled = metrics_enabled
+    # forked workers inherit samples main process recorded so far
+    metrics.registry = metrics.Metrics()
+    # warm up tables once, instead of on first page
+    parse.Parser.resolve_backend()
+    parse.Parser.generate_url_regex_table()
+    parse.ArtworkParser.generate_regex_table()
+    parse.ArtworkParser.generate_tag_table()
+
+
+def parse_page_in_worker(html, url, url_type, id_mode='false', starting_id=1, stop_id=0):
+    """
+    Parse page in worker process and return plain result.
+
+    Args:
+        the same as parse_page
+
+    Returns:
+        (result, urls, samples) - result returned by ArtworkParser.to_result,
+    None if page isn't a view, urls found in the page and metrics recorded while
+    parsing, None if metrics are disabled
+    """
+    parser, urls = parse_page(html, url, url_type, id_mode, starting_id, stop_id)
+    samples = metrics.registry.drain() if metrics.enabled else None
+    if url_type == 'view':
+        return parser.to_result(), urls, samples
+    return None, urls, samples
+
+
+class ParsePool(object):
+    """
+    ParsePool class to parse pages in worker processes, so parsing isn't
+    limited to one core by GIL.
+    Raw html is sent to workers, and only plain results come back, which are
+    rebuilt into parsers without html by restore.
+
+    Attributes:
+        worker_count - number of worker processes
+        executor - ProcessPoolExecutor runs parse_page_in_worker
+    """
+
+    def __init__(self, worker_count=2):
+        self.worker_count = worker_count
+        self.executor = ProcessPoolExecutor(worker_count, initializer=init_worker,
+                                            initargs=(parse.parser_backend, parse.resume_on_user, metrics.enabled))
+        logger.info('parse pool started with %u workers.' % worker_count)
+
+    def submit(self, html, url, url_type, id_mode='false', starting_id=1, stop_id=0):
+        # submit page to workers, returns future of parse_page_in_worker
+        return self.executor.submit(parse_page_in_worker, html, url, url_type, id_mode, starting_id, stop_id)
+
+    @staticmethod
+    def restore(result, id_mode='false', starting_id=1, stop_id=0):
+        """
+        Rebuild parse_page's return value from result of a worker.
+
+        Args:
+            result - (result, urls, samples) returned by parse_page_in_worker,
+        samples are merged into metrics of this process
+            id_mode, starting_id, stop_id - id mode settings of scraper
+
+        Returns:
+            (parser, urls) - parser is None if page isn't a view, as only urls
+        of such pages are used
+        """
+        artwork_result, urls, samples = result
+        if samples:
+            metrics.registry.merge(samples)
+        if artwork_result is None:
+            return None, urls
+        return parse.ArtworkParser.from_result(artwork_result, id_mode, starting_id, stop_id), urls
+
+    def parse(self, html, url, url_type, id_mode='false', starting_id=1, stop_id=0):
+        # parse page in a worker and wait for it
+        return self.restore(self.submit(html, url, url_type, id_mode, starting_id, stop_id).result(),
+                            id_mode, starting_id, stop_id)
+
+    def shutdown(self):
+        self.executor.shutdown()
+        logger.info('parse pool shut down.')
@@ -0,0 +1,149 @@
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import datetime
+import threading
+import time
+
+import logging
+
+logger = logging.getLogger('default')
+
+
+class TokenBucket(object):
+    """
+    TokenBucket class to limit request rate of one host.
+    Callers reserve a token and are told how long to wait for it, so the bucket
+    never sleeps itself and can be shared by threads and coroutines.
+
+    Attributes:
+        interval - seconds between two requests, 0 means unlimited
+        capacity - max number of tokens, requests allowed in a burst
+        tokens - tokens available at updated, negative if reserved ahead
+        updated - monotonic time tokens were last refilled, in future while
+    backing off so that no token is earned before backoff ends
+        lock - lock guards all attributes above
+    """
+
+    def __init__(self, interval, capacity=1):
+        self.interval = interval
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        # add tokens earned since last update, must be called with lock held
+        if now <= self.updated:
+            return
+        if self.interval > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+        else:
+            self.tokens = self.capacity
+        self.updated = now
+
+    def reserve(self):
+        """
+        Take one token.
+
+        Args:
+            self - instance of class TokenBucket
+
+        Returns:
+            wait - seconds caller should wait before sending request
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            self.tokens = self.tokens - 1
+            wait = -self.tokens * self.interval if self.tokens < 0 else 0
+            # requests waiting through a backoff are spaced by interval after it
+            return max(self.updated - now, 0) + wait
+
+    def set_interval(self, interval):
+        with self.lock:
+            self.refill(time.monotonic())
+            self.interval = interval
+
+    def backoff(self, seconds):
+        # block all requests for given seconds, and start refilling from empty after it
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            self.updated = max(self.updated, now + seconds)
+            self.tokens = min(self.tokens, 0)
+
+
+class RateLimiter(object):
+    """
+    RateLimiter class keeps one token bucket per host, the html host and image
+    hosts have separate budgets.
+
+    Attributes:
+        html_host - host of html pages, 'www.furaffinity.net' e.g.
+        html_interval - seconds between two requests to html host
+        image_interval - seconds between two requests to each image host
+        buckets - dictionary maps host to its TokenBucket
+    """
+
+    def __init__(self, html_host, html_interval, image_interval):
+        self.html_host = html_host
+        self.html_interval = html_interval
+        self.image_interval = image_interval
+        self.buckets = {html_host: TokenBucket(html_interval)}
+        self.lock = threading.Lock()
+        logger.info('rate limiter set to %ss for %s and %ss for image hosts.' % (
+            html_interval, html_host, image_interval))
+
+    def get_bucket(self, url):
+        # get bucket of url's host, create one with image budget for new hosts
+        host = urlparse(url).netloc or self.html_host
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            with self.lock:
+                bucket = self.buckets.setdefault(host, TokenBucket(self.image_interval))
+        return bucket
+
+    def reserve(self, url):
+        # take one token for url's host, returns seconds to wait
+        return self.get_bucket(url).reserve()
+
+    def acquire(self, url):
+        # take one token for url's host, sleeps until request is allowed
+        wait = self.reserve(url)
+        if wait > 0:
+            logger.debug('rate limiter delays "%s" for %.2fs.' % (url, wait))
+            time.sleep(wait)
+
+    def set_interval(self, host, interval):
+        self.get_bucket('//' + host).set_interval(interval)
+
+    def get_interval(self, host):
+        return self.get_bucket('//' + host).interval
+
+    def backoff(self, url, seconds):
+        logger.info('backing off %s for %.0fs.' % (urlparse(url).netloc, seconds))
+        self.get_bucket(url).backoff(seconds)
+
+    @staticmethod
+    def parse_retry_after(value):
+        """
+        Parse Retry-After header, which is either seconds or a HTTP-date.
+
+        Args:
+            value - value of Retry-After header, may be None
+
+        Returns:
+            seconds - seconds to wait, None if header is missing or invalid
+        """
+        if not value:
+            return None
+        try:
+            return max(0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_time = parsedate_to_datetime(value)
+            return max(0, (retry_time - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
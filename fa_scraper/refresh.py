@@ -0,0 +1,150 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import math
+import time
+
+from fa_scraper import metrics
+from fa_scraper import util
+
+import logging
+
+logger = logging.getLogger('default')
+
+# artworks refreshed between two progress logs
+PROGRESS_INTERVAL = 1000
+
+
+def get_priority(stale_days, favorites, views):
+    """
+    Priority of refreshing an expired artwork, stale and popular artworks are
+    refreshed first. Popularity grows with logarithm of favorites and views,
+    so a few very popular artworks don't starve the rest.
+
+    Args:
+        stale_days - days since artwork was last scrapied
+        favorites - number of favorites, None if unknown
+        views - number of views, None if unknown
+
+    Returns:
+        priority - larger is refreshed earlier
+    """
+    popularity = 1 + math.log1p(max(favorites or 0, 0)) + 0.5 * math.log1p(max(views or 0, 0))
+    return (stale_days or 0) * popularity
+
+
+class RefreshScheduler(object):
+    """
+    RefreshScheduler class refreshes expired artworks in update mode.
+    Expired artworks are put into refresh queue of database in order of
+    priority, and fed to a bounded pool of worker threads. Requests of all
+    workers take tokens from scraper's rate limiter, so workers only overlap
+    network latency and never exceed scrapy interval. Records are written by
+    calling thread, and refreshed artworks leave queue in the same transaction
+    as their records, so an interrupted update resumes where it stopped.
+    KeyboardInterrupt stops scheduler: queued artworks are cancelled, results
+    already received are written, and run returns without waiting for artworks
+    being fetched.
+
+    Attributes:
+        db - database instance, only used by calling thread
+        scraper - scraper instance, scrapy_expired_url is called by workers
+        worker_count - number of worker threads
+        counts - dictionary maps state returned by scrapy_expired_url to number
+    of artworks
+    """
+
+    def __init__(self, db, scraper, worker_count=2):
+        self.db = db
+        self.scraper = scraper
+        self.worker_count = max(1, worker_count)
+        self.counts = {'updated': 0, 'unchanged': 0, 'failed': 0}
+
+    def run(self, expire_time):
+        """
+        Refresh every expired artwork, continues queue left by an interrupted
+        run if there is one. Returns early if interrupted.
+
+        Args:
+            self - instance of class RefreshScheduler
+            expire_time - expire time, days
+
+        Returns:
+            counts - dictionary maps state to number of artworks
+        """
+        queue_length = self.db.get_refresh_queue_length()
+        if queue_length:
+            logger.info('resumed refreshing %u expired artworks left by last run.' % queue_length)
+        else:
+            queue_length = self.db.fill_refresh_queue(expire_time, get_priority)
+            logger.info('queued %u expired artworks for refresh.' % queue_length)
+
+        begin = time.perf_counter()
+        in_flight = {}
+        artwork_ids = self.db.iter_refresh_queue()
+        executor = ThreadPoolExecutor(self.worker_count, thread_name_prefix='refresh-worker')
+        try:
+            while True:
+                # keep every worker busy with one artwork queued ahead
+                while len(in_flight) < self.worker_count * 2:
+                    artwork_id = next(artwork_ids, None)
+                    if artwork_id is None:
+                        break
+                    future = executor.submit(self.scraper.scrapy_expired_url, util.generate_url_from_id(artwork_id),
+                                             self.db.get_validators(artwork_id))
+                    in_flight[future] = artwork_id
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    artwork_id = in_flight.pop(future)
+                    try:
+                        state, artwork, validators = future.result()
+                    except Exception as error:
+                        logger.error('failed to refresh expired artwork %u(%s).' % (artwork_id, str(error)))
+                        state, artwork, validators = 'failed', None, None
+                    self.save_result(artwork_id, state, artwork, validators)
+                    refreshed_count = sum(self.counts.values())
+                    if refreshed_count % PROGRESS_INTERVAL == 0:
+                        logger.info('refreshed %u/%u expired artworks, %.2f artworks/sec.' % (
+                            refreshed_count, queue_length, refreshed_count / (time.perf_counter() - begin)))
+        except KeyboardInterrupt:
+            # artworks not written stay in refresh queue for next run
+            logger.info('refresh interrupted, %u expired artworks left.' % (queue_length - sum(self.counts.values())))
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            executor.shutdown()
+        self.db.flush()
+        logger.info('refreshed expired artworks, %u updated, %u unchanged and %u failed.' % (
+            self.counts['updated'], self.counts['unchanged'], self.counts['failed']))
+        return self.counts
+
+    def save_result(self, artwork_id, state, artwork, validators):
+        """
+        Save result of scrapy_expired_url and remove artwork from queue. Failed
+        artworks stay expired, so they are queued again by next run.
+
+        Args:
+            self - instance of class RefreshScheduler
+            artwork_id - ID of the artwork
+            state, artwork, validators - returned by scrapy_expired_url
+        """
+        self.counts[state] = self.counts[state] + 1
+        metrics.increment('artworks_refreshed', state)
+        if state == 'unchanged':
+            self.db.set_validators(artwork_id, validators)
+            # only update added time, so it expires again later
+            self.db.touch_artwork(artwork_id, util.get_current_time())
+            logger.info('expired artwork(with ID: %u) is unchanged.' % artwork_id)
+        elif state == 'updated':
+            self.db.set_validators(artwork_id, validators)
+            # update added time and set ID
+            artwork['ID'] = artwork_id
+            artwork['Added'] = util.get_current_time()
+
+            information = util.get_artwork_information(artwork)
+            logger.info('updated artwork information: %s' % information)
+
+            # replace record in database
+            self.db.insert_or_replace_artwork(artwork)
+            logger.info('completed to re-scrapy expired artwork(with ID: %u)\'s info .' % artwork_id)
+        self.db.finish_refresh(artwork_id)
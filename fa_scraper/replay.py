@@ -0,0 +1,267 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import collections
+import gzip
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from fa_scraper import metrics
+from fa_scraper import parse
+from fa_scraper import parsepool
+from fa_scraper import visited
+from fa_scraper.constant import *
+
+import logging
+
+logger = logging.getLogger('default')
+
+# codecs responses can be compressed with, zstd needs zstandard
+CODECS = ('gzip', 'zstd')
+
+# pages parsed by one task of reparse workers, amortizes inter-process overhead
+REPARSE_CHUNK_SIZE = 16
+
+
+def compress(codec, content):
+    # compress raw response with codec
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(content)
+    return gzip.compress(content, compresslevel=6)
+
+
+def decompress(codec, body):
+    # decompress stored response, codec is the one it was stored with
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(body)
+    return gzip.decompress(body)
+
+
+class ResponseStore(object):
+    """
+    ResponseStore class keeps raw html responses compressed in a sqlite
+    database, keyed by sub-url and fetch time, so pages can be parsed again
+    after parsing logic changes without fetching them again.
+    Response Table:
+    +------------+------------+--------------------------------------------+
+    |URL         |Text        |sub-url of the page, '/full/26350907/' e.g. |
+    |------------+------------+--------------------------------------------|
+    |Fetched     |Real        |unix time response was received             |
+    |------------+------------+--------------------------------------------|
+    |Codec       |Text        |'gzip' or 'zstd'                            |
+    |------------+------------+--------------------------------------------|
+    |Body        |Blob        |compressed response content                 |
+    +------------+------------+--------------------------------------------+
+    Store is written by executor threads of async engine, so its connection
+    is guarded by a lock.
+
+    Attributes:
+        conn - connection to response database
+        codec - codec new responses are compressed with
+        lock - lock guards connection
+        stored_count - responses stored by this instance
+        stored_bytes - compressed bytes stored by this instance
+    """
+
+    def __init__(self, database_name='responses.db', codec='gzip'):
+        if codec == 'zstd' and zstandard is None:
+            raise ImportError('zstd codec needs zstandard, install it with "pip install zstandard".')
+        self.conn = sqlite3.connect(database_name, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL;')
+        self.conn.execute('PRAGMA synchronous=NORMAL;')
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS RESPONSE('
+                              'URL            TEXT NOT NULL, '
+                              'FETCHED        REAL NOT NULL, '
+                              'CODEC          TEXT NOT NULL, '
+                              'BODY           BLOB NOT NULL);')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS RESPONSE_URL ON RESPONSE (URL, FETCHED);')
+        self.codec = codec
+        self.lock = threading.Lock()
+        self.stored_count = 0
+        self.stored_bytes = 0
+        logger.debug('response store "%s" initialized, compressed with %s.' % (database_name, codec))
+
+    @staticmethod
+    def get_sub_url(url):
+        # responses are keyed by sub-url, so they are found with another base url
+        return (url[len(BASE_URL):] or '/') if url.startswith(BASE_URL) else url
+
+    def put(self, url, content, fetched=None):
+        """
+        Compress and store a response.
+
+        Args:
+            self - instance of class ResponseStore
+            url - url or sub-url of the page
+            content - raw response content(bytes)
+            fetched - unix time response was received, defaults to now
+        """
+        with metrics.timer('response_store'):
+            body = compress(self.codec, content)
+        fetched = time.time() if fetched is None else fetched
+        with self.lock:
+            with self.conn:
+                self.conn.execute('INSERT INTO RESPONSE (URL, FETCHED, CODEC, BODY) VALUES(?, ?, ?, ?);',
+                                  (self.get_sub_url(url), fetched, self.codec, body))
+            self.stored_count = self.stored_count + 1
+            self.stored_bytes = self.stored_bytes + len(body)
+        metrics.increment('responses_stored')
+
+    def get(self, url):
+        """
+        Get latest stored response of url.
+
+        Args:
+            self - instance of class ResponseStore
+            url - url or sub-url of the page
+
+        Returns:
+            (content, fetched) - decompressed content and unix time it was
+        received, None if url isn't stored
+        """
+        with self.lock:
+            record = self.conn.execute('SELECT CODEC, BODY, FETCHED FROM RESPONSE WHERE URL = ? '
+                                       'ORDER BY FETCHED DESC LIMIT 1;', (self.get_sub_url(url),)).fetchone()
+        if record:
+            return decompress(record[0], record[1]), record[2]
+
+    def iter_latest_responses(self, prefix, chunk_size=1000):
+        """
+        Iterate the latest response of every url starting with prefix, responses
+        are still compressed and read chunk by chunk.
+
+        Args:
+            self - instance of class ResponseStore
+            prefix - prefix of sub-urls, '/full/' e.g.
+            chunk_size - number of responses read at a time
+
+        Returns:
+            responses - iterator of (url, fetched, codec, body)
+        """
+        # bare columns of MAX() aggregate come from the row holding max value,
+        # prefix is a range so that index on url is used
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        cursor = self.conn.execute('SELECT URL, MAX(FETCHED), CODEC, BODY FROM RESPONSE '
+                                   'WHERE URL >= ? AND URL < ? GROUP BY URL;', (prefix, upper))
+        while True:
+            records = cursor.fetchmany(chunk_size)
+            if not records:
+                break
+            for record in records:
+                yield record
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+        if self.stored_count:
+            logger.info('%u responses stored, %u bytes compressed.' % (self.stored_count, self.stored_bytes))
+        logger.debug('response store closed.')
+
+
+def reparse_pages_in_worker(pages):
+    """
+    Decompress and parse stored artwork pages in worker process.
+
+    Args:
+        pages - list of (url, fetched, codec, body) returned by
+    ResponseStore.iter_latest_responses
+
+    Returns:
+        (results, samples) - list of (url, fetched, result) where result is
+    returned by ArtworkParser.to_result, None if artwork isn't available, and
+    metrics recorded while parsing, None if metrics are disabled
+    """
+    results = []
+    for url, fetched, codec, body in pages:
+        html = decompress(codec, body)
+        with metrics.timer('parse', 'reparse'):
+            parser = parse.ArtworkParser(html, url)
+        result = None
+        if parser.is_available():
+            with metrics.timer('attributes', 'reparse'):
+                parser.get_artwork_attributes()
+            result = parser.to_result()
+        results.append((url, fetched, result))
+        metrics.increment('pages_parsed', 'reparse')
+    samples = metrics.registry.drain() if metrics.enabled else None
+    return results, samples
+
+
+def iter_chunks(iterable, chunk_size):
+    # split iterable into lists of chunk_size items
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def reparse_artworks(store, db, worker_count=0, archived_only=True):
+    """
+    Rebuild artwork records from stored /full/ pages with current parsing
+    logic, without network requests. Pages are parsed by worker processes,
+    a bounded number of chunks are in flight so that memory doesn't grow with
+    store.
+
+    Args:
+        store - instance of class ResponseStore
+        db - database instance
+        worker_count - number of parse processes, 0 uses all cores
+        archived_only - if True, only artworks already in database are rebuilt,
+    so records without image aren't added
+
+    Returns:
+        (rebuilt_count, skipped_count) - number of records rebuilt, and pages
+    skipped as unavailable or not archived
+    """
+    worker_count = worker_count or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(worker_count, initializer=parsepool.init_worker,
+                                   initargs=(parse.parser_backend, parse.resume_on_user, metrics.enabled))
+    logger.info('reparsing stored pages with %u workers.' % worker_count)
+    rebuilt_count = skipped_count = 0
+    in_flight = collections.deque()
+    chunks = iter_chunks(store.iter_latest_responses('/full/'), REPARSE_CHUNK_SIZE)
+    begin = time.perf_counter()
+    try:
+        while True:
+            # keep every worker busy, with a few chunks queued ahead
+            for pages in chunks:
+                in_flight.append(executor.submit(reparse_pages_in_worker, pages))
+                if len(in_flight) >= worker_count * 4:
+                    break
+            if not in_flight:
+                break
+            results, samples = in_flight.popleft().result()
+            if samples:
+                metrics.registry.merge(samples)
+            for url, fetched, result in results:
+                match = visited.VisitedSet.ID_URL_REGEX.match(url)
+                artwork_id = int(match.group(1)) if match else None
+                if result is None or artwork_id is None or (archived_only and not db.has_artwork(artwork_id)):
+                    skipped_count = skipped_count + 1
+                    continue
+                attributes = parse.ArtworkParser.from_result(result).get_artwork_attributes()
+                attributes['ID'] = artwork_id
+                # record reflects page as it was fetched
+                attributes['Added'] = time.strftime('%Y-%m-%d %H:%M', time.localtime(fetched))
+                db.insert_or_replace_artwork(attributes)
+                rebuilt_count = rebuilt_count + 1
+            # log progress about every 10000 pages
+            page_count = rebuilt_count + skipped_count
+            if page_count // 10000 != (page_count - len(results)) // 10000:
+                logger.info('reparsed %u pages, %.1f pages/sec.' % (page_count, page_count / (time.perf_counter() - begin)))
+    finally:
+        executor.shutdown()
+    db.flush()
+    logger.info('rebuilt %u artwork records from stored pages, skipped %u pages.' % (rebuilt_count, skipped_count))
+    return rebuilt_count, skipped_count
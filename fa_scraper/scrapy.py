@@ -1,123 +1,218 @@
 from urllib.parse import quote
 
 import requests
-import cfscrape
 import random
 import hashlib
+import itertools
+import os
 import re
+import threading
 
+from fa_scraper import download
+from fa_scraper import frontier
+from fa_scraper import metrics
 from fa_scraper import parse
+from fa_scraper import parsepool
+from fa_scraper import ratelimit
+from fa_scraper import session
 from fa_scraper import util
+from fa_scraper import visited
 from fa_scraper.constant import *
 
 import logging
 import json
 
-import collections
-
-import time
-
 logger = logging.getLogger('default')
 
 
 class Scraper(object):
-    SCRAPIED_BASE = False  # lazy load technical, flag to indicate whether base url has been scrapied
-
-    def open_url(self, url):
+    def open_url(self, url, url_type='other'):
         """
         Open url and return response content.
 
         Args:
             self - instance of class Scraper
             url - url that to be opened
+            url_type - type of url, label of request metrics
 
         Returns:
             content - the content of HTTP Response
         """
+        response = self.request_url(url, url_type=url_type)
+        if response is not None:
+            self.record_response(url, response.content)
+            return response.content
+
+    def record_response(self, url, content):
+        # keep raw html in response store so it can be reparsed without fetching
+        if self.response_store:
+            self.response_store.put(url, content)
+
+    def request_url(self, url, stream=False, headers=None, accepted_codes=(200,), url_type='other'):
+        """
+        Send request to url, retry on errors, and return successful response.
+
+        Args:
+            self - instance of class Scraper
+            url - url that to be opened
+            stream - if True, body is not read until response is iterated,
+        caller should close the response
+            headers - dictionary of extra request headers, Range e.g.
+            accepted_codes - status codes returned to caller as success
+            url_type - type of url, label of request metrics
+
+        Returns:
+            response - HTTP Response with status code in accepted_codes, None if
+        fails
+        """
 
         # use quote to deal with arabic/... url, safe ':/' is needed
         url = quote(url, safe=':/')
         attempts = 0
-        delay = float(self.scrapy_interval) + float(random.randrange(1, 3) / 10)
-        long_delay = random.randint(30, 70)
         while attempts < 15:
+            # wait for host's rate limiter to avoid ddos to website
+            with metrics.timer('rate_limit_wait', url_type):
+                self.rate_limiter.acquire(url)
+            # back off a random long delay on error if server doesn't tell how long
+            long_delay = random.randint(30, 70)
             try:
                 # timeout is necessary here
-                response = self.scraper.get(url, timeout=60, cookies=self.cookies)
-
-                # when succesful sets attempts to 6
+                session = self.get_session()
+                with metrics.timer('network', url_type):
+                    response = session.get(url, timeout=60, cookies=self.cookies, stream=stream, headers=headers)
+                metrics.increment('requests', url_type)
 
                 # checks response's status code
-                if response.status_code == 200:
+                if response.status_code in accepted_codes:
                     # successful response
                     logger.info('received response from "%s".' % url)
-                    attempts = 15
-                    # add sleep here to avoid ddos to website
-                    time.sleep(delay)
-                    return response.content
-                elif response.status_code == 503:
+                    # share clearance if cloudflare challenge was just passed
+                    self.session_factory.save_clearance(session)
+                    return response
+                # body of failed response is not needed
+                response.close()
+                if response.status_code == 503 or response.status_code == 429:
                     # try again but a bit slower this time
                     logger.error('request sent to "%s" returned error code: %u.' % (url, response.status_code))
-                    time.sleep(long_delay)
+                    retry_after = ratelimit.RateLimiter.parse_retry_after(response.headers.get('Retry-After'))
+                    self.rate_limiter.backoff(url, long_delay if retry_after is None else retry_after)
                     continue
                 elif response.status_code == 404:
-                    # try again but a bit slower this time
                     logger.warning('request sent to "%s" returned error code: %u.' % (url, response.status_code))
-                    attempts = 15
-                    time.sleep(delay)
+                    return None
                 else:
                     logger.error('request sent to "%s" returned error code: %u.' % (url, response.status_code))
-                    time.sleep(long_delay)
+                    self.rate_limiter.backoff(url, long_delay)
                 attempts += 1
                 continue
             except:
                 # catch all Exceptions here
                 attempts += 1
+                metrics.increment('request_errors', url_type)
                 logger.error('error when sending request to "%s". attempt %s' % (url, attempts))
-                time.sleep(long_delay)
+                self.rate_limiter.backoff(url, long_delay)
                 continue
 
+    def get_session(self):
+        # session of calling thread, sessions aren't thread safe so none is shared
+        session = getattr(self.thread_sessions, 'session', None)
+        if session is None:
+            session = self.session_factory.create_session()
+            self.thread_sessions.session = session
+        return session
+
     def get_scrapying_url(self):
-        # get next url to be scrapied from instance's scrapying queue
-        try:
-            return self.scrapying_queue.pop()
-        except IndexError:
+        # get next url to be scrapied from instance's frontier
+        url = self.frontier.pop_url()
+        if url is None:
+            if self.download_pool and self.download_pool.has_pending_jobs():
+                # downloading artworks may still fail and be handed back, wait for them
+                logger.info('scrapying queue empty, waiting for downloads to finish.')
+                self.download_pool.join()
+                return None
             # if scrapying queue is empty, then program should exit directly
             logger.fatal('scrapying queue empty.')
             exit(-1)
+        return url
 
     def add_unscrapied_urls(self, urls):
-        # add urls to instance's scrapying queue
-        url_count = 0
-        if self.id_mode == 'false':
-            for url in urls:
-                # check if url has been scrapied here
-                if not url in self.scrapied_set:
-                    self.scrapying_queue.append(url)
-                    url_count = url_count + 1
+        # add urls to instance's frontier
         # temp patch for http 500 error. clear and repop queue with 2 or more pages every time.
-        elif self.id_mode == 'true':
-            self.scrapying_queue.clear()
-            for url in urls:
-                # check if url has been scrapied here
-                if not url in self.scrapied_set:
-                    self.scrapying_queue.append(url)
-                    url_count = url_count + 1
-        logger.info('added %d urls to unscrapied queue.' % url_count)
+        if self.id_mode == 'true':
+            self.frontier.clear_queue()
+        # check if url has been scrapied here
+        unscrapied_urls = [url for url in urls if not self.frontier.is_scrapied(url)]
+        self.frontier.push_urls(unscrapied_urls)
+        logger.info('added %d urls to unscrapied queue.' % len(unscrapied_urls))
 
     def add_scrapied_url(self, url):
-        # wrapper that add url to instance's scrapied set
-        self.scrapied_set.add(url)
+        # wrapper that add url to instance's frontier
+        self.frontier.add_scrapied_url(url)
 
-    def __init__(self, scrapy_interval, cookies, begin_url=None, starting_id=1, stop_id=0, id_mode='false',
-                 description_arg='none'):
-        # initialize scrapied set and scrapying queue
-        self.scrapied_set = set()
-        self.scrapying_queue = collections.deque()
+    def get_downloaded_artworks(self):
+        """
+        Get artworks downloaded by download pool since last call, and add their
+        origin urls to instance's scrapied set.
 
-        # set sleep interval between two requests
-        self.scrapy_interval = scrapy_interval
+        Args:
+            self - instance of class Scraper
+
+        Returns:
+            artworks - list of attributes dictionaries of downloaded artworks
+        """
+        if not self.download_pool:
+            return []
+        artworks = []
+        for attributes, origin_url, succeeded in self.download_pool.get_completed():
+            if succeeded:
+                self.add_scrapied_url(origin_url)
+                artworks.append(attributes)
+            elif succeeded is None:
+                # placeholder image, downloading again doesn't help
+                self.frontier.finish_url(origin_url)
+            else:
+                self.requeue_failed_download(origin_url)
+        return artworks
+
+    def requeue_failed_download(self, origin_url):
+        # artwork whose image failed to download is scrapied again, until it fails too often
+        failure_count = self.download_failures.get(origin_url, 0) + 1
+        self.download_failures[origin_url] = failure_count
+        if failure_count > FAILED_DOWNLOAD_RETRIES:
+            logger.error('gave up "%s" after %u failed downloads.' % (origin_url, failure_count))
+            self.frontier.finish_url(origin_url)
+        else:
+            logger.warning('requeued "%s" whose download failed.' % origin_url)
+            self.frontier.requeue_urls([origin_url])
+
+    def close_scraper(self):
+        # stop download pool, requeue unfinished artworks and pages and close frontier
+        if self.download_pool:
+            self.download_pool.shutdown()
+        if self.database:
+            # buffered records are written, so their urls can be marked scrapied
+            self.database.flush()
+        self.frontier.requeue_in_flight_urls()
+        self.session_factory.log_reuse_stats()
+        if self.blob_store:
+            self.blob_store.close()
+        if self.response_store:
+            self.response_store.close()
+        self.frontier.close_frontier()
+
+    def __init__(self, scrapy_interval, cookies, begin_url=None, starting_id=1, stop_id=0, id_mode='false',
+                 description_arg='none', frontier_name='frontier.db', visited_bloom_size=0, download_workers=0,
+                 download_queue_size=16, download_interval=1, http_pool_size=0, blob_store=None, database=None,
+                 refresh_metadata=False, response_store=None):
+        # initialize frontier that holds scrapied set and scrapying queue, urls
+        # are marked scrapied on disk only after database writes their records
+        self.frontier = frontier.Frontier(frontier_name, visited_bloom_size, defer_scrapied=database is not None)
+        if database is not None:
+            database.add_flush_callback(self.frontier.commit_scrapied_urls)
+
+        # set interval between two requests to html host, and to each image host
         self.scrapy_interval_start = scrapy_interval
+        self.rate_limiter = ratelimit.RateLimiter(HTML_HOST, scrapy_interval, download_interval)
         logger.info('set scrapy interval to %d' % scrapy_interval)
 
         # change delay based on site traffic
@@ -139,12 +234,37 @@ class Scraper(object):
         if self.begin_url:
             logger.info('begin URL %s specified.' % begin_url)
 
-        # use cfscrape to avoid block from cloudflare
-        self.scraper = cfscrape.create_scraper()
+        # use cfscrape to avoid block from cloudflare, connections are kept alive
+        # for html fetcher and every download worker unless pool size is given.
+        # every thread sending requests gets its own session from factory, the
+        # one of creating thread is kept as scraper
+        self.session_factory = session.SessionFactory(http_pool_size if http_pool_size > 0 else download_workers + 1)
+        self.scraper = self.session_factory.create_session()
+        self.thread_sessions = threading.local()
+        self.thread_sessions.session = self.scraper
 
         self.stopId = stop_id
         self.starting_id = starting_id
         self.id_mode = id_mode
+
+        # origin url -> number of failed downloads of the artwork in this run
+        self.download_failures = {}
+
+        # store downloaded images by content if blob store is given
+        self.blob_store = blob_store
+
+        # database is checked to skip archived artworks, unless only their
+        # metadata should be refreshed
+        self.database = database
+        self.refresh_metadata = refresh_metadata
+
+        # raw html of opened pages is recorded if response store is given
+        self.response_store = response_store
+
+        # download images in worker threads if workers specified
+        self.download_pool = None
+        if download_workers > 0:
+            self.download_pool = download.DownloadPool(self.download_artwork, download_workers, download_queue_size)
         logger.debug('scraper initialized.')
 
     def scrapy_pending_url(self):
@@ -159,140 +279,248 @@ class Scraper(object):
         url isn't of type view or error occurs
         """
         # lazy load technical, scrapy base url if it hasn't
-        if not Scraper.SCRAPIED_BASE:
-
-            if self.id_mode == 'false':
-                # if begin URL is specified, use it
-                url = BASE_URL + self.begin_url if self.begin_url else BASE_URL
-            elif self.id_mode == 'true':
-                url = BASE_URL + '/view/' + str(self.starting_id)
-
-            main_html = self.open_url(url)
+        if not self.frontier.get_state('base_scrapied'):
+            url = self.get_base_url()
+            main_html = self.open_url(url, 'base')
             if main_html:
-                parser = parse.Parser(main_html, url, self.id_mode, self.starting_id, self.stopId)
-                sites = parser.get_all_urls()
-                self.add_unscrapied_urls(sites)
-                logger.debug('begin url %s scrapied.' % url)
-                Scraper.SCRAPIED_BASE = True
+                self.add_base_page(url, main_html)
 
         # get next srcapying url
         url = self.get_scrapying_url()
         if not url:
             logger.warning('failed to get url.')
             return None
-        elif url in self.scrapied_set:
-            logger.debug('url has been scrapied.')
-            return None
         origin_url = url  # backup origin url
 
+        url_type, url = self.prepare_url(url)
+        if not url_type:
+            self.frontier.finish_url(origin_url)
+            return None
+
+        html = self.open_url(BASE_URL + url, url_type)
+        if html:
+            logger.info('scrapied "%s" site with url %s.' % (url_type, url))
+            parser, urls = self.parse_page(html, url, url_type)
+            return self.handle_page(origin_url, url, url_type, parser, urls)
+        # failed url is not marked scrapied
+        self.frontier.finish_url(origin_url)
+
+    def get_base_url(self):
+        # get url scrapying begins with, it is scrapied before first queued url
+        if self.id_mode == 'false':
+            # if begin URL is specified, use it
+            return BASE_URL + self.begin_url if self.begin_url else BASE_URL
+        elif self.id_mode == 'true':
+            return BASE_URL + '/view/' + str(self.starting_id)
+
+    def add_base_page(self, url, html):
+        # add urls in base page to scrapying queue, and mark base url scrapied
+        parser = parse.Parser(html, url, self.id_mode, self.starting_id, self.stopId)
+        sites = parser.get_all_urls()
+        self.add_unscrapied_urls(sites)
+        logger.debug('begin url %s scrapied.' % url)
+        self.frontier.set_state('base_scrapied', url)
+
+    def prepare_url(self, url):
+        """
+        Check url popped from scrapying queue and get url of page to be scrapied.
+
+        Args:
+            self - instance of class Scraper
+            url - url popped from scrapying queue
+
+        Returns:
+            (url_type, page_url) - type of url and sub-url of page to be scrapied,
+        (None, None) if url should be skipped
+        """
+        if self.frontier.is_scrapied(url):
+            logger.debug('url has been scrapied.')
+            return None, None
+
+        # artworks archived by earlier runs are skipped before any request
+        artwork_id = self.get_artwork_id_from_url(url)
+        if artwork_id is not None and not self.refresh_metadata and self.is_archived(artwork_id):
+            logger.info('skipped archived artwork %u.' % artwork_id)
+            self.add_scrapied_url(url)
+            return None, None
+
         # get url type, skip this round if unknown
         url_type = parse.Parser.get_url_type(url)
         if url_type == 'unknown':
             logger.info('skipped unknown url "%s".' % url)
-            return None
+            return None, None
 
         # convert url if url type is view(for downloading image)
         if url_type == 'view':
             url = parse.ArtworkParser.view_to_full(url)
+        return url_type, url
 
-        html = self.open_url(BASE_URL + url)
-        if html:
-            logger.info('scrapied "%s" site with url %s.' % (url_type, url))
+    def parse_page(self, html, url, url_type):
+        """
+        Parse scrapied page, touches neither frontier nor files so that it can
+        run in another thread.
+
+        Args:
+            self - instance of class Scraper
+            html - html of the page
+            url - sub-url of the page
+            url_type - type of url returned by prepare_url
+
+        Returns:
+            (parser, urls) - parser of the page and urls found in it
+        """
+        return parsepool.parse_page(html, url, url_type, self.id_mode, self.starting_id, self.stopId)
 
-            # initalize parser according to url type
-            # add exception for id mode
-            parser = parse.ArtworkParser(html, url, self.id_mode, self.starting_id,
-                                         self.stopId) if url_type == 'view' else parse.Parser(html, url, self.id_mode,
-                                                                                              self.starting_id,
-                                                                                              self.stopId)
-
-            # retrieve urls and add them to instance's scrapying queue
-            urls = parser.get_all_urls()
-            self.add_unscrapied_urls(urls)
-
-            if url_type == 'view' and self.view_status(parser) is True:
-                # update interval speed
-                # if self.var_interval == True
-                self.interval_update(parser)
-
-                # for view, parse attributes and then try to download image
-                attributes = parser.get_artwork_attributes()
-                # clean filename
-
-                filename_new = parser.get_filename()
-
-                subfolder_setting = self.sub_folders
-                if not subfolder_setting == 'none':
-                    subdir = self.create_sub_directory_and_return_string(parser, subfolder_setting)
-                    filename_new = subdir + '/' + filename_new
-
-                # debug
-                # parser.get_tag_category()
-
-                download_link = parser.get_download_link()
-                # TODO: filter will be added here
-                # if download_link and attributes['Category'] in SCRAPIED_CATEGORIES:
-                # set ID
-                ID = self.get_artwork_id(url)
-                attributes['ID'] = int(ID)
-
-                filename = util.combine_filename(filename_new, parser.get_filename_extension(download_link))
-
-                if self.description_arg == 'some':
-                    get_alt_and_description = parser.get_alt_and_description()
-                    if get_alt_and_description is True:
-                        logger.debug('Downloading alt link and Description.')
-                        alt_download_link = parser.get_alt_download_link()
-                        alt_filename = util.combine_filename(filename_new,
-                                                             parser.get_filename_extension(alt_download_link))
-                        if alt_download_link != download_link:
-                            self.download_artwork(alt_filename, alt_download_link)
-                        parser.save_description(filename_new)
-                elif self.description_arg == 'all':
+    def handle_page(self, origin_url, url, url_type, parser, urls):
+        """
+        Queue urls found in parsed page, and download artwork if it is a view.
+
+        Args:
+            self - instance of class Scraper
+            origin_url - url popped from scrapying queue
+            url - sub-url of the page
+            url_type - type of url returned by prepare_url
+            parser - parser returned by parse_page
+            urls - urls returned by parse_page
+
+        Returns:
+            attributes - attributes dictionary of the artwork if it is downloaded
+        here, None otherwise
+        """
+        # retrieve urls and add them to instance's scrapying queue
+        self.add_unscrapied_urls(urls)
+
+        if url_type == 'view' and self.view_status(parser) is True:
+            # update interval speed
+            # if self.var_interval == True
+            self.interval_update(parser)
+
+            # for view, parse attributes and then try to download image
+            attributes = parser.get_artwork_attributes()
+            # clean filename
+
+            filename_new = parser.get_filename()
+
+            subfolder_setting = self.sub_folders
+            if not subfolder_setting == 'none':
+                subdir = self.create_sub_directory_and_return_string(parser, subfolder_setting)
+                filename_new = subdir + '/' + filename_new
+
+            # debug
+            # parser.get_tag_category()
+
+            download_link = parser.get_download_link()
+            # TODO: filter will be added here
+            # if download_link and attributes['Category'] in SCRAPIED_CATEGORIES:
+            # set ID
+            ID = self.get_artwork_id(url)
+            attributes['ID'] = int(ID)
+
+            if self.refresh_metadata and self.is_archived(attributes['ID']):
+                # only metadata is updated, image is kept
+                logger.info('refreshed metadata of archived artwork %u.' % attributes['ID'])
+                self.add_scrapied_url(origin_url)
+                return attributes
+
+            filename = util.combine_filename(filename_new, parser.get_filename_extension(download_link))
+
+            if self.description_arg == 'some':
+                get_alt_and_description = parser.get_alt_and_description()
+                if get_alt_and_description is True:
                     logger.debug('Downloading alt link and Description.')
                     alt_download_link = parser.get_alt_download_link()
-                    alt_filename = util.combine_filename(filename_new, parser.get_filename_extension(alt_download_link))
-                    self.download_artwork(alt_filename, alt_download_link)
+                    alt_filename = util.combine_filename(filename_new,
+                                                         parser.get_filename_extension(alt_download_link))
+                    if alt_download_link != download_link:
+                        self.submit_download(alt_filename, alt_download_link)
                     parser.save_description(filename_new)
-
-                if self.download_artwork(filename, download_link):
-                    # download succeed
-                    # add origin url to instance's scrapied set and returns attributes
-                    self.add_scrapied_url(origin_url)
-                    return attributes
-            else:
-                # add origin url to instance's scrapied set
+            elif self.description_arg == 'all':
+                logger.debug('Downloading alt link and Description.')
+                alt_download_link = parser.get_alt_download_link()
+                alt_filename = util.combine_filename(filename_new, parser.get_filename_extension(alt_download_link))
+                # same link is downloaded below, downloading it twice would share one part file
+                if alt_download_link != download_link:
+                    self.submit_download(alt_filename, alt_download_link)
+                parser.save_description(filename_new)
+
+            if self.download_pool:
+                # artwork will be handed back by get_downloaded_artworks
+                self.download_pool.submit(filename, download_link, attributes, origin_url)
+                return None
+            succeeded = self.download_artwork(filename, download_link)
+            if succeeded:
+                # download succeed
+                # add origin url to instance's scrapied set and returns attributes
                 self.add_scrapied_url(origin_url)
+                return attributes
+            elif succeeded is None:
+                self.frontier.finish_url(origin_url)
+            else:
+                self.requeue_failed_download(origin_url)
+        else:
+            # add origin url to instance's scrapied set
+            self.add_scrapied_url(origin_url)
 
-    def scrapy_expired_url(self, url):
+    def scrapy_expired_url(self, url, validators=(None, None, None)):
         """
-        Scrapy expired artwork url.
+        Scrapy expired artwork url with a conditional request. Page is unchanged
+        if server answers 304 to its ETag or Last-Modified, or its stats hash
+        is the same as last time, then it isn't parsed.
 
         Args:
             self - instance of class Scraper
             url - expired url needs update
+            validators - (etag, last_modified, stats_hash) saved when page was
+        last fetched
 
         Returns:
-            attributes - updated attributes of given artwork url, None if error
-        occurs
+            (state, attributes, validators) - state is 'updated', 'unchanged' or
+        'failed', attributes are updated attributes of given artwork url if
+        updated, validators are the ones of fetched page
         """
         url = parse.ArtworkParser.view_to_full(url)
-        html = self.open_url(url)
-        if html:
-            logger.info('scrapied expired url %s.' % url)
-            parser = parse.ArtworkParser(html)
-
-            attributes = parser.get_artwork_attributes()
-            return attributes
-        else:
+        etag, last_modified, stats_hash = validators
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        response = self.request_url(BASE_URL + url, headers=headers or None, accepted_codes=(200, 304),
+                                    url_type='expired')
+        if response is None:
             logger.error('failed to scrapy expired url %s.' % url)
+            return 'failed', None, validators
+
+        # server may send new validators with 304
+        etag = response.headers.get('ETag', etag)
+        last_modified = response.headers.get('Last-Modified', last_modified)
+        if response.status_code == 304:
+            logger.info('expired url %s is not modified.' % url)
+            metrics.increment('pages_not_modified', 'expired')
+            return 'unchanged', None, (etag, last_modified, stats_hash)
+
+        html = response.content
+        self.record_response(BASE_URL + url, html)
+        new_stats_hash = parse.ArtworkParser.get_stats_hash(html)
+        if new_stats_hash and new_stats_hash == stats_hash:
+            logger.info('stats of expired url %s are unchanged.' % url)
+            metrics.increment('pages_unchanged', 'expired')
+            return 'unchanged', None, (etag, last_modified, new_stats_hash)
+
+        logger.info('scrapied expired url %s.' % url)
+        with metrics.timer('parse', 'expired'):
+            parser = parse.ArtworkParser(html, url)
+        if not parser.is_available():
+            logger.warning('expired url %s is not available.' % url)
+            return 'failed', None, validators
+        return 'updated', parser.get_artwork_attributes(), (etag, last_modified, new_stats_hash)
 
     def create_sub_directory_and_return_string(self, parser, subfolder_setting):
         """
         Checks args for setting up subdirectory and return dir as string.
         """
         artist = parser.get_artist()
-        posted_time = parser.stats_tag.find('span', {'class': 'popup_date'}).string
+        posted_time = parser.record.posted_time
         posted_time = util.parse_datetime(posted_time)
         subdir = subfolder_setting
         if '{artist}' in subfolder_setting:
@@ -302,14 +530,51 @@ class Scraper(object):
         util.create_sub_directory(subdir)
         return subdir
 
+    def is_archived(self, artwork_id):
+        """
+        Check if artwork is saved by an earlier run, without network request.
+
+        Args:
+            self - instance of class Scraper
+            artwork_id - ID of the artwork
+
+        Returns:
+            True if artwork is in database, and its image is in file index when
+        images are kept in blob store
+        """
+        if self.database is None or not self.database.has_artwork(artwork_id):
+            return False
+        if self.blob_store:
+            return self.blob_store.has_artwork_file(artwork_id)
+        # without file index, integrity check keeps database and images consistent
+        return True
+
+    @staticmethod
+    def get_artwork_id_from_url(url):
+        # get artwork id(int) from view or full url, None if url is of other type
+        match = visited.VisitedSet.ID_URL_REGEX.match(url)
+        if match:
+            return int(match.group(1))
+
     @staticmethod
     def get_artwork_id(url):
         # get artwork id(string) from url
         return url.replace('/', '').replace('full', '')
 
+    def submit_download(self, filename, download_link):
+        # download file in download pool if there is one, otherwise download it now
+        if self.download_pool:
+            self.download_pool.submit(filename, download_link)
+        else:
+            self.download_artwork(filename, download_link)
+
     def download_artwork(self, filename, download_link):
         """
         Download artwork given download link and save it as filename
+        Default story or music image is rejected before it is written only if
+        Content-Length is known and whole image is in first chunk of
+        DOWNLOAD_CHUNK_SIZE bytes, otherwise it is written to part file and
+        removed once its md5 is checked after download.
 
         Args:
             self - instance of class Scraper
@@ -319,33 +584,143 @@ class Scraper(object):
         Returns:
             True if download process succeeds
             False if download process fails
+            None if image is default story or music image, which isn't saved
         """
-        data = self.open_url(download_link)
-        if not data:
-            # response is empty
-            logger.error('failed to download image "%s".' % filename)
-            return False
-        try:
+        # write to part file first, and rename it when download completes, so
+        # an interrupted download never leaves a truncated image. part file is
+        # kept on failure and resumed with range request next time
+        image_path = 'images/' + filename
+        part_path = image_path + '.part'
+        # md5 and sha256 of what part file holds, fed while receiving
+        digests = None
+        for attempt in range(DOWNLOAD_RESUME_ATTEMPTS):
+            offset = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+            headers = {'Range': 'bytes=%u-' % offset} if offset else None
+            response = self.request_url(download_link, stream=True, headers=headers,
+                                        accepted_codes=(200, 206, 416), url_type='image')
+            if response is None:
+                # response is empty
+                logger.error('failed to download image "%s".' % filename)
+                return False
+
+            if response.status_code == 416:
+                # part file is not a prefix of current image, start over
+                response.close()
+                logger.warning('server refused to resume "%s", restarting download.' % filename)
+                os.remove(part_path)
+                digests = None
+                continue
+
+            total_size = self.get_total_size(response, offset)
+            if response.status_code == 200:
+                # server ignored range, or there is nothing to resume
+                offset = 0
+            elif total_size is None:
+                response.close()
+                logger.warning('invalid Content-Range when resuming "%s", restarting download.' % filename)
+                os.remove(part_path)
+                digests = None
+                continue
+            elif offset:
+                logger.info('resuming download of "%s" from byte %u.' % (filename, offset))
+
+            try:
+                # receiving body and writing it to disk
+                with metrics.timer('image_write', 'image'), response:
+                    chunks = response.iter_content(DOWNLOAD_CHUNK_SIZE)
+                    chunk = next(chunks, b'')
+                    if not offset and total_size == len(chunk) and \
+                            hashlib.md5(chunk).hexdigest() in DEFAULT_IMAGE_MD5S:
+                        # whole image is in first chunk, placeholder is never written
+                        logger.warning('Image not saved. md5 matched default story or music md5.')
+                        if os.path.isfile(part_path):
+                            os.remove(part_path)
+                        return None
+                    if not offset:
+                        digests = (hashlib.md5(), hashlib.sha256())
+                    elif digests is None:
+                        # part file left by an earlier call is hashed once
+                        digests = self.get_file_digests(part_path)
+                    md5, sha256 = digests
+                    with open(part_path, 'ab' if offset else 'wb') as image:
+                        for chunk in itertools.chain((chunk,), chunks):
+                            image.write(chunk)
+                            md5.update(chunk)
+                            sha256.update(chunk)
+            except EnvironmentError as Argument:
+                # occurs error when saving image
+                logger.error('error when saving image "%s".' % filename)
+                logger.error(str(Argument))
+                return False
+            except requests.exceptions.RequestException as Argument:
+                # connection broken while receiving image, resume from what is written
+                logger.error('error when downloading image "%s", attempt %u.' % (filename, attempt + 1))
+                logger.error(str(Argument))
+                continue
+
+            size = os.path.getsize(part_path)
+            if total_size is not None and size != total_size:
+                logger.error('downloaded %u of %u bytes of image "%s".' % (size, total_size, filename))
+                if size > total_size:
+                    os.remove(part_path)
+                    digests = None
+                continue
+
             # See if data is not default image
-            md5_failed = False
-            md5_returned = hashlib.md5(data).hexdigest()
-            md5_story_default = 'a4a6d1c090e7f06b7b97bb2a01865cfa'
-            md5_music_default = '68443c527e3b3ab118c1125b7d68bbbc'
-            if md5_returned == md5_story_default or md5_returned == md5_music_default:
-                logger.warning('Image not saved. md5 matched default story or music md5.')
-                md5_failed = True
-            # saves content to file
-            if md5_failed is False:
-                with open('images/' + filename, 'wb') as image:
-                    image.write(data)
-
-                    logger.info('image "%s" downloaded.' % filename)
-                    return True
-        except EnvironmentError as Argument:
-            # occurs error when saving image
-            logger.error('error when saving image "%s".' % filename)
-            logger.error(str(Argument))
-            return False
+            with metrics.timer('image_store', 'image'):
+                if md5.hexdigest() in DEFAULT_IMAGE_MD5S:
+                    logger.warning('Image not saved. md5 matched default story or music md5.')
+                    os.remove(part_path)
+                    return None
+
+                if self.blob_store:
+                    # same content is stored once, image path links to it
+                    self.blob_store.store(part_path, filename, sha256.hexdigest())
+                else:
+                    os.replace(part_path, image_path)
+            metrics.increment('images_downloaded', 'image')
+            metrics.increment('image_bytes', 'image', size)
+            logger.info('image "%s" downloaded.' % filename)
+            return True
+
+        logger.error('failed to download image "%s" after %u attempts, part file kept.' % (
+            filename, DOWNLOAD_RESUME_ATTEMPTS))
+        return False
+
+    @staticmethod
+    def get_total_size(response, offset):
+        """
+        Get size of whole file from response of a (range) request.
+
+        Args:
+            response - HTTP Response with status code 200 or 206
+            offset - first byte requested
+
+        Returns:
+            total_size - size of whole file, None if unknown or if 206
+        response doesn't start at offset
+        """
+        if response.status_code == 206:
+            # Content-Range: bytes 1000-1999/2000
+            match = re.match(r'bytes (\d+)-\d+/(\d+)', response.headers.get('Content-Range', ''))
+            if match and int(match.group(1)) == offset:
+                return int(match.group(2))
+            return None
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit() and 'Content-Encoding' not in response.headers:
+            return int(content_length)
+        return None
+
+    @staticmethod
+    def get_file_digests(path):
+        # md5 and sha256 hash objects of file in one pass, read in chunks to keep memory flat
+        md5 = hashlib.md5()
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(DOWNLOAD_CHUNK_SIZE), b''):
+                md5.update(chunk)
+                sha256.update(chunk)
+        return md5, sha256
 
     def download_description(self, filename, desc):
         """
@@ -364,13 +739,7 @@ class Scraper(object):
         """
         Check the view or full page to see if the entry is removed or denied access.
         """
-        title = parser.get_title()
-        if title == 'System Error':
-            return False
-        if title == 'FA -- Fur Affinity [dot] net':
-            return False
-        else:
-            return True
+        return parser.is_available()
 
     def interval_update(self, parser):
         """
@@ -378,10 +747,11 @@ class Scraper(object):
         """
         aru = parser.get_registered_users_online()
         if self.scrapy_interval_variable is True:
-            if aru >= 10000 and self.scrapy_interval != self.scrapy_interval_start:
-                self.scrapy_interval = self.scrapy_interval_start
+            scrapy_interval = self.rate_limiter.get_interval(HTML_HOST)
+            if aru >= 10000 and scrapy_interval != self.scrapy_interval_start:
+                self.rate_limiter.set_interval(HTML_HOST, self.scrapy_interval_start)
                 logger.info("Over 10,000 registered users online. Scrappy interval changed to %ss.",
                             self.scrapy_interval_start)
-            elif aru < 10000 and self.scrapy_interval != 0:
-                self.scrapy_interval = 0
+            elif aru < 10000 and scrapy_interval != 0:
+                self.rate_limiter.set_interval(HTML_HOST, 0)
                 logger.info("Less than 10,000 registered users online. Scrappy interval changed to 0s.")
@@ -0,0 +1,204 @@
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import cfscrape
+import json
+import os
+import socket
+import threading
+
+import logging
+
+logger = logging.getLogger('default')
+
+# guards connection counters of all pools
+counter_lock = threading.Lock()
+
+
+class CountingPoolMixin(object):
+    """
+    Mixin for connection pools that counts connections really opened.
+    urllib3's num_connections misses reconnects of dropped keep-alive
+    connections, which are exactly the handshakes we want to see.
+    """
+    num_opened = 0
+
+    def _get_conn(self, timeout=None):
+        conn = super(CountingPoolMixin, self)._get_conn(timeout)
+        # new and dropped connections have no socket, they connect on next request
+        if getattr(conn, 'sock', None) is None:
+            with counter_lock:
+                self.num_opened += 1
+        return conn
+
+
+class CountingHTTPConnectionPool(CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class CountingHTTPSConnectionPool(CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class KeepAliveMixin(object):
+    """
+    Mixin for adapters that turns on TCP keep-alive, so idle pooled connections
+    aren't silently dropped by NAT or server between two requests, and counts
+    connections opened by its pools.
+    """
+    SOCKET_OPTIONS = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.SOCKET_OPTIONS
+        super(KeepAliveMixin, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': CountingHTTPConnectionPool,
+                                                   'https': CountingHTTPSConnectionPool}
+
+
+class KeepAliveAdapter(KeepAliveMixin, HTTPAdapter):
+    # adapter for plain http
+    pass
+
+
+class KeepAliveCloudflareAdapter(KeepAliveMixin, cfscrape.CloudflareAdapter):
+    # adapter for https, keeps cfscrape's cipher list which cloudflare expects
+    pass
+
+
+class SessionFactory(object):
+    """
+    SessionFactory class to create cfscrape sessions sharing one connection
+    setup and one cloudflare clearance.
+    Adapters are mounted with pools sized for concurrent fetchers, so threads
+    reuse established TLS connections instead of handshaking again. Clearance
+    cookies are cached to disk, new sessions and later runs start with them
+    and don't repeat cloudflare challenge.
+
+    Attributes:
+        pool_size - max connections kept alive per host
+        host_count - number of hosts whose pools are kept
+        cookie_file - path of json file that caches clearance cookies
+        clearance - dictionary holds cached cookies and user agent they belong to
+        sessions - list of sessions created, used to collect statistics
+    """
+    # cookies set by cloudflare once challenge is passed
+    CLEARANCE_COOKIES = {'cf_clearance', '__cfduid', '__cf_bm'}
+
+    def __init__(self, pool_size=10, host_count=4, cookie_file='cf_clearance.json'):
+        self.pool_size = pool_size
+        self.host_count = host_count
+        self.cookie_file = cookie_file
+        self.lock = threading.Lock()
+        self.sessions = []
+        self.clearance = self.load_clearance()
+
+    def load_clearance(self):
+        """
+        Load cached clearance from cookie file.
+
+        Args:
+            self - instance of class SessionFactory
+
+        Returns:
+            clearance - dictionary with keys 'user_agent' and 'cookies', empty if
+        file doesn't exist or is broken
+        """
+        if not self.cookie_file or not os.path.exists(self.cookie_file):
+            return {}
+        try:
+            with open(self.cookie_file, 'r') as cookie_file:
+                clearance = json.load(cookie_file)
+            logger.info('loaded %u cloudflare cookies from "%s".' % (len(clearance['cookies']), self.cookie_file))
+            return clearance
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.warning('failed to load cloudflare cookies from "%s", ignored.' % self.cookie_file)
+            return {}
+
+    def create_session(self):
+        """
+        Create cfscrape session with sized keep-alive adapters and cached clearance.
+
+        Args:
+            self - instance of class SessionFactory
+
+        Returns:
+            session - cfscrape session ready to use
+        """
+        session = cfscrape.create_scraper()
+        session.mount('https://', KeepAliveCloudflareAdapter(pool_connections=self.host_count,
+                                                             pool_maxsize=self.pool_size))
+        session.mount('http://', KeepAliveAdapter(pool_connections=self.host_count, pool_maxsize=self.pool_size))
+
+        with self.lock:
+            clearance = self.clearance
+            self.sessions.append(session)
+        if clearance:
+            # cf_clearance is bound to user agent which solved the challenge
+            session.headers['User-Agent'] = clearance['user_agent']
+            for cookie in clearance['cookies']:
+                session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'],
+                                    path=cookie['path'], expires=cookie['expires'])
+        logger.debug('created session with pool size %u.' % self.pool_size)
+        return session
+
+    def save_clearance(self, session):
+        """
+        Save session's clearance cookies to cookie file if they changed, so other
+        sessions and later runs can reuse them.
+
+        Args:
+            self - instance of class SessionFactory
+            session - session that may have passed cloudflare challenge
+
+        Returns:
+            saved - True if cookie file is updated
+        """
+        cookies = [{'name': cookie.name, 'value': cookie.value, 'domain': cookie.domain, 'path': cookie.path,
+                    'expires': cookie.expires} for cookie in session.cookies if cookie.name in self.CLEARANCE_COOKIES]
+        if not cookies:
+            return False
+        clearance = {'user_agent': session.headers['User-Agent'], 'cookies': cookies}
+        with self.lock:
+            if clearance == self.clearance:
+                return False
+            self.clearance = clearance
+            if self.cookie_file:
+                # write to temp file and replace, so a killed process can't leave broken json
+                with open(self.cookie_file + '.tmp', 'w') as cookie_file:
+                    json.dump(clearance, cookie_file)
+                os.replace(self.cookie_file + '.tmp', self.cookie_file)
+        logger.info('saved %u cloudflare cookies to "%s".' % (len(cookies), self.cookie_file))
+        return True
+
+    def get_reuse_stats(self):
+        """
+        Collect connection reuse statistics of all sessions created.
+
+        Args:
+            self - instance of class SessionFactory
+
+        Returns:
+            stats - dictionary maps host to (connections, requests), requests
+        minus connections is the number of handshakes saved
+        """
+        stats = {}
+        with self.lock:
+            sessions = list(self.sessions)
+        for session in sessions:
+            for adapter in session.adapters.values():
+                for key in adapter.poolmanager.pools.keys():
+                    pool = adapter.poolmanager.pools.get(key)
+                    if pool is None:
+                        continue
+                    connections, requests = stats.get(pool.host, (0, 0))
+                    opened = getattr(pool, 'num_opened', pool.num_connections)
+                    stats[pool.host] = (connections + opened, requests + pool.num_requests)
+        return stats
+
+    def log_reuse_stats(self):
+        # log connection reuse statistics per host
+        for host, (connections, requests) in sorted(self.get_reuse_stats().items()):
+            reused = requests - connections if requests > connections else 0
+            logger.info('host "%s": %u requests over %u connections, %.1f%% reused.' % (
+                host, requests, connections, 100.0 * reused / requests if requests else 0))
@@ -1,4 +1,5 @@
 import os
+import re
 from fa_scraper import parse
 
 import time
@@ -14,6 +15,9 @@ import logging
 
 logger = logging.getLogger('default')
 
+# artwork filenames are "<posted time> - <id> - <title>", see ArtworkParser.get_filename
+FILENAME_ID_REGEX = re.compile(r' - (\d+) - ')
+
 
 def if_images_directory_exists():
     """
@@ -115,6 +119,13 @@ def convert_boolean(boolean):
     return 1 if boolean else 0
 
 
+def get_artwork_id_from_filename(filename):
+    # artwork ID(int) in filename, None if filename isn't named by scraper
+    match = FILENAME_ID_REGEX.search(os.path.basename(filename))
+    if match:
+        return int(match.group(1))
+
+
 def generate_url_from_id(artwork_id):
     # artwork_id here is an int
     return '/view/' + str(artwork_id)
@@ -133,3 +144,8 @@ def get_cookies(cookies_file):
     with open(cookies_file, 'r') as file:
         cookies = json.load(file)
     return cookies
+
+
+def get_artwork_information(artwork):
+    # attributes of artwork as json for logs, description html is left out as it may be long
+    return json.dumps({key: value for key, value in artwork.items() if key != 'Description'})
@@ -0,0 +1,190 @@
+from array import array
+
+import hashlib
+import re
+
+import logging
+
+logger = logging.getLogger('default')
+
+
+def hash_url(url):
+    # 64-bit hash of url, 0 is reserved as empty slot of HashSet64
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class IdBitmap(object):
+    """
+    IdBitmap class to store a set of non-negative ints(submission IDs) as bits,
+    one byte holds 8 IDs.
+
+    Attributes:
+        bits - bytearray, bit n is set if n is in bitmap
+        count - number of IDs in bitmap
+    """
+
+    def __init__(self):
+        self.bits = bytearray()
+        self.count = 0
+
+    def add(self, artwork_id):
+        index = artwork_id >> 3
+        if index >= len(self.bits):
+            # grow by at least 1/8 to avoid resizing on every new ID
+            self.bits.extend(bytes(max(index + 1 - len(self.bits), len(self.bits) >> 3)))
+        mask = 1 << (artwork_id & 7)
+        if not self.bits[index] & mask:
+            self.bits[index] |= mask
+            self.count = self.count + 1
+
+    def __contains__(self, artwork_id):
+        index = artwork_id >> 3
+        return index < len(self.bits) and bool(self.bits[index] & (1 << (artwork_id & 7)))
+
+    def __len__(self):
+        return self.count
+
+
+class HashSet64(object):
+    """
+    HashSet64 class to store 64-bit hashes in an open addressing table backed
+    by array, 8 bytes per slot instead of a python int object per hash.
+
+    Attributes:
+        slots - array of unsigned 64-bit ints, 0 for empty slot
+        count - number of hashes in set
+    """
+    MAX_LOAD = 0.5  # table doubles when more than half of slots are used
+
+    def __init__(self, capacity=1024):
+        size = 1
+        while size < capacity:
+            size = size << 1
+        self.slots = array('Q', bytes(8 * size))
+        self.count = 0
+
+    def find_slot(self, value):
+        # linear probing, returns index of value or of the empty slot it should use
+        mask = len(self.slots) - 1
+        index = value & mask
+        while True:
+            slot = self.slots[index]
+            if slot == 0 or slot == value:
+                return index
+            index = (index + 1) & mask
+
+    def add(self, value):
+        index = self.find_slot(value)
+        if self.slots[index] == 0:
+            self.slots[index] = value
+            self.count = self.count + 1
+            if self.count > len(self.slots) * HashSet64.MAX_LOAD:
+                self.resize(len(self.slots) << 1)
+
+    def resize(self, size):
+        old_slots = self.slots
+        self.slots = array('Q', bytes(8 * size))
+        for value in old_slots:
+            if value:
+                self.slots[self.find_slot(value)] = value
+
+    def __contains__(self, value):
+        return self.slots[self.find_slot(value)] == value
+
+    def __len__(self):
+        return self.count
+
+
+class BloomFilter(object):
+    """
+    BloomFilter class, a bit array tells if a value has NOT been added without
+    storing the value itself. Positive answers may be false positives.
+
+    Attributes:
+        bits - bytearray holds filter bits
+        size - number of bits
+        hash_count - number of bits set for each value
+    """
+
+    def __init__(self, size, hash_count=7):
+        self.size = size
+        self.bits = bytearray((size + 7) >> 3)
+        self.hash_count = hash_count
+
+    def get_positions(self, url):
+        # double hashing, derive all positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, url):
+        for position in self.get_positions(url):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, url):
+        for position in self.get_positions(url):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class VisitedSet(object):
+    """
+    VisitedSet class to record scrapied urls compactly in memory.
+    View urls('/view/26350907/', '/full/26350907') are stored as submission IDs
+    in a bitmap, other urls are stored as 64-bit hashes. If bloom size is given,
+    other urls are stored in a bloom filter instead, and positive answers are
+    confirmed by confirm function(exact lookup elsewhere, frontier e.g.).
+
+    Attributes:
+        ids - IdBitmap holds submission IDs
+        hashes - HashSet64 holds hashes of other urls, None if bloom is used
+        bloom - BloomFilter holds other urls, None if not used
+        confirm - function that returns True if given url has been scrapied
+    """
+    ID_URL_REGEX = re.compile(r'^/(?:view|full)/(\d+)/?$')  # compiled regex to get ID from view url
+
+    def __init__(self, bloom_size=0, confirm=None):
+        self.ids = IdBitmap()
+        if bloom_size and confirm:
+            self.hashes = None
+            self.bloom = BloomFilter(bloom_size)
+            logger.debug('visited set uses bloom filter with %u bits.' % bloom_size)
+        else:
+            self.hashes = HashSet64()
+            self.bloom = None
+        self.confirm = confirm
+        self.url_count = 0
+
+    def add(self, url):
+        match = VisitedSet.ID_URL_REGEX.match(url)
+        if match:
+            self.ids.add(int(match.group(1)))
+        elif self.bloom:
+            # counted when bloom filter hasn't seen it, may miss false positives
+            if url not in self.bloom:
+                self.url_count = self.url_count + 1
+            self.bloom.add(url)
+        else:
+            self.hashes.add(hash_url(url))
+
+    def add_id(self, artwork_id):
+        # add submission ID directly
+        self.ids.add(artwork_id)
+
+    def __contains__(self, url):
+        match = VisitedSet.ID_URL_REGEX.match(url)
+        if match:
+            return int(match.group(1)) in self.ids
+        elif self.bloom:
+            # bloom filter never gives false negative, only confirm positives
+            return url in self.bloom and self.confirm(url)
+        else:
+            return hash_url(url) in self.hashes
+
+    def __len__(self):
+        if self.bloom:
+            return len(self.ids) + self.url_count
+        return len(self.ids) + len(self.hashes)
@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+from fa_scraper import scrapy
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    # scraper working in a temporary directory, like fa.py sets it up
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scrapy, 'sub_folders', 'none', raising=False)
+    os.mkdir('images')
+    scraper = scrapy.Scraper(0, None, download_interval=0)
+    yield scraper
+    scraper.close_scraper()
@@ -0,0 +1,185 @@
+"""
+Resuming image downloads, against a local stand-in of the image server that
+drops connections and answers range requests in the ways real ones do.
+"""
+import hashlib
+import http.server
+import os
+import random
+import re
+import threading
+
+import pytest
+
+from fa_scraper import scrapy
+
+
+class ImageHandler(http.server.BaseHTTPRequestHandler):
+    # serves server.content for any path, misbehaves as server.faults says
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        fault = server.faults.pop(0) if server.faults else None
+        content = server.content
+        match = re.match(r'bytes=(\d+)-$', self.headers.get('Range', ''))
+        if match and server.honour_range:
+            offset = int(match.group(1))
+            if offset >= len(content):
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */%u' % len(content))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = content[offset:]
+            if fault == 'short':
+                # legitimate partial answer, only part of requested range
+                body = body[:len(body) // 2]
+            start = offset + 1 if fault == 'bad_start' else offset
+            total = offset if fault == 'bad_total' else len(content)
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %u-%u/%u' % (start, offset + len(body) - 1, total))
+        else:
+            body = content
+            self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if fault == 'drop':
+            # connection breaks after some bytes of body
+            self.wfile.write(body[:server.drop_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def image_server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+    server.content = random.Random(0).randbytes(300 * 1024)
+    server.requests = []
+    server.faults = []
+    server.honour_range = True
+    server.drop_after = 100 * 1024
+    server.url = 'http://127.0.0.1:%u/art/artist/1_artwork.png' % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class RecordingBlobStore(object):
+    # keeps image at its path like no blob store, records digests it is given
+
+    def __init__(self):
+        self.stored = []
+
+    def store(self, part_path, filename, sha256):
+        self.stored.append((filename, sha256))
+        os.replace(part_path, 'images/' + filename)
+
+    def close(self):
+        pass
+
+
+def read_image(filename):
+    with open('images/' + filename, 'rb') as image:
+        return image.read()
+
+
+def test_resume_after_dropped_connection(image_server, scraper):
+    image_server.faults = ['drop']
+    assert scraper.download_artwork('1.png', image_server.url)
+    assert read_image('1.png') == image_server.content
+    assert not os.path.exists('images/1.png.part')
+    assert 'Range' not in image_server.requests[0]
+    assert image_server.requests[1]['Range'] == 'bytes=%u-' % image_server.drop_after
+
+
+def test_server_ignoring_range(image_server, scraper):
+    image_server.faults = ['drop']
+    image_server.honour_range = False
+    assert scraper.download_artwork('1.png', image_server.url)
+    assert read_image('1.png') == image_server.content
+    # range was asked for, whole image came back and replaced part file
+    assert image_server.requests[1]['Range'] == 'bytes=%u-' % image_server.drop_after
+    assert len(image_server.requests) == 2
+
+
+def test_partial_range_is_continued(image_server, scraper):
+    image_server.faults = ['drop', 'short']
+    assert scraper.download_artwork('1.png', image_server.url)
+    assert read_image('1.png') == image_server.content
+    # short answer leaves size below total, rest is asked for once more
+    offset = image_server.drop_after + (len(image_server.content) - image_server.drop_after) // 2
+    assert image_server.requests[2]['Range'] == 'bytes=%u-' % offset
+
+
+def test_content_range_not_at_offset_restarts(image_server, scraper):
+    image_server.faults = ['drop', 'bad_start']
+    assert scraper.download_artwork('1.png', image_server.url)
+    assert read_image('1.png') == image_server.content
+    assert 'Range' not in image_server.requests[2]
+
+
+def test_unsatisfiable_range_restarts(image_server, scraper):
+    # part file is longer than image, server answers 416
+    with open('images/1.png.part', 'wb') as part:
+        part.write(b'\0' * (len(image_server.content) + 10))
+    assert scraper.download_artwork('1.png', image_server.url)
+    assert read_image('1.png') == image_server.content
+    assert image_server.requests[0]['Range'] == 'bytes=%u-' % (len(image_server.content) + 10)
+    assert 'Range' not in image_server.requests[1]
+
+
+def test_oversized_part_file_is_removed(image_server, scraper):
+    # total in Content-Range is smaller than what part file ends up with
+    image_server.faults = ['drop', 'bad_total']
+    assert scraper.download_artwork('1.png', image_server.url)
+    assert read_image('1.png') == image_server.content
+    assert 'Range' not in image_server.requests[2]
+
+
+def test_part_file_kept_after_attempts(image_server, scraper):
+    image_server.faults = ['drop'] * scrapy.DOWNLOAD_RESUME_ATTEMPTS
+    image_server.drop_after = 1024
+    assert not scraper.download_artwork('1.png', image_server.url)
+    assert not os.path.exists('images/1.png')
+    with open('images/1.png.part', 'rb') as part:
+        assert part.read() == image_server.content[:1024 * scrapy.DOWNLOAD_RESUME_ATTEMPTS]
+
+
+def test_digests_streamed_and_part_file_hashed_once(image_server, scraper, monkeypatch):
+    # part file of an earlier run, and connection drops again while resuming
+    with open('images/1.png.part', 'wb') as part:
+        part.write(image_server.content[:1000])
+    image_server.faults = ['drop']
+    scraper.blob_store = RecordingBlobStore()
+    hashed_paths = []
+    get_file_digests = scraper.get_file_digests
+    monkeypatch.setattr(scraper, 'get_file_digests', lambda path: hashed_paths.append(path) or get_file_digests(path))
+    assert scraper.download_artwork('1.png', image_server.url)
+    assert read_image('1.png') == image_server.content
+    assert hashed_paths == ['images/1.png.part']
+    assert scraper.blob_store.stored == [('1.png', hashlib.sha256(image_server.content).hexdigest())]
+
+
+def test_placeholder_rejected_before_written(image_server, scraper, monkeypatch):
+    image_server.content = image_server.content[:4096]
+    monkeypatch.setattr(scrapy, 'DEFAULT_IMAGE_MD5S', {hashlib.md5(image_server.content).hexdigest()})
+    assert scraper.download_artwork('1.png', image_server.url) is None
+    assert not os.path.exists('images/1.png')
+    assert not os.path.exists('images/1.png.part')
+
+
+def test_large_placeholder_rejected_after_download(image_server, scraper, monkeypatch):
+    monkeypatch.setattr(scrapy, 'DEFAULT_IMAGE_MD5S', {hashlib.md5(image_server.content).hexdigest()})
+    image_server.faults = ['drop']
+    assert scraper.download_artwork('1.png', image_server.url) is None
+    assert not os.path.exists('images/1.png')
+    assert not os.path.exists('images/1.png.part')
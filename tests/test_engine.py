@@ -0,0 +1,128 @@
+"""
+Sync and async engines crawl local mock site into the same database and the
+same scrapied set.
+"""
+import argparse
+import asyncio
+import http.server
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from benchmarks import mocksite
+from benchmarks.bench_crawl import run_crawl
+from fa_scraper import engine
+from fa_scraper import replay
+
+
+@pytest.fixture(scope='module')
+def site():
+    site = mocksite.MockSite(80, per_page=24, latency=0.005, image_size=1024, artist_count=2, scraps_ratio=0.25,
+                             submission_count=20)
+    site.start()
+    yield site
+    site.stop()
+
+
+def crawl(site, engine, workdir):
+    arguments = argparse.Namespace(engine=engine, interval=0.001, workers=2, parse_workers=0,
+                                   parser_backend='html.parser', fa_arguments=['--skip-check'])
+    seconds, status, rusage = run_crawl(site, arguments, workdir)
+    # sync engine exits with -1 when scrapying queue is empty
+    assert status in (0, 255)
+
+
+def read_artworks(workdir):
+    # every artwork record without the time it was added
+    conn = sqlite3.connect(os.path.join(workdir, 'fa_scraper.db'))
+    cursor = conn.execute('SELECT * FROM ARTWORK ORDER BY ID;')
+    columns = [column[0] for column in cursor.description]
+    artworks = [{column: value for column, value in zip(columns, record) if column != 'ADDED'} for record in cursor]
+    conn.close()
+    return artworks
+
+
+def read_scrapied_urls(workdir):
+    conn = sqlite3.connect(os.path.join(workdir, 'frontier.db'))
+    urls = {record[0] for record in conn.execute('SELECT URL FROM SCRAPIED;')}
+    conn.close()
+    return urls
+
+
+def test_engines_crawl_same_artworks(site, tmp_path):
+    results = {}
+    for engine in ('sync', 'async'):
+        workdir = str(tmp_path / engine)
+        os.mkdir(workdir)
+        crawl(site, engine, workdir)
+        results[engine] = (read_artworks(workdir), read_scrapied_urls(workdir),
+                           sorted(os.listdir(os.path.join(workdir, 'images'))))
+    artworks, scrapied_urls, images = results['sync']
+    assert len(artworks) == len(site.artwork_ids)
+    assert len(images) >= len(artworks)
+    assert results['async'] == results['sync']
+
+
+class ChallengeHandler(http.server.BaseHTTPRequestHandler):
+    # answers /challenge/ paths with cloudflare challenge, others with a page
+
+    def do_GET(self):
+        if self.path.startswith('/challenge/'):
+            body = b'<form id="challenge-form"><input name="jschl_vc"/><input name="jschl_answer"/></form>'
+            self.send_response(503)
+        else:
+            body = b'<html></html>'
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def version_string(self):
+        # sent as Server header
+        return 'cloudflare' if self.path.startswith('/challenge/') else super().version_string()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def challenge_server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ChallengeHandler)
+    server.url = 'http://127.0.0.1:%u' % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def open_url(async_engine, url):
+    # open a single url with a session of its own, like crawl does
+    async def fetch():
+        async_engine.session = async_engine.create_session()
+        try:
+            return await async_engine.open_url(url, 'view')
+        finally:
+            await async_engine.session.close()
+    return asyncio.run(fetch())
+
+
+def test_cloudflare_fallback_gets_unquoted_url(challenge_server, scraper, monkeypatch):
+    pytest.importorskip('aiohttp')
+    opened = []
+    monkeypatch.setattr(scraper, 'open_url', lambda url, url_type='other': opened.append((url, url_type)) or b'ok')
+    url = challenge_server.url + '/challenge/ice dragon%/'
+    assert open_url(engine.AsyncEngine(scraper, None), url) == b'ok'
+    # Scraper.open_url quotes url itself
+    assert opened == [(url, 'view')]
+
+
+def test_response_recorded_off_event_loop(challenge_server, scraper, monkeypatch):
+    pytest.importorskip('aiohttp')
+    threads = []
+    scraper.response_store = replay.ResponseStore('responses.db')
+    monkeypatch.setattr(scraper, 'record_response', lambda url, content: threads.append(threading.current_thread()))
+    assert open_url(engine.AsyncEngine(scraper, None), challenge_server.url + '/view/1/') == b'<html></html>'
+    assert threads and threads[0] is not threading.main_thread()
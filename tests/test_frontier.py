@@ -0,0 +1,132 @@
+"""
+Urls handed out by frontier are kept in flight until finished, so they are
+scrapied again after a crash, a shutdown or a failed download.
+"""
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from benchmarks import mocksite
+from benchmarks.bench_crawl import FA_PATH
+from fa_scraper import download
+from fa_scraper import frontier
+from fa_scraper import scrapy
+
+
+@pytest.fixture
+def frontier_name(tmp_path):
+    return str(tmp_path / 'frontier.db')
+
+
+def pop_all(scrapying_frontier):
+    urls = []
+    while True:
+        url = scrapying_frontier.pop_url()
+        if url is None:
+            return urls
+        urls.append(url)
+
+
+def test_unfinished_urls_requeued_on_start(frontier_name):
+    scrapying_frontier = frontier.Frontier(frontier_name)
+    scrapying_frontier.push_urls(['/view/1/', '/view/2/', '/view/3/', '/view/4/'])
+    assert pop_all(scrapying_frontier) == ['/view/4/', '/view/3/', '/view/2/', '/view/1/']
+    scrapying_frontier.add_scrapied_url('/view/4/')
+    scrapying_frontier.finish_url('/view/3/')
+    # crash, nothing else is finished
+    scrapying_frontier.close_frontier()
+
+    scrapying_frontier = frontier.Frontier(frontier_name)
+    assert sorted(pop_all(scrapying_frontier)) == ['/view/1/', '/view/2/']
+    scrapying_frontier.close_frontier()
+
+
+def test_requeued_urls_leave_in_flight_table(frontier_name):
+    scrapying_frontier = frontier.Frontier(frontier_name)
+    scrapying_frontier.push_urls(['/view/1/'])
+    scrapying_frontier.requeue_urls([scrapying_frontier.pop_url()])
+    scrapying_frontier.close_frontier()
+
+    # queued once, not again from in-flight table
+    scrapying_frontier = frontier.Frontier(frontier_name)
+    assert pop_all(scrapying_frontier) == ['/view/1/']
+    scrapying_frontier.close_frontier()
+
+
+def test_download_pool_hands_back_failed_jobs():
+    def download_function(filename, download_link):
+        if filename == 'raises.png':
+            raise IOError('disk full')
+        return filename == 'succeeds.png'
+
+    pool = download.DownloadPool(download_function, 2)
+    for filename in ('succeeds.png', 'fails.png', 'raises.png'):
+        pool.submit(filename, 'http://localhost/' + filename, {'ID': filename}, '/view/%s/' % filename)
+    pool.submit('alt.png', 'http://localhost/alt.png')
+    pool.join()
+    completed = sorted(pool.get_completed(), key=lambda job: job[1])
+    pool.shutdown()
+    assert completed == [({'ID': 'fails.png'}, '/view/fails.png/', False),
+                         ({'ID': 'raises.png'}, '/view/raises.png/', False),
+                         ({'ID': 'succeeds.png'}, '/view/succeeds.png/', True)]
+
+
+def test_failed_downloads_requeued_then_dropped(scraper):
+    scraper.frontier.push_urls(['/view/1/'])
+    for attempt in range(scrapy.FAILED_DOWNLOAD_RETRIES):
+        assert scraper.frontier.pop_url() == '/view/1/'
+        scraper.requeue_failed_download('/view/1/')
+    assert scraper.frontier.pop_url() == '/view/1/'
+    scraper.requeue_failed_download('/view/1/')
+    assert scraper.frontier.pop_url() is None
+    # given up artwork isn't in flight, so it isn't requeued at exit
+    scraper.frontier.requeue_in_flight_urls()
+    assert scraper.frontier.get_queue_length() == 0
+
+
+def test_killed_crawl_keeps_unwritten_artworks_unscrapied(tmp_path):
+    site = mocksite.MockSite(60, latency=0.02, image_size=1024)
+    site.start()
+    workdir = str(tmp_path)
+    command = [sys.executable, FA_PATH, '-i', '0.001', '--download-interval', '0.001', '--download-workers', '2',
+               '--begin-url', '/gallery/%s/' % site.artist, '--skip-check', '--log-level', 'fatal',
+               '--db-batch-size', '1000']
+    environment = dict(os.environ, FA_BASE_URL=site.base_url)
+    try:
+        crawl = subprocess.Popen(command, cwd=workdir, env=environment, stdout=subprocess.DEVNULL,
+                                 stderr=subprocess.DEVNULL)
+        # kill without any chance to flush once some artworks are downloaded
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline and crawl.poll() is None:
+            images_directory = os.path.join(workdir, 'images')
+            if os.path.isdir(images_directory) and len(os.listdir(images_directory)) >= 20:
+                break
+            time.sleep(0.02)
+        crawl.kill()
+        crawl.wait()
+
+        conn = sqlite3.connect(os.path.join(workdir, 'frontier.db'))
+        scrapied_ids = {int(match.group(1)) for match in
+                        (re.match(r'^/view/(\d+)/$', record[0]) for record in conn.execute('SELECT URL FROM SCRAPIED;'))
+                        if match}
+        in_flight_count = conn.execute('SELECT COUNT(*) FROM INFLIGHT;').fetchone()[0]
+        conn.close()
+        conn = sqlite3.connect(os.path.join(workdir, 'fa_scraper.db'))
+        artwork_ids = {record[0] for record in conn.execute('SELECT ID FROM ARTWORK;')}
+        conn.close()
+        # artworks in lost batch are still in flight, not scrapied
+        assert scrapied_ids <= artwork_ids
+        assert in_flight_count > 0
+
+        subprocess.run(command, cwd=workdir, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       timeout=120)
+        conn = sqlite3.connect(os.path.join(workdir, 'fa_scraper.db'))
+        assert conn.execute('SELECT COUNT(*) FROM ARTWORK;').fetchone()[0] == len(site.artwork_ids)
+        conn.close()
+    finally:
+        site.stop()
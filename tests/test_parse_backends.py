@@ -0,0 +1,47 @@
+"""
+Every html parser backend extracts the same urls, in the same order, and
+attributes from saved pages, so switching backend never changes what is
+crawled or stored.
+"""
+import os
+
+import pytest
+
+from fa_scraper import parse
+from benchmarks import pages
+
+PAGES_DIRECTORY = os.path.join(os.path.dirname(__file__), 'fixtures', 'pages')
+
+BACKENDS = ('html.parser', 'lxml')
+
+
+def extract(url, html, use_dom):
+    # urls and attributes of page, from DOM tree of current backend or fast path
+    if '/full/' in url:
+        parser = parse.ArtworkParser(html, url)
+    else:
+        parser = parse.Parser(html, url)
+    if use_dom:
+        parser.bs
+    urls = parser.get_all_urls()
+    attributes = parser.get_artwork_attributes() if '/full/' in url else None
+    return urls, attributes
+
+
+@pytest.fixture(params=pages.load_saved_pages(PAGES_DIRECTORY), ids=lambda page: page[0])
+def page(request):
+    return request.param
+
+
+def test_backends_extract_same_urls_and_attributes(page, monkeypatch):
+    pytest.importorskip('lxml')
+    url, html = page
+    results = {}
+    for backend in BACKENDS:
+        monkeypatch.setattr(parse.Parser, 'BACKEND', backend)
+        results[backend] = extract(url, html, True)
+    urls, attributes = results['html.parser']
+    assert urls or attributes
+    assert results['lxml'] == (urls, attributes)
+    # link extraction fast path agrees with DOM tree too
+    assert extract(url, html, False) == (urls, attributes)
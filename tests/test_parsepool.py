@@ -0,0 +1,23 @@
+"""
+Parse stage does the costly part of parsing, get_all_urls only filters links.
+"""
+from fa_scraper import parse
+from fa_scraper import parsepool
+from benchmarks import pages
+
+
+def test_links_loaded_in_parse_stage(monkeypatch):
+    url, html = pages.generate_pages(1, 'gallery')[0]
+    parser, urls = parsepool.parse_page(html, url, 'gallery')
+    # fast path decides generated page, no DOM tree is built
+    assert parser.link_table is not None
+    assert parser.dom is None
+
+    # '>' in quoted attribute is undecided by fast path, DOM tree is built in parse stage
+    html = html.replace('<a ', '<a title="a > b" ', 1)
+    trees = []
+    get_all_urls = parse.Parser.get_all_urls
+    monkeypatch.setattr(parse.Parser, 'get_all_urls', lambda parser: trees.append(parser.dom) or get_all_urls(parser))
+    parser, undecided_urls = parsepool.parse_page(html, url, 'gallery')
+    assert trees[0] is not None
+    assert undecided_urls == urls
@@ -0,0 +1,22 @@
+import pytest
+
+from fa_scraper import ratelimit
+
+
+def test_waits_staggered_after_backoff():
+    bucket = ratelimit.TokenBucket(10)
+    bucket.backoff(30)
+    waits = [bucket.reserve() for index in range(3)]
+    # requests waiting through backoff don't fire together when it ends
+    assert waits == pytest.approx([40, 50, 60], abs=0.1)
+
+
+def test_backoff_without_interval_blocks_until_it_ends():
+    bucket = ratelimit.TokenBucket(0)
+    bucket.backoff(5)
+    assert [bucket.reserve() for index in range(2)] == pytest.approx([5, 5], abs=0.1)
+
+
+def test_waits_spaced_by_interval():
+    bucket = ratelimit.TokenBucket(1)
+    assert [bucket.reserve() for index in range(3)] == pytest.approx([0, 1, 2], abs=0.1)
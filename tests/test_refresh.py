@@ -0,0 +1,77 @@
+"""
+Update mode against local mock site, interrupted while refreshing.
+"""
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from benchmarks import mocksite
+from benchmarks.bench_crawl import FA_PATH
+from benchmarks.bench_update import expire_all
+
+
+@pytest.fixture
+def site():
+    site = mocksite.MockSite(60, latency=0.05, image_size=1024)
+    site.start()
+    yield site
+    site.stop()
+
+
+def start_fa(site, workdir, fa_arguments):
+    # log goes to a file, so a full pipe never blocks fa.py
+    environment = dict(os.environ, FA_BASE_URL=site.base_url)
+    with open(os.path.join(workdir, 'fa.log'), 'ab') as log:
+        return subprocess.Popen([sys.executable, FA_PATH] + fa_arguments, cwd=workdir, env=environment,
+                                stdout=subprocess.DEVNULL, stderr=log)
+
+
+def read_log(workdir):
+    with open(os.path.join(workdir, 'fa.log'), 'rb') as log:
+        return log.read().decode('utf-8', 'replace')
+
+
+def count_refresh_queue(workdir):
+    conn = sqlite3.connect(os.path.join(workdir, 'fa_scraper.db'))
+    try:
+        return conn.execute('SELECT COUNT(*) FROM REFRESH_QUEUE;').fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+
+def test_interrupted_update_resumes(site, tmp_path):
+    workdir = str(tmp_path)
+    crawl = start_fa(site, workdir, ['-i', '0.001', '--download-interval', '0.001',
+                                     '--begin-url', '/gallery/%s/' % site.artist, '--skip-check'])
+    crawl.communicate(timeout=120)
+    expire_all(workdir)
+
+    # records are written one by one, so progress shows in refresh queue
+    update_arguments = ['-m', 'update', '--expire-time', '1', '-i', '0.001', '--refresh-workers', '2',
+                        '--db-batch-size', '1']
+    update = start_fa(site, workdir, update_arguments)
+    # interrupt once some artworks are refreshed
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        queue_length = count_refresh_queue(workdir)
+        if queue_length is not None and 0 < queue_length < 50:
+            break
+        time.sleep(0.02)
+    update.send_signal(signal.SIGINT)
+    update.communicate(timeout=60)
+    assert update.returncode == 0, read_log(workdir)
+    assert 'refresh interrupted' in read_log(workdir)
+    left = count_refresh_queue(workdir)
+    assert 0 < left < 60
+
+    update = start_fa(site, workdir, update_arguments)
+    update.communicate(timeout=120)
+    assert update.returncode == 0, read_log(workdir)
+    assert count_refresh_queue(workdir) == 0
@@ -0,0 +1,21 @@
+import threading
+
+
+def test_every_thread_uses_own_session(scraper):
+    sessions = {}
+
+    def get_session(name):
+        sessions[name] = scraper.get_session()
+        # the same session is kept for later requests of thread
+        assert scraper.get_session() is sessions[name]
+
+    threads = [threading.Thread(target=get_session, args=('download-worker-%u' % index,)) for index in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    get_session('main')
+
+    assert sessions['main'] is scraper.scraper
+    assert len({id(session) for session in sessions.values()}) == 3
+    assert all(session in scraper.session_factory.sessions for session in sessions.values())
@@ -0,0 +1,9 @@
+import json
+
+from fa_scraper import util
+
+
+def test_artwork_information_leaves_out_description():
+    artwork = {'ID': 1, 'Name': 'title', 'Description': '<div>' + 'long description ' * 1000 + '</div>'}
+    assert json.loads(util.get_artwork_information(artwork)) == {'ID': 1, 'Name': 'title'}
+    assert 'Description' in artwork